@@ -0,0 +1,49 @@
+"""
+卡片欄位解析效能比較
+比較融合解析器（src.utils.card_extractor）與原本逐欄位的 extract_* 方法
+
+執行方式：
+    python bench_card_extractor.py
+    python bench_card_extractor.py --cards 20000 --repeat 5
+"""
+
+import argparse
+import random
+import timeit
+
+from sanchong_luzhou_crawler import SanchongLuzhouCrawler
+from src.utils.card_extractor import extract_card_fields
+from test_all_crawlers import CARD_FRAGMENTS, load_fixture_cards
+
+
+def build_texts(count: int, seed: int = 1):
+    """保存的卡片文字加上隨機組合的卡片文字"""
+    rng = random.Random(seed)
+    texts = [text for _, text in load_fixture_cards()]
+    while len(texts) < count:
+        texts.append(''.join(rng.choice(CARD_FRAGMENTS) for _ in range(rng.randint(4, 16))))
+    return texts[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='卡片欄位解析效能比較')
+    parser.add_argument('--cards', type=int, default=5000, help='卡片數量')
+    parser.add_argument('--repeat', type=int, default=5, help='重複次數（取最快的一次）')
+    args = parser.parse_args()
+
+    texts = build_texts(args.cards)
+    crawler = SanchongLuzhouCrawler.__new__(SanchongLuzhouCrawler)
+
+    mismatches = sum(1 for text in texts if extract_card_fields(text) != crawler.extract_card_fields(text))
+    legacy = min(timeit.repeat(lambda: [crawler.extract_card_fields(text) for text in texts], number=1, repeat=args.repeat))
+    fused = min(timeit.repeat(lambda: [extract_card_fields(text) for text in texts], number=1, repeat=args.repeat))
+
+    per_card = 1e6 / len(texts)
+    print(f"🃏 {len(texts)} 張卡片，結果不同: {mismatches}")
+    print(f"  • 逐欄位 extract_*: {legacy * 1000:.1f} ms（{legacy * per_card:.1f} µs/張）")
+    print(f"  • 融合解析器:       {fused * 1000:.1f} ms（{fused * per_card:.1f} µs/張）")
+    print(f"  • 加速: {legacy / fused:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+房屋資料模型的記憶體與轉換效能比較
+比較 Property（dataclass）與 CompactProperty（__slots__、重複字串共用、產生的轉換函式）
+
+執行方式：
+    python bench_compact_property.py
+    python bench_compact_property.py --count 100000 --repeat 5
+"""
+
+import argparse
+import gc
+import random
+import timeit
+import tracemalloc
+
+from src.models.compact_property import CompactProperty
+from src.models.property import Property
+
+DISTRICTS = ['三重區', '蘆洲區', '中正區', '大同區', '中山區', '松山區', '大安區', '萬華區', '信義區', '南港區']
+
+
+def build_records(count: int, seed: int = 1):
+    """與爬蟲輸出相近的原始字典"""
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        district = rng.choice(DISTRICTS)
+        price = rng.randint(800, 3000)
+        records.append({
+            'id': f"sinyi_{i}",
+            'title': f"物件 {i}",
+            'address': f"新北市{district}某路{rng.randint(1, 300)}號",
+            'district': district,
+            'region': '新北市' if district in ('三重區', '蘆洲區') else '台北市',
+            'price': price,
+            'total_price': price,
+            'room_count': rng.randint(2, 5),
+            'living_room_count': 2,
+            'bathroom_count': 2,
+            'size': round(rng.uniform(20, 60), 2),
+            'floor': f"{rng.randint(1, 12)}樓/12樓",
+            'age': rng.randint(1, 50),
+            'building_type': rng.choice(['華廈', '大樓', '公寓']),
+            'source_site': '信義房屋',
+            'source_url': f"https://www.sinyi.com.tw/buy/house/{i}/",
+            'property_type': 'sale',
+        })
+    return records
+
+
+def measure_memory(build):
+    """建立物件清單時增加的記憶體（bytes）"""
+    gc.collect()
+    tracemalloc.start()
+    items = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, items
+
+
+def main():
+    parser = argparse.ArgumentParser(description='房屋資料模型效能比較')
+    parser.add_argument('--count', type=int, default=100000, help='物件數量')
+    parser.add_argument('--repeat', type=int, default=5, help='重複次數（取最快的一次）')
+    args = parser.parse_args()
+
+    records = build_records(args.count)
+    # 記憶體量測使用與 to_dict 輸出相同的字典（字串已各自獨立，不與原始資料共用）
+    dicts = [Property.from_dict(record).to_dict() for record in records]
+
+    def timed(func):
+        return min(timeit.repeat(func, number=1, repeat=args.repeat))
+
+    property_memory, properties = measure_memory(lambda: [Property.from_dict(record) for record in dicts])
+    compact_memory, compacts = measure_memory(lambda: CompactProperty.from_dicts(dicts))
+    assert [item.to_dict() for item in compacts] == [item.to_dict() for item in properties]
+
+    rows = [
+        ('記憶體 (bytes/筆)', property_memory / args.count, compact_memory / args.count),
+        ('由原始字典建立 (s)', timed(lambda: Property.from_dicts(records)), timed(lambda: CompactProperty.from_records(records))),
+        ('to_dict (s)', timed(lambda: [item.to_dict() for item in properties]), timed(lambda: CompactProperty.to_dicts(compacts))),
+        ('由 to_dict 還原 (s)', timed(lambda: [Property.from_dict(item) for item in dicts]), timed(lambda: CompactProperty.from_dicts(dicts))),
+    ]
+
+    print(f"🏠 {args.count:,} 個物件（取 {args.repeat} 次中最快的一次）")
+    for name, dataclass_value, compact_value in rows:
+        print(f"  • {name}: Property {dataclass_value:,.2f}，CompactProperty {compact_value:,.2f}"
+              f"（{dataclass_value / compact_value:.1f}x）")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,9 +7,10 @@
 import json
 import re
 import os
+import sqlite3
 import time
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Union
 from urllib.parse import urljoin
 import sys
 from pathlib import Path
@@ -35,11 +36,39 @@ except ImportError as e:
     print("將使用簡化模式運行...")
     Property = None
 
+try:
+    from src.utils.card_extractor import EXTRACTOR_VERSION, extract_card_fields
+except ImportError:
+    EXTRACTOR_VERSION = 'legacy'
+    extract_card_fields = None
+
+from src.utils.card_cache import CardCache, card_key
+from src.utils.address import AddressIndex
+from src.utils.listing_store import ListingStore
+from src.utils.manifest import SNAPSHOT_EXTENSIONS, SnapshotManifest, load_previous_snapshot
+from src.utils.ndjson_snapshot import NDJSONSnapshotWriter, discard_completed, stream_path
+from src.utils.parquet_export import HAS_PYARROW, append_run
+from src.utils.parse_pool import ParsePool
+from src.utils.previous_snapshot import PreviousSnapshot
+from src.utils.snapshot_delta import resolve_snapshot_mode, snapshot_extension, write_daily_snapshot
+from src.utils.storage import publish_timestamped, temporary_path
+from src.utils.title_cleaner import (
+    CLEANER_VERSION, CommunityNameDictionary, DESCRIPTIVE_PATTERNS, DESCRIPTIVE_SUFFIX_RE,
+    community_names_from_records, match_community_name, strip_title_prefix
+)
+
+# 卡片解析邏輯的版本，任一部分變更時之前快取的解析結果失效
+CARD_PARSER_VERSION = f"extractor-{EXTRACTOR_VERSION}/cleaner-{CLEANER_VERSION}"
+
 
 class SanchongLuzhouCrawler:
     """信義房屋三重蘆洲整合版爬蟲"""
     
-    def __init__(self):
+    def __init__(self, parse_workers: Optional[int] = None, parse_only: bool = False,
+                 card_cache_path: str = "data/card_cache.json", card_cache_size: int = 5000,
+                 community_names_path: str = "data/community_names.json",
+                 address_index_path: str = "data/sanchong_luzhou_address_index.json",
+                 listing_store_path: str = "data/listings.db", snapshot_mode: Optional[str] = None):
         self.base_url = "https://www.sinyi.com.tw"
         
         # 使用指定的搜尋URL
@@ -47,6 +76,43 @@ class SanchongLuzhouCrawler:
         
         self.district_name = "三重蘆洲"
         self.region_name = "新北市"
+        self.store_region = "sanchong_luzhou"
+        
+        # 解析行程數量（None 時依 CRAWLER_PARSE_WORKERS 環境變數或 CPU 核心數）
+        self.parse_workers = parse_workers
+        
+        # 列表卡片解析快取（沒有本地快取時沿用 GitHub Actions 下載的快取）
+        self.card_cache = CardCache(card_cache_path, max_entries=card_cache_size, parser_version=CARD_PARSER_VERSION)
+        if not self.card_cache.load():
+            self.card_cache.load("./previous_data/card_cache.json")
+        
+        # 由社區名稱模式比對結果累積的社區名稱字典
+        self.community_names = CommunityNameDictionary(community_names_path, city=self.region_name)
+        self.community_names.load()
+        
+        # 解析行程只需要上面的設定，不建立網路連線
+        if parse_only:
+            return
+        
+        # 原始地址到標準地址鍵的對照表，比較前後資料時使用
+        self.address_index = AddressIndex(address_index_path, default_city=self.region_name)
+        if not self.address_index.load():
+            self.address_index.load("./previous_data/sanchong_luzhou_address_index.json")
+        
+        # 歷史物件資料庫（沒有本地資料庫時沿用 GitHub Actions 下載的資料庫）
+        self.listing_store = ListingStore(listing_store_path, seed_path="./previous_data/listings.db")
+        
+        # 快照模式：full 每天完整快照，delta 只存與前一次的差異（None 時依 CRAWLER_SNAPSHOT_MODE 環境變數）
+        self.snapshot_mode = resolve_snapshot_mode(snapshot_mode)
+        
+        # 第一次使用時從歷史物件與卡片快取中的社區名稱建立字典（解析行程啟動時會載入此檔案）
+        if not self.community_names.names:
+            self.community_names.add_names(community_names_from_records(
+                self.listing_store.previous_listings(self.store_region)))
+            self.community_names.add_names(self._cached_community_names())
+            self.community_names.save()
+            if self.community_names.names:
+                print(f"📚 從歷史物件建立社區名稱字典: {len(self.community_names.names)} 個名稱")
         
         print(f"🎯 設定爬蟲區域: {self.district_name}區 (三重+蘆洲)")
         print(f"🔗 搜尋網址: {self.search_base_url}")
@@ -239,43 +305,48 @@ class SanchongLuzhouCrawler:
                     raw_title = candidate_text
                     break
         
-        # 從完整標題中提取簡潔的物件名稱
-        title = self.extract_property_name(raw_title)
-        
-        # 提取價格
-        price = self.extract_price(container_text)
-        
-        # 提取地址
-        address = self.extract_address(container_text)
-        
-        # 提取房型資訊
-        room_info = self.extract_room_info(container_text)
+        # 移除常見的前綴
+        name_text = strip_title_prefix(raw_title)
         
-        # 提取坪數
-        size_info = self.extract_size_info(container_text)
+        # 卡片內容與之前相同時直接使用快取結果（快取中的名稱不經字典查詢，與字典內容無關）
+        cache_key = card_key(raw_title, container_text)
+        cached = self.card_cache.get(cache_key)
         
-        # 提取樓層
-        floor_info = self.extract_floor_info(container_text)
+        if cached:
+            pattern_name = (cached['title'], cached.get('community'))
+            fields = cached['fields']
+        else:
+            # 從完整標題中提取簡潔的物件名稱
+            pattern_name = self._pattern_name(name_text)
+            
+            # 一次解析價格、地址、房型、坪數、樓層、屋齡
+            if extract_card_fields:
+                fields = extract_card_fields(container_text)
+            else:
+                fields = self.extract_card_fields(container_text)
+            
+            self.card_cache.put(cache_key, {'title': pattern_name[0], 'community': pattern_name[1], 'fields': fields})
         
-        # 提取屋齡
-        age_info = self.extract_age_info(container_text)
+        # 社區名稱字典在快取之外查詢（線性時間），字典學到新名稱後快取中的卡片也會使用
+        title, community = self._dictionary_name(name_text) or pattern_name
         
         property_info = {
             'id': f"sinyi_sanchong_luzhou_{object_id}",
             'object_id': object_id,
             'title': title,
-            'address': address,
+            'community': community,
+            'address': fields['address'],
             'district': self.district_name,
             'region': self.region_name,
-            'price': price,
-            'total_price': price,
-            'room_count': room_info.get('rooms', 3),
-            'living_room_count': room_info.get('living_rooms', 2),
-            'bathroom_count': room_info.get('bathrooms', 2),
-            'size': size_info.get('total_size', 0),
-            'main_area': size_info.get('main_area', 0),
-            'floor': floor_info,
-            'age': age_info,
+            'price': fields['price'],
+            'total_price': fields['price'],
+            'room_count': fields['rooms'],
+            'living_room_count': fields['living_rooms'],
+            'bathroom_count': fields['bathrooms'],
+            'size': fields['total_size'],
+            'main_area': fields['main_area'],
+            'floor': fields['floor'],
+            'age': fields['age'],
             'building_type': '華廈/大樓',
             'source_site': '信義房屋',
             'source_url': detail_url,
@@ -289,6 +360,23 @@ class SanchongLuzhouCrawler:
         
         return property_info
     
+    def extract_card_fields(self, text: str) -> Dict[str, Any]:
+        """逐欄位解析卡片文字（src.utils.card_extractor 無法載入時使用）"""
+        room_info = self.extract_room_info(text)
+        size_info = self.extract_size_info(text)
+        
+        return {
+            'price': self.extract_price(text),
+            'address': self.extract_address(text),
+            'rooms': room_info.get('rooms', 3),
+            'living_rooms': room_info.get('living_rooms', 2),
+            'bathrooms': room_info.get('bathrooms', 2),
+            'total_size': size_info.get('total_size', 0),
+            'main_area': size_info.get('main_area', 0),
+            'floor': self.extract_floor_info(text),
+            'age': self.extract_age_info(text)
+        }
+    
     def clean_text(self, text: str) -> str:
         """清理文字"""
         if not text:
@@ -297,48 +385,44 @@ class SanchongLuzhouCrawler:
     
     def extract_property_name(self, title: str) -> str:
         """從完整標題中提取簡潔的物件名稱"""
+        return self.resolve_property_name(title)[0]
+    
+    def resolve_property_name(self, title: str) -> Tuple[str, Optional[str]]:
+        """
+        從完整標題中提取簡潔的物件名稱，回傳 (名稱, 社區名稱)
+        社區名稱只在名稱來自字典或社區名稱模式時才有值，其他情況（描述性標題等）為 None
+        """
         if not title:
-            return "未知物件"
+            return "未知物件", None
         
         # 移除常見的前綴
-        title = re.sub(r'^(店長推薦|專任|獨家|急售|出價就談|可看|新接|稀有|推薦)\s*[★❤️⭐✿㊣\[\]｜·]*\s*', '', title)
-        
-        # 嘗試提取社區名稱
-        patterns = [
-            # 模式1: 社區名稱重複出現的情況 (如: "榮耀巴黎...榮耀巴黎新北市")
-            r'([A-Za-z\u4e00-\u9fff]{3,15}).*?\1新北市',
-            # 模式2: 明確的社區名稱 (如: "全球嘉年華新北市")
-            r'([A-Za-z\u4e00-\u9fff]{3,15})新北市',
-            # 模式3: 社區名稱在最末尾 (如: "森活大市新北市") 
-            r'([A-Za-z\u4e00-\u9fff]{3,12})新北市[^A-Za-z\u4e00-\u9fff]*$',
-        ]
+        title = strip_title_prefix(title)
         
-        for pattern in patterns:
-            match = re.search(pattern, title)
-            if match:
-                extracted = match.group(1).strip()
-                
-                # 檢查是否為有效的社區名稱
-                if 3 <= len(extracted) <= 15:
-                    # 避免一些通用詞彙
-                    avoid_words = ['三房', '四房', '電梯', '車位', '大樓', '華廈', '建坪', '年華', '年大']
-                    if not any(word in extracted for word in avoid_words):
-                        return extracted
-        
-        # 如果沒有找到社區名稱，嘗試提取描述性標題
-        descriptive_patterns = [
-            # 描述 + 社區名稱
-            r'^([^新北台北0-9]{5,20}?)(?:新北|台北)',
-            # 純描述性標題
-            r'^([^新北台北0-9]{3,15}?)(?:[0-9]+年|建坪)',
-        ]
+        # 優先查詢社區名稱字典（線性時間），沒有時以正則表達式提取社區名稱
+        return self._dictionary_name(title) or self._pattern_name(title)
+    
+    def _dictionary_name(self, title: str) -> Optional[Tuple[str, str]]:
+        """社區名稱字典中的名稱，回傳 (名稱, 社區名稱)，找不到時回傳 None"""
+        community = self.community_names.lookup(title)
+        return (community, community) if community else None
+    
+    def _pattern_name(self, title: str) -> Tuple[str, Optional[str]]:
+        """不查字典時的 (名稱, 社區名稱)：社區名稱模式，沒有時為描述性名稱（社區名稱為 None）"""
+        community = match_community_name(title, self.region_name)
+        if community:
+            return community, community
         
-        for pattern in descriptive_patterns:
-            match = re.search(pattern, title)
+        return self._descriptive_name(title), None
+    
+    def _descriptive_name(self, title: str) -> str:
+        """標題中沒有社區名稱時的描述性名稱"""
+        # 嘗試提取描述性標題
+        for pattern in DESCRIPTIVE_PATTERNS:
+            match = pattern.search(title)
             if match:
                 extracted = match.group(1).strip()
                 # 清理結尾的常見詞彙
-                extracted = re.sub(r'(車位|三房|四房|電梯|景觀|庭院|綠意|邊間|高樓|方正|美學|豪邸)$', '', extracted)
+                extracted = DESCRIPTIVE_SUFFIX_RE.sub('', extracted)
                 if 3 <= len(extracted) <= 20:
                     return extracted
         
@@ -375,15 +459,17 @@ class SanchongLuzhouCrawler:
         """提取地址"""
         # 針對三重蘆洲的地址提取
         address_patterns = [
-            r'(新北市(?:三重|蘆洲)區[^，\n]{1,30})',
-            r'((?:三重|蘆洲)區[^，\n]{1,30})',
-            r'新北市\s*(?:三重|蘆洲)區\s*([^，\n]{1,20})'
+            r'(新北市(?:三重|蘆洲)區[^，\n]{0,30})',
+            r'((?:三重|蘆洲)區[^，\n]{0,30})'
         ]
         
         for pattern in address_patterns:
             match = re.search(pattern, text)
             if match:
-                return self.clean_text(match.group(1))
+                # 地址後直接接著屋齡、坪數等欄位時截掉
+                address = re.split(r'屋齡|民國|建坪|總坪數|主建物|總價|\d+(?:\.\d+)?\s*(?:年|坪|房|樓|萬|R|F)',
+                                   match.group(1), maxsplit=1)[0]
+                return self.clean_text(address)
         
         # 如果沒找到具體地址，檢查是否至少包含區域名稱
         if '三重' in text:
@@ -508,6 +594,57 @@ class SanchongLuzhouCrawler:
         
         return 0
     
+    def _cached_community_names(self):
+        """卡片快取中以社區名稱模式解析出的社區名稱"""
+        return (entry.get('community') for entry in self.card_cache.entries.values())
+
+    def _fetch_list_pages(self, total_pages: int):
+        """依序抓取列表頁，產生 (頁碼, (HTML,))；第一頁之後抓取失敗時視為已到最後一頁"""
+        for page in range(1, total_pages + 1):
+            page_url = f"{self.search_base_url}/{page}"
+            print(f"📄 正在爬取第 {page}/{total_pages} 頁...")
+            
+            html = self.fetch_page(page_url, delay=2.0)  # 適當延遲避免被封
+            if html:
+                yield page, (html,)
+                continue
+            
+            print(f"❌ 第 {page} 頁爬取失敗")
+            if page > 1:  # 如果不是第一頁就失敗，可能是到了最後
+                print(f"⚠️  可能已到達最後一頁")
+                return
+
+    def _collect_page(self, page: int, future, all_properties: List[Dict[str, Any]],
+                      stream: NDJSONSnapshotWriter) -> bool:
+        """
+        收集一頁的解析結果並立即寫入串流快照，回傳是否繼續爬取下一頁
+        （空白頁或出現重複物件時視為已到最後一頁；解析失敗的頁面略過）
+        """
+        try:
+            page_properties, cache_report = future.result()
+        except Exception as e:
+            print(f"⚠️  第 {page} 頁解析失敗，略過: {e}")
+            return True
+        self.card_cache.absorb(cache_report)
+        
+        # 如果當前頁面沒有找到任何物件，可能是到了最後一頁
+        if not page_properties:
+            print(f"⚠️  第 {page} 頁沒有找到任何物件，可能已到達最後一頁")
+            return False
+        
+        # 檢查是否找到重複的物件ID（表示可能循環到已爬過的頁面）
+        if page > 1:
+            current_ids = {prop['object_id'] for prop in page_properties}
+            previous_ids = {prop['object_id'] for prop in all_properties}
+            if current_ids.intersection(previous_ids):
+                print(f"⚠️  第 {page} 頁發現重複物件，可能已到達實際最後一頁")
+                return False
+        
+        all_properties.extend(page_properties)
+        stream.write_many(page_properties)
+        print(f"✅ 第 {page} 頁找到 {len(page_properties)} 個物件")
+        return True
+    
     def crawl_all_pages(self, max_pages: int = None) -> List[Dict[str, Any]]:
         """爬取所有頁面的物件"""
         print(f"🔍 開始爬取信義房屋三重蘆洲華廈大樓物件...")
@@ -525,40 +662,17 @@ class SanchongLuzhouCrawler:
         
         all_properties = []
         
-        # 爬取每一頁
-        for page in range(1, total_pages + 1):
-            page_url = f"{self.search_base_url}/{page}"
-            print(f"📄 正在爬取第 {page}/{total_pages} 頁...")
-            
-            html = self.fetch_page(page_url, delay=2.0)  # 適當延遲避免被封
-            
-            if html:
-                page_properties = self.parse_property_list(html)
-                
-                # 如果當前頁面沒有找到任何物件，可能是到了最後一頁
-                if not page_properties:
-                    print(f"⚠️  第 {page} 頁沒有找到任何物件，可能已到達最後一頁")
-                    break
-                
-                all_properties.extend(page_properties)
-                print(f"✅ 第 {page} 頁找到 {len(page_properties)} 個物件")
-                
-                # 檢查是否找到重複的物件ID（表示可能循環到已爬過的頁面）
-                if page > 1:
-                    current_ids = {prop['object_id'] for prop in page_properties}
-                    previous_ids = {prop['object_id'] for prop in all_properties[:-len(page_properties)]}
-                    duplicate_ids = current_ids.intersection(previous_ids)
-                    
-                    if duplicate_ids:
-                        print(f"⚠️  第 {page} 頁發現重複物件，可能已到達實際最後一頁")
-                        # 移除重複的物件
-                        all_properties = all_properties[:-len(page_properties)]
-                        break
-                        
-            else:
-                print(f"❌ 第 {page} 頁爬取失敗")
-                if page > 1:  # 如果不是第一頁就失敗，可能是到了最後
-                    print(f"⚠️  可能已到達最後一頁")
+        # 解析出的物件立即寫入串流快照，中斷時仍留下已爬取的部分
+        self.stream_path = stream_path("sanchong_luzhou_houses")
+        print(f"📝 串流寫入: {self.stream_path}")
+        
+        with NDJSONSnapshotWriter(self.stream_path, region=self.store_region) as stream, \
+                ParsePool(self.parse_workers) as pool:
+            # 繼續抓取後面的頁面時，最多有解析行程數個頁面同時在子行程中解析；
+            # 結果依頁碼順序檢查，遇到空白或重複的最後一頁即停止抓取（已送出的後續頁面捨棄）
+            pages = pool.submit_ordered(parse_list_page, self._fetch_list_pages(total_pages))
+            for page, future in pages:
+                if not self._collect_page(page, future, all_properties, stream):
                     break
         
         # 去除重複物件（以防萬一）
@@ -572,22 +686,97 @@ class SanchongLuzhouCrawler:
         if len(unique_properties) != len(all_properties):
             print(f"⚠️  移除了 {len(all_properties) - len(unique_properties)} 個重複物件")
         
+        cache = self.card_cache
+        print(f"🧠 卡片快取命中: {cache.hits}/{cache.hits + cache.misses} ({cache.hit_rate:.1%})")
+        try:
+            cache.save()
+        except OSError as e:
+            print(f"⚠️  無法儲存卡片快取: {e}")
+        
+        # 將社區名稱模式比對出的名稱加入字典，供下次執行查詢（描述性標題不加入）
+        self.community_names.add_names(self._cached_community_names())
+        try:
+            self.community_names.save()
+        except OSError as e:
+            print(f"⚠️  無法儲存社區名稱字典: {e}")
+        
         print(f"🎉 爬取完成！總共找到 {len(unique_properties)} 個唯一物件")
         return unique_properties
     
     def save_to_local_file(self, properties: List[Dict[str, Any]], filename_prefix: str = "sanchong_luzhou_houses") -> str:
         """儲存到本地檔案"""
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        json_filename = f"data/{filename_prefix}_{timestamp}.json"
+        manifest = SnapshotManifest.open()
+        
+        # 差異模式以清單中最近一次的快照為 parent（與新快照同在 data/ 目錄，
+        # data/ 中沒有時從 previous_data/ 連同差異鏈一起複製過來）
+        parent_path = None
+        if self.snapshot_mode == 'delta':
+            parent_path = manifest.delta_parent(self.store_region)
+        
+        # 完整快照為壓縮封存檔 (.hsa，可依 object_id 查詢單筆)，差異快照為 JSON；
+        # 可用 python -m src.utils.snapshot to-json 轉回原本的 JSON 陣列
+        # 先寫入暫存檔，完成後才以不重複的檔名發布（其他爬蟲行程同一秒存檔時順延一秒），
+        # 讀取端不會看到空白或寫到一半的快照；saved_at 與檔名中的時間一致
+        tmp_path = temporary_path(os.path.join("data", f"{filename_prefix}.json"))
+        try:
+            snapshot_kind = write_daily_snapshot(tmp_path, properties, parent_path, mode=self.snapshot_mode)
+            extension = snapshot_extension(snapshot_kind)
+            snapshot_path, saved_at = publish_timestamped(tmp_path, "data", filename_prefix, extension,
+                                                          exclusive_with=SNAPSHOT_EXTENSIONS)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        if snapshot_kind == 'delta':
+            print(f"🧩 差異快照（parent: {os.path.basename(parent_path)}）")
+        
+        # 串流檔案只用於爬取中斷時保留已爬取的部分：完成且筆數與發布的快照相同時，內容已完整保存在
+        # 快照中（封存檔可依 object_id 查詢），保留兩份會讓 data/ 與上傳的 artifact 加倍，因此刪除；
+        # 未完成或筆數不同時保留以便檢查
+        try:
+            discard_completed(getattr(self, 'stream_path', None), expected_count=len(properties))
+        except OSError as e:
+            print(f"⚠️  無法刪除串流快照: {e}")
         
-        with open(json_filename, 'w', encoding='utf-8') as f:
-            json.dump(properties, f, ensure_ascii=False, indent=2, default=str)
+        try:
+            self.listing_store.record_run(self.store_region, properties, snapshot_path=os.path.basename(snapshot_path))
+        except sqlite3.Error as e:
+            print(f"⚠️  寫入物件資料庫失敗: {e}")
         
-        print(f"📁 已儲存到: {json_filename}")
-        return json_filename
+        try:
+            manifest.record(self.store_region, snapshot_path, saved_at, len(properties),
+                            parent=parent_path if snapshot_kind == 'delta' else None)
+        except OSError as e:
+            print(f"⚠️  無法更新快照清單: {e}")
+        
+        # 分析用的 Parquet 歷史資料（依區域與日期分區，有安裝 pyarrow 時才寫入）
+        if HAS_PYARROW:
+            try:
+                append_run(self.store_region, properties, saved_at)
+            except (OSError, TypeError, ValueError) as e:
+                print(f"⚠️  無法寫入 Parquet 歷史資料: {e}")
+        
+        print(f"📁 已儲存到: {snapshot_path}")
+        return snapshot_path
     
-    def load_previous_data(self) -> List[Dict[str, Any]]:
-        """載入前一天的資料用於比較"""
+    def load_previous_data(self) -> Union[PreviousSnapshot, List[Dict[str, Any]]]:
+        """載入前一天的資料用於比較（資料庫與快照清單只載入比較用的欄位，完整物件需要時才讀取）"""
+        # 優先使用物件資料庫（有索引的查詢，不需要掃描檔案）
+        try:
+            previous = PreviousSnapshot.from_store(self.listing_store, self.store_region)
+        except sqlite3.Error as e:
+            print(f"⚠️  無法查詢物件資料庫: {e}")
+            previous = None
+        if previous:
+            print(f"📂 從物件資料庫載入前一天的三重蘆洲資料: {len(previous)} 個物件")
+            return previous
+        
+        # 其次查詢快照清單，不需要列出目錄
+        found = load_previous_snapshot(self.store_region, PreviousSnapshot.from_file)
+        if found:
+            snapshot_path, data = found
+            print(f"📂 從快照清單載入前一天的三重蘆洲資料: {snapshot_path} ({len(data)} 個物件)")
+            return data
+        
         # 優先檢查 GitHub Actions 下載的前一天資料
         previous_data_dirs = ["./previous_data", "data"]
         
@@ -617,7 +806,7 @@ class SanchongLuzhouCrawler:
                 # 尋找三重蘆洲的檔案
                 matching_files = []
                 for filename in files_in_dir:
-                    if filename.startswith(filename_prefix) and filename.endswith('.json'):
+                    if filename.startswith(filename_prefix) and filename.endswith(SNAPSHOT_EXTENSIONS):
                         matching_files.append(filename)
                 
                 if matching_files:
@@ -626,10 +815,9 @@ class SanchongLuzhouCrawler:
                     filepath = os.path.join(data_dir, latest_file)
                     print(f"     ✅ 找到三重蘆洲檔案: {latest_file}")
                     try:
-                        with open(filepath, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                            print(f"     📂 從 GitHub Actions artifacts 載入三重蘆洲資料: {len(data)} 個物件")
-                            return data
+                        data = PreviousSnapshot.from_file(filepath)
+                        print(f"     📂 從 GitHub Actions artifacts 載入三重蘆洲資料: {len(data)} 個物件")
+                        return data
                     except Exception as e:
                         print(f"     ❌ 載入三重蘆洲資料失敗: {str(e)}")
                 else:
@@ -641,21 +829,20 @@ class SanchongLuzhouCrawler:
                 filename_prefix = "sanchong_luzhou_houses"
                 target_pattern = f"{filename_prefix}_{yesterday_str}"
                 
-                print(f"     🎯 搜尋昨天日期檔案模式: {target_pattern}*.json")
+                print(f"     🎯 搜尋昨天日期檔案模式: {target_pattern}*")
                 
                 for filename in files_in_dir:
-                    if filename.startswith(target_pattern) and filename.endswith('.json'):
+                    if filename.startswith(target_pattern) and filename.endswith(SNAPSHOT_EXTENSIONS):
                         filepath = os.path.join(data_dir, filename)
                         print(f"     ✅ 找到昨天的檔案: {filename}")
                         try:
-                            with open(filepath, 'r', encoding='utf-8') as f:
-                                data = json.load(f)
-                                print(f"     📂 載入昨天的資料: {len(data)} 個物件")
-                                return data
+                            data = PreviousSnapshot.from_file(filepath)
+                            print(f"     📂 載入昨天的資料: {len(data)} 個物件")
+                            return data
                         except Exception as e:
                             print(f"     ❌ 載入昨天資料失敗: {str(e)}")
                 # 如果找不到昨天的檔案，尋找最新的三重蘆洲檔案
-                matching_files = [f for f in files_in_dir if f.startswith(filename_prefix) and f.endswith('.json')]
+                matching_files = [f for f in files_in_dir if f.startswith(filename_prefix) and f.endswith(SNAPSHOT_EXTENSIONS)]
                 if matching_files:
                     # 按檔名排序，取最新的
                     matching_files.sort(reverse=True)
@@ -663,17 +850,17 @@ class SanchongLuzhouCrawler:
                     filepath = os.path.join(data_dir, latest_file)
                     print(f"     ✅ 找到最新的三重蘆洲檔案: {latest_file}")
                     try:
-                        with open(filepath, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                            print(f"     📂 載入最新資料: {len(data)} 個物件")
-                            return data
+                        data = PreviousSnapshot.from_file(filepath)
+                        print(f"     📂 載入最新資料: {len(data)} 個物件")
+                        return data
                     except Exception as e:
                         print(f"     ❌ 載入最新資料失敗: {str(e)}")
         
         print("📂 未找到前一天的資料")
         return []
     
-    def compare_with_previous(self, current_properties: List[Dict[str, Any]], previous_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def compare_with_previous(self, current_properties: List[Dict[str, Any]],
+                              previous_data: Union[PreviousSnapshot, List[Dict[str, Any]]]) -> Dict[str, Any]:
         """與前一天的資料比較，詳細分類差異物件"""
         if not previous_data:
             return {
@@ -690,11 +877,9 @@ class SanchongLuzhouCrawler:
                 'message': '首次爬取，所有物件都是新的'
             }
         
-        # 建立昨天的物件映射 (使用地址+房型+坪數作為 key)
-        previous_map = {}
-        for prop in previous_data:
-            key = self._generate_property_key(prop)
-            previous_map[key] = prop
+        # 建立昨天的物件索引 (使用地址+房型+坪數作為 key)，只保留價格與位置
+        previous = PreviousSnapshot.wrap(previous_data)
+        previous_map = previous.index(self._generate_property_key)
         
         # 建立今天的物件映射
         current_map = {}
@@ -714,9 +899,8 @@ class SanchongLuzhouCrawler:
                 print(f"🆕 新增物件: {current_prop.get('title', 'Unknown')[:30]}")
             else:
                 # 存在的物件，檢查價格是否變動
-                previous_prop = previous_map[key]
                 current_price = current_prop.get('price', 0)
-                previous_price = previous_prop.get('price', 0)
+                previous_price, _ = previous_map[key]
                 
                 if abs(current_price - previous_price) > 0:  # 價格有變動
                     change_info = {
@@ -734,15 +918,19 @@ class SanchongLuzhouCrawler:
                     # 價格無變動的物件
                     unchanged_properties.append(current_prop)
         
-        # 找出下架的物件
-        removed_properties = []
-        for key, previous_prop in previous_map.items():
-            if key not in current_map:
-                removed_properties.append(previous_prop)
-                print(f"📤 下架物件: {previous_prop.get('title', 'Unknown')[:30]}")
+        # 找出下架的物件（只有下架的物件需要讀取完整資料）
+        removed_positions = [position for key, (_, position) in previous_map.items() if key not in current_map]
+        removed_properties = previous.records(removed_positions)
+        for previous_prop in removed_properties:
+            print(f"📤 下架物件: {previous_prop.get('title', 'Unknown')[:30]}")
+        
+        try:
+            self.address_index.save()
+        except OSError as e:
+            print(f"⚠️  無法儲存地址對照表: {e}")
         
         # 計算變化
-        change = len(current_properties) - len(previous_data)
+        change = len(current_properties) - len(previous)
         
         # 生成詳細的比較摘要
         summary_parts = []
@@ -768,18 +956,18 @@ class SanchongLuzhouCrawler:
             'total_removed': len(removed_properties),
             'total_price_changed': len(price_changed_properties),
             'current_count': len(current_properties),
-            'previous_count': len(previous_data),
+            'previous_count': len(previous),
             'change': change,
             'message': message
         }
     
     def _generate_property_key(self, prop: Dict[str, Any]) -> str:
         """生成物件的唯一識別鍵"""
-        address = prop.get('address', '').strip()
+        address = self.address_index.key(prop.get('address', ''))
         room_count = prop.get('room_count', 0)
         size = prop.get('size', 0) or prop.get('main_area', 0)
         
-        # 使用地址、房數、坪數作為唯一識別
+        # 使用標準化地址、房數、坪數作為唯一識別
         return f"{address}_{room_count}_{size}"
     
     def upload_to_notion(self, properties: List[Dict[str, Any]], comparison_data: Dict = None) -> bool:
@@ -806,7 +994,7 @@ class SanchongLuzhouCrawler:
         try:
             # 嘗試匯入 Notion 功能
             from src.utils.full_notion import create_full_notion_client
-            from src.models.property import Property
+            from src.models.compact_property import CompactProperty
             
             print("🔄 正在上傳到 Notion...")
             
@@ -842,49 +1030,23 @@ class SanchongLuzhouCrawler:
             
             print(f"📝 準備上傳 {len(properties_to_upload)} 個物件到 Notion")
             
-            # 將字典資料轉換為 Property 對象
-            property_objects = []
-            for i, prop_dict in enumerate(properties_to_upload):
-                try:
-                    # 生成唯一 ID
-                    prop_id = f"sanchong_luzhou_{i+1}_{prop_dict.get('title', '')[:10]}"
-                    
-                    prop = Property(
-                        id=prop_id,
-                        title=prop_dict.get('title', ''),
-                        address=prop_dict.get('address', ''),
-                        district=self.district_name,
-                        region=self.region_name,
-                        price=int(prop_dict.get('price', 0)),
-                        room_count=prop_dict.get('room_count', 3),
-                        living_room_count=prop_dict.get('living_room_count', 2),
-                        bathroom_count=prop_dict.get('bathroom_count', 2),
-                        size=prop_dict.get('size', 0),
-                        floor=str(prop_dict.get('floor', '')),
-                        source_site="信義房屋",
-                        source_url=prop_dict.get('source_url', ''),
-                        property_type='sale'  # 買屋
-                    )
-                    
-                    # 設定買屋專用欄位
-                    prop.total_price = int(prop_dict.get('price', 0))  # 總價
-                    
-                    # 設定其他屬性（如果有的話）
-                    if 'main_area' in prop_dict:
-                        prop.main_area = prop_dict['main_area']
-                    if 'unit_price' in prop_dict:
-                        prop.unit_price = prop_dict['unit_price']
-                    if 'total_floors' in prop_dict:
-                        prop.total_floors = prop_dict['total_floors']
-                    if 'age' in prop_dict:
-                        prop.age = prop_dict['age']
-                    if 'building_type' in prop_dict:
-                        prop.building_type = prop_dict['building_type']
-                    
-                    property_objects.append(prop)
-                except Exception as e:
-                    print(f"⚠️  轉換物件失敗: {e}")
-                    continue
+            # 批次轉換為精簡的 CompactProperty（依欄位型別轉換，保留所有模型欄位，重複字串共用）
+            property_objects = CompactProperty.from_records(
+                [
+                    {
+                        **prop_dict,
+                        'id': f"sanchong_luzhou_{i+1}_{prop_dict.get('title', '')[:10]}",
+                        'total_price': prop_dict.get('price', 0)
+                    }
+                    for i, prop_dict in enumerate(properties_to_upload)
+                ],
+                district=self.district_name,
+                region=self.region_name,
+                # 沒有房型資料時沿用原本的 3 房 2 廳 2 衛
+                defaults={'room_count': 3, 'living_room_count': 2, 'bathroom_count': 2},
+                source_site="信義房屋",
+                property_type='sale'  # 買屋
+            )
             
             # 使用新的層級結構上傳
             today = datetime.now()
@@ -915,6 +1077,19 @@ class SanchongLuzhouCrawler:
             return False
 
 
+# 解析行程中重複使用的爬蟲實例（只含解析設定，不建立網路連線）
+_list_parser = None
+
+
+def parse_list_page(html: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """解析列表頁面（解析池的工作函式，回傳純字典資料與卡片快取回報）"""
+    global _list_parser
+    if _list_parser is None:
+        _list_parser = SanchongLuzhouCrawler(parse_only=True)
+    properties = _list_parser.parse_property_list(html)
+    return properties, _list_parser.card_cache.report()
+
+
 def main():
     """主程式"""
     print("🏠 信義房屋三重蘆洲華廈大樓整合爬蟲")
@@ -991,6 +1166,7 @@ def main():
         
         # 6. 儲存本地檔案
         json_file = crawler.save_to_local_file(properties)
+        crawler.listing_store.close()
         
         # 7. 嘗試上傳到 Notion
         success = crawler.upload_to_notion(properties, comparison)
@@ -1016,6 +1192,7 @@ def main():
         else:
             print(f"  • 🆕 新增物件: {comparison['total_new']} 個 (首次執行)")
         
+        print(f"  • 🧠 卡片快取命中率: {crawler.card_cache.hit_rate:.1%} ({crawler.card_cache.hits}/{crawler.card_cache.hits + crawler.card_cache.misses})")
         print(f"  • 📁 本地檔案: {json_file}")
         print(f"  • 🔗 Notion上傳: {'✅ 成功' if success else '❌ 失敗'}")
         
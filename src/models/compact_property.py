@@ -0,0 +1,192 @@
+"""
+精簡版房屋資料模型
+與 Property 欄位相同，但使用 __slots__、重複字串共用（intern），並以產生的程式碼做快速轉換；
+爬蟲上傳 Notion 時的批次物件即為 CompactProperty（見 from_records）
+"""
+
+import sys
+from dataclasses import MISSING, fields
+from datetime import datetime
+from operator import attrgetter
+from typing import Any, Dict, Iterable, List, Optional
+
+from .property import Property
+
+# 與 Property 相同的欄位順序
+FIELD_NAMES = tuple(f.name for f in fields(Property))
+REQUIRED_FIELDS = tuple(f.name for f in fields(Property) if f.default is MISSING and f.default_factory is MISSING)
+FIELD_DEFAULTS = {f.name: f.default for f in fields(Property) if f.default is not MISSING}
+
+# 大量物件間重複的低基數字串欄位
+INTERNED_FIELDS = ('district', 'region', 'source_site', 'property_type', 'building_type', 'house_type', 'direction')
+LIST_FIELDS = ('features', 'equipment', 'image_urls')
+DATETIME_FIELDS = ('created_at', 'updated_at')
+
+# to_dict 的鍵順序與 Property.to_dict 相同
+DICT_KEYS = tuple(Property(**{name: None for name in REQUIRED_FIELDS}).to_dict().keys())
+
+
+def _intern(value):
+    return sys.intern(value) if value.__class__ is str else value
+
+
+def _parse_datetime(value):
+    if value is None or value.__class__ is datetime:
+        return value
+    return datetime.fromisoformat(value)
+
+
+def _build_init() -> str:
+    """產生與 Property 相同簽名的 __init__"""
+    params = ['self'] + list(REQUIRED_FIELDS)
+    params += [f"{name}=_defaults[{name!r}]" for name in FIELD_NAMES if name not in REQUIRED_FIELDS]
+
+    lines = [f"def __init__({', '.join(params)}):"]
+    for name in FIELD_NAMES:
+        if name in INTERNED_FIELDS:
+            lines.append(f"    self.{name} = _intern({name})")
+        elif name in LIST_FIELDS:
+            lines.append(f"    self.{name} = [] if {name} is None else {name}")
+        elif name not in DATETIME_FIELDS:
+            lines.append(f"    self.{name} = {name}")
+    # 建立與更新時間共用同一次 datetime.now()
+    lines.append("    if created_at is None or updated_at is None:")
+    lines.append("        now = _now()")
+    lines.append("        created_at = now if created_at is None else created_at")
+    lines.append("        updated_at = now if updated_at is None else updated_at")
+    lines.append("    self.created_at = created_at")
+    lines.append("    self.updated_at = updated_at")
+    return '\n'.join(lines)
+
+
+def _build_to_dict() -> str:
+    """產生以字典常值建立結果的 to_dict"""
+    lines = ["def to_dict(self):"]
+    # 建立與更新時間相同時（同一次 datetime.now()）只呼叫一次 isoformat()
+    lines.append("    created = self.created_at")
+    lines.append("    updated = self.updated_at")
+    lines.append("    created_at = created.isoformat() if created else None")
+    lines.append("    if updated == created:")
+    lines.append("        updated_at = created_at")
+    lines.append("    else:")
+    lines.append("        updated_at = updated.isoformat() if updated else None")
+    lines.append("    return {")
+    for key in DICT_KEYS:
+        if key in DATETIME_FIELDS:
+            lines.append(f"        {key!r}: {key},")
+        else:
+            lines.append(f"        {key!r}: self.{key},")
+    lines.append("    }")
+    return '\n'.join(lines)
+
+
+def _build_from_dict() -> str:
+    """產生直接寫入 slots 的 from_dict（不經過 __init__）"""
+    lines = ["def from_dict(cls, data):"]
+    lines.append("    self = _new(cls)")
+    lines.append("    get = data.get")
+    lines.append("    try:")
+    for name in REQUIRED_FIELDS:
+        value = f"data[{name!r}]"
+        if name in INTERNED_FIELDS:
+            value = f"_intern({value})"
+        lines.append(f"        self.{name} = {value}")
+    lines.append("    except KeyError as e:")
+    lines.append("        raise TypeError(f'缺少必填欄位: {e.args[0]}') from None")
+    for name in FIELD_NAMES:
+        if name in REQUIRED_FIELDS:
+            continue
+        value = f"get({name!r}, _defaults[{name!r}])"
+        if name in INTERNED_FIELDS:
+            value = f"_intern({value})"
+        elif name in LIST_FIELDS:
+            lines.append(f"    value = get({name!r})")
+            value = "[] if value is None else value"
+        elif name == 'updated_at':
+            # 與建立時間字串相同時共用同一個 datetime
+            lines.append("    value = get('updated_at')")
+            value = "self.created_at if value is not None and value == get('created_at') else _parse_datetime(value)"
+        elif name in DATETIME_FIELDS:
+            value = f"_parse_datetime(get({name!r}))"
+        lines.append(f"    self.{name} = {value}")
+    lines.append("    if self.created_at is None or self.updated_at is None:")
+    lines.append("        now = _now()")
+    lines.append("        self.created_at = self.created_at or now")
+    lines.append("        self.updated_at = self.updated_at or now")
+    lines.append("    return self")
+    return '\n'.join(lines)
+
+
+def _compile(source: str, name: str):
+    namespace = {
+        '_defaults': FIELD_DEFAULTS,
+        '_intern': _intern,
+        '_now': datetime.now,
+        '_new': object.__new__,
+        '_parse_datetime': _parse_datetime,
+    }
+    exec(compile(source, f"<compact_property.{name}>", 'exec'), namespace)
+    return namespace[name]
+
+
+class CompactProperty:
+    """精簡版房屋資料模型（欄位與 Property 相同）"""
+
+    __slots__ = FIELD_NAMES
+
+    __init__ = _compile(_build_init(), '__init__')
+    to_dict = _compile(_build_to_dict(), 'to_dict')
+    from_dict = classmethod(_compile(_build_from_dict(), 'from_dict'))
+
+    _values = attrgetter(*FIELD_NAMES)
+
+    @classmethod
+    def from_dicts(cls, records: Iterable[Dict[str, Any]]) -> List['CompactProperty']:
+        """批次由字典建立（to_dict 的輸出，不檢查欄位型別）"""
+        from_dict = cls.from_dict
+        return [from_dict(record) for record in records]
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]], defaults: Optional[Dict[str, Any]] = None,
+                     **overrides: Any) -> List['CompactProperty']:
+        """
+        批次由爬取的原始字典建立，欄位檢查與轉換與 Property.from_dicts 相同
+        （缺少 id、title 或 price 等無法轉換的資料會顯示警告並略過）
+        """
+        field_values = Property.field_values
+        from_dict = cls.from_dict
+        items = []
+        for record in records:
+            try:
+                # 轉換後的值已包含所有欄位，直接寫入 slots
+                items.append(from_dict(field_values(record, defaults, **overrides)))
+            except ValueError as e:
+                print(f"⚠️  轉換物件失敗: {e}")
+        return items
+
+    @staticmethod
+    def to_dicts(items: Iterable['CompactProperty']) -> List[Dict[str, Any]]:
+        """批次轉換為字典"""
+        return [item.to_dict() for item in items]
+
+    @classmethod
+    def from_property(cls, prop: Property) -> 'CompactProperty':
+        """由 Property 轉換"""
+        return cls(**{name: getattr(prop, name) for name in FIELD_NAMES})
+
+    def to_property(self) -> Property:
+        """轉換為 Property"""
+        return Property(**dict(zip(FIELD_NAMES, self._values(self))))
+
+    def get_fingerprint(self) -> str:
+        """生成用於去重的指紋"""
+        fingerprint_data = f"{self.address}_{self.price}_{self.size}_{self.room_count}_{self.property_type}"
+        return fingerprint_data.lower().replace(' ', '')
+
+    def __eq__(self, other) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._values(self) == other._values(other)
+
+    def __repr__(self) -> str:
+        return f"CompactProperty(id={self.id!r}, title={self.title!r}, price={self.price!r})"
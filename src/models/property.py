@@ -1,8 +1,76 @@
-from dataclasses import dataclass
-from typing import Optional, List, Dict, Any
+from dataclasses import dataclass, fields, MISSING
+from typing import Optional, List, Dict, Any, Iterable, Callable, Tuple, Union, get_type_hints
 from datetime import datetime
 
 
+def _to_int(value: Any) -> int:
+    if value.__class__ is int:
+        return value
+    if isinstance(value, str):
+        value = value.replace(',', '').strip()
+    return int(float(value))
+
+
+def _to_float(value: Any) -> float:
+    if value.__class__ is float:
+        return value
+    if isinstance(value, str):
+        value = value.replace(',', '').strip()
+    return float(value)
+
+
+def _to_str(value: Any) -> str:
+    return value if value.__class__ is str else str(value)
+
+
+def _to_bool(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ('true', '1', 'yes', 'y', '有', '是')
+    return bool(value)
+
+
+def _to_str_list(value: Any) -> List[str]:
+    if isinstance(value, str):
+        return [value]
+    return [_to_str(item) for item in value]
+
+
+def _to_datetime(value: Any) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+
+# 型別 -> (轉換函式, 必填欄位缺值時的預設值)
+_COERCERS: Dict[Any, Tuple[Callable[[Any], Any], Any]] = {
+    int: (_to_int, 0),
+    float: (_to_float, 0.0),
+    str: (_to_str, ''),
+    bool: (_to_bool, False),
+    List[str]: (_to_str_list, None),
+    datetime: (_to_datetime, None),
+}
+
+
+# 由字典建立物件時不可缺少的欄位（其他必填欄位缺值時使用該型別的空值）
+STRICT_FIELDS = frozenset(['id', 'title', 'price'])
+
+
+def _build_field_plan(cls) -> List[Tuple[str, Callable[[Any], Any], bool, Any]]:
+    """預先計算每個欄位的 (名稱, 轉換函式, 是否必填, 缺值預設)"""
+    hints = get_type_hints(cls)
+    plan = []
+    for f in fields(cls):
+        field_type = hints[f.name]
+        # Optional[X] 取出 X
+        if getattr(field_type, '__origin__', None) is Union:
+            field_type = next(arg for arg in field_type.__args__ if arg is not type(None))
+        coerce, empty_value = _COERCERS[field_type]
+        required = f.default is MISSING and f.default_factory is MISSING
+        plan.append((f.name, coerce, required, empty_value if required else f.default))
+    return plan
+
+
 @dataclass
 class Property:
     """房屋資料模型（支援租屋和買屋）"""
@@ -117,6 +185,57 @@ class Property:
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
     
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], defaults: Optional[Dict[str, Any]] = None,
+                  **overrides: Any) -> 'Property':
+        """
+        由字典建立物件，依欄位型別檢查並轉換數值（如 '1,980' -> 1980）
+
+        defaults 只在 data 缺少該欄位（或值為 None）時使用，overrides 則會覆蓋 data 中的同名欄位；
+        不屬於模型的鍵（如 object_id、crawl_time）會被忽略。缺少 id、title 或 price 時拋出 ValueError
+        """
+        return cls(**cls.field_values(data, defaults, **overrides))
+
+    @classmethod
+    def field_values(cls, data: Dict[str, Any], defaults: Optional[Dict[str, Any]] = None,
+                     **overrides: Any) -> Dict[str, Any]:
+        """from_dict 檢查並轉換後的建構參數（CompactProperty 也以此建立）"""
+        plan = cls.__dict__.get('_field_plan')
+        if plan is None:
+            plan = _build_field_plan(cls)
+            cls._field_plan = plan
+
+        if overrides:
+            data = {**data, **overrides}
+
+        kwargs = {}
+        for name, coerce, required, default in plan:
+            value = data.get(name)
+            if value is None and defaults:
+                value = defaults.get(name)
+            if value is None:
+                if name in STRICT_FIELDS:
+                    raise ValueError(f"缺少欄位 {name}")
+                kwargs[name] = default
+                continue
+            try:
+                kwargs[name] = coerce(value)
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"欄位 {name} 的值無效: {value!r}") from e
+        return kwargs
+
+    @classmethod
+    def from_dicts(cls, records: Iterable[Dict[str, Any]], defaults: Optional[Dict[str, Any]] = None,
+                   **overrides: Any) -> List['Property']:
+        """批次由字典建立物件，無法轉換的資料會顯示警告並略過"""
+        properties = []
+        for record in records:
+            try:
+                properties.append(cls.from_dict(record, defaults, **overrides))
+            except ValueError as e:
+                print(f"⚠️  轉換物件失敗: {e}")
+        return properties
+
     def get_fingerprint(self) -> str:
         """生成用於去重的指紋"""
         # 使用地址、價格、坪數、房數來生成指紋
@@ -128,8 +247,8 @@ class Property:
 class SearchParams:
     """搜尋參數模型（支援租屋和買屋）"""
     
-    # 物件類型
-    property_type: str = 'rent'  # 'rent' 或 'sale'
+    # 物件類型（None 表示不限；'rent' 或 'sale'）
+    property_type: Optional[str] = None
     
     # 地區條件
     region: Optional[str] = None
@@ -0,0 +1,227 @@
+"""
+欄式（columnar）房屋資料批次
+將大量物件的數值欄位存成 NumPy 陣列、字串欄位以字典編碼，統計計算全部向量化
+"""
+
+import re
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 以 float64 儲存的數值欄位，缺值為 NaN
+NUMERIC_COLUMNS = (
+    'price', 'total_price', 'unit_price', 'price_per_ping',
+    'size', 'main_area', 'subsidiary_area', 'public_area', 'land_area',
+    'room_count', 'living_room_count', 'bathroom_count',
+    'age', 'total_floors', 'parking', 'parking_space',
+)
+
+# 以字典編碼儲存的字串欄位
+STRING_COLUMNS = (
+    'id', 'title', 'address', 'district', 'region', 'floor',
+    'building_type', 'house_type', 'property_type', 'source_site', 'source_url',
+)
+
+DEFAULT_PERCENTILES = (25, 75)
+
+# 樓層字串，如 "5樓/12樓"、"3F/5F"、"3樓"
+FLOOR_RE = re.compile(r'(\d+)\s*[樓F](?:\s*/\s*(\d+)\s*[樓F])?')
+
+
+def _get(item: Any, name: str) -> Any:
+    """同時支援字典與物件（Property、CompactProperty）"""
+    if item.__class__ is dict:
+        return item.get(name)
+    return getattr(item, name, None)
+
+
+def _to_number(value: Any) -> float:
+    if value is None or value == '':
+        return np.nan
+    if isinstance(value, str):
+        try:
+            return float(value.replace(',', ''))
+        except ValueError:
+            return np.nan
+    return float(value)
+
+
+def _to_python(value: float):
+    """整數值轉回 int，讓顯示格式與原本的統計一致"""
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+class StringColumn:
+    """字典編碼的字串欄位：codes 為 int32 陣列，values 為不重複字串（缺值的 code 為 -1）"""
+
+    def __init__(self, codes: np.ndarray, values: List[str], lookup: Optional[Dict[str, int]] = None):
+        self.codes = codes
+        self.values = values
+        self._lookup = lookup if lookup is not None else {value: code for code, value in enumerate(values)}
+
+    @classmethod
+    def encode(cls, raw: Iterable[Optional[str]]) -> 'StringColumn':
+        lookup: Dict[str, int] = {}
+        values: List[str] = []
+        codes = []
+        for value in raw:
+            if value is None:
+                codes.append(-1)
+                continue
+            code = lookup.get(value)
+            if code is None:
+                code = len(values)
+                lookup[value] = code
+                values.append(value)
+            codes.append(code)
+        return cls(np.asarray(codes, dtype=np.int32), values, lookup)
+
+    def code_of(self, value: str) -> int:
+        """字串對應的 code，不存在時為 -2（不會與任何資料相符）"""
+        return self._lookup.get(value, -2)
+
+    def decode(self) -> List[Optional[str]]:
+        values = self.values
+        return [values[code] if code >= 0 else None for code in self.codes.tolist()]
+
+    def take(self, indices: np.ndarray) -> 'StringColumn':
+        # 子集合共用同一份字典，不重建查詢表
+        return StringColumn(self.codes[indices], self.values, self._lookup)
+
+
+class PropertyBatch:
+    """欄式房屋資料批次"""
+
+    def __init__(self, numeric: Dict[str, np.ndarray], strings: Dict[str, StringColumn], items: Optional[Sequence[Any]] = None):
+        self.numeric = numeric
+        self.strings = strings
+        self.items = items  # 原始物件（字典或 Property），供查詢結果取回
+
+    @classmethod
+    def from_properties(cls, items: Sequence[Any], numeric_columns: Sequence[str] = NUMERIC_COLUMNS,
+                        string_columns: Sequence[str] = STRING_COLUMNS) -> 'PropertyBatch':
+        """由物件或字典清單建立批次"""
+        items = list(items)
+        count = len(items)
+        numeric = {
+            name: np.fromiter((_to_number(_get(item, name)) for item in items), dtype=np.float64, count=count)
+            for name in numeric_columns
+        }
+        strings = {
+            name: StringColumn.encode(
+                None if value is None else str(value)
+                for value in (_get(item, name) for item in items)
+            )
+            for name in string_columns
+        }
+        return cls(numeric, strings, items)
+
+    def __len__(self) -> int:
+        for column in self.numeric.values():
+            return len(column)
+        for column in self.strings.values():
+            return len(column.codes)
+        return 0
+
+    def column(self, name: str) -> np.ndarray:
+        """數值欄位"""
+        return self.numeric[name]
+
+    def take(self, indices: np.ndarray, with_items: bool = True,
+             numeric_columns: Optional[Sequence[str]] = None,
+             string_columns: Optional[Sequence[str]] = None) -> 'PropertyBatch':
+        """依索引取出子批次
+
+        with_items=False 時不取原始物件；指定欄位時只複製這些欄位（只用於計算的子集合）
+        """
+        items = [self.items[i] for i in indices.tolist()] if with_items and self.items is not None else None
+        numeric_columns = self.numeric.keys() if numeric_columns is None else numeric_columns
+        string_columns = self.strings.keys() if string_columns is None else string_columns
+        return PropertyBatch(
+            {name: self.numeric[name][indices] for name in numeric_columns if name in self.numeric},
+            {name: self.strings[name].take(indices) for name in string_columns if name in self.strings},
+            items,
+        )
+
+    def floor_numbers(self) -> Tuple[np.ndarray, np.ndarray]:
+        """由樓層字串解析 (所在樓層, 總樓層)，每個不重複字串只解析一次"""
+        column = self.strings['floor']
+        floors = np.full(len(column.values) + 1, np.nan)
+        totals = np.full(len(column.values) + 1, np.nan)
+        for code, value in enumerate(column.values):
+            match = FLOOR_RE.search(value)
+            if match:
+                floors[code] = float(match.group(1))
+                if match.group(2):
+                    totals[code] = float(match.group(2))
+
+        # code -1（缺值）對應最後一格的 NaN
+        floor = floors[column.codes]
+        total = totals[column.codes]
+        if 'total_floors' in self.numeric:
+            total = np.where(np.isnan(total), self.numeric['total_floors'], total)
+        return floor, total
+
+    def effective_unit_price(self) -> np.ndarray:
+        """單價（萬/坪），缺值時以總價 / 坪數計算"""
+        size = self.numeric['size']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            computed = np.where(size > 0, self.effective_price() / size, np.nan)
+        return np.where(np.isnan(self.numeric['unit_price']), computed, self.numeric['unit_price'])
+
+    def effective_price(self, price_fallback: bool = True) -> np.ndarray:
+        """總價（萬元），總價缺值或非正數時改用 price"""
+        total_price = self.numeric['total_price']
+        if not price_fallback:
+            return total_price
+        return np.where(total_price > 0, total_price, self.numeric['price'])
+
+    def effective_size(self) -> np.ndarray:
+        """主建物坪數，缺值或非正數時改用總坪數"""
+        main_area = self.numeric['main_area']
+        return np.where(main_area > 0, main_area, self.numeric['size'])
+
+    @staticmethod
+    def describe(values: np.ndarray, percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+                 positive_only: bool = True) -> Dict[str, Any]:
+        """計算 count、mean、min、max、median 與百分位數（忽略缺值）"""
+        mask = np.isfinite(values)
+        if positive_only:
+            mask &= values > 0
+        values = values[mask]
+
+        if not len(values):
+            return {'count': 0}
+
+        stats = {
+            'count': int(len(values)),
+            'mean': float(values.mean()),
+            'min': _to_python(values.min()),
+            'max': _to_python(values.max()),
+            'median': float(np.median(values)),
+        }
+        if percentiles:
+            for percentile, value in zip(percentiles, np.percentile(values, percentiles)):
+                stats[f"p{percentile:g}"] = float(value)
+        return stats
+
+    def stats(self, name: str, **kwargs) -> Dict[str, Any]:
+        """單一數值欄位的統計"""
+        return self.describe(self.numeric[name], **kwargs)
+
+    def summary_stats(self, price_fallback: bool = True) -> Dict[str, float]:
+        """Notion 搜尋摘要使用的統計（avg_price、min_price、max_price、avg_size）"""
+        stats = {}
+
+        price_stats = self.describe(self.effective_price(price_fallback), percentiles=())
+        if price_stats['count']:
+            stats['avg_price'] = price_stats['mean']
+            stats['min_price'] = price_stats['min']
+            stats['max_price'] = price_stats['max']
+
+        size_stats = self.describe(self.effective_size(), percentiles=())
+        if size_stats['count']:
+            stats['avg_size'] = size_stats['mean']
+
+        return stats
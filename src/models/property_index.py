@@ -0,0 +1,249 @@
+"""
+物件索引
+在 PropertyBatch 上建立排序範圍索引（價格、坪數、單價、屋齡、房數）與雜湊索引（行政區、建物類型），
+查詢時取所有可用索引結果的交集作為候選物件，其餘條件只在候選物件上計算；
+估計的候選比例過高時改用向量化全表掃描
+"""
+
+import argparse
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from ..utils.manifest import list_snapshot_files
+from ..utils.snapshot import read_snapshot
+from .property import SearchParams
+from .property_batch import PropertyBatch, StringColumn
+from .property_search import SEARCH_NUMERIC_COLUMNS, SEARCH_STRING_COLUMNS, search_indices
+
+# 範圍索引：名稱 -> 取值函式（與 property_search 的有效值定義一致）
+RANGE_INDEXES: Dict[str, Callable[[PropertyBatch], np.ndarray]] = {
+    'price': lambda batch: batch.effective_price(),
+    'size': lambda batch: batch.numeric['size'],
+    'main_area': lambda batch: batch.effective_size(),
+    'unit_price': lambda batch: batch.effective_unit_price(),
+    'age': lambda batch: batch.numeric['age'],
+    'room_count': lambda batch: batch.numeric['room_count'],
+}
+
+HASH_INDEXES = ('district', 'building_type', 'region', 'property_type')
+
+# 估計符合索引條件的物件超過這個比例時，取子集合的成本高於全表掃描，直接掃描
+SCAN_FRACTION = 0.25
+
+# 符合比例超過這個值的索引結果幾乎不會縮小候選集合，不取交集（條件仍會在候選物件上驗證）
+INTERSECT_FRACTION = 0.5
+
+
+class SortedIndex:
+    """排序範圍索引：依值排序的位置陣列，以二分搜尋取得範圍（缺值不列入）"""
+
+    def __init__(self, values: np.ndarray):
+        positions = np.flatnonzero(~np.isnan(values))
+        order = np.argsort(values[positions], kind='stable')
+        self.positions = positions[order]
+        self.values = values[self.positions]
+
+    def range(self, low: Optional[float] = None, high: Optional[float] = None) -> np.ndarray:
+        """值介於 [low, high] 的物件位置（未排序）"""
+        start = 0 if low is None else np.searchsorted(self.values, low, side='left')
+        end = len(self.values) if high is None else np.searchsorted(self.values, high, side='right')
+        return self.positions[start:end]
+
+
+class HashIndex:
+    """雜湊索引：字典編碼的每個值對應到物件位置陣列"""
+
+    def __init__(self, column: StringColumn):
+        self.column = column
+        order = np.argsort(column.codes, kind='stable')
+        codes = column.codes[order]
+        # codes 已排序，每個 code 的位置是連續的一段
+        boundaries = np.searchsorted(codes, np.arange(-1, len(column.values) + 1))
+        self._groups = {
+            code: order[boundaries[code + 1]:boundaries[code + 2]]
+            for code in range(-1, len(column.values))
+        }
+
+    def equals(self, value: str, include_missing: bool = False) -> np.ndarray:
+        """值等於 value 的物件位置（只有一組時直接回傳索引中的陣列，不複製）"""
+        matches = self._groups.get(self.column.code_of(value), np.empty(0, dtype=np.intp))
+        if include_missing and len(self._groups[-1]):
+            return np.concatenate([matches, self._groups[-1]])
+        return matches
+
+    def contains_any(self, keywords: Sequence[str]) -> np.ndarray:
+        """值包含任一關鍵字的物件位置"""
+        groups = [
+            self._groups[code] for code, value in enumerate(self.column.values)
+            if any(keyword in value for keyword in keywords)
+        ]
+        return np.concatenate(groups) if groups else np.empty(0, dtype=np.intp)
+
+
+class PropertyIndex:
+    """物件集合的索引層"""
+
+    def __init__(self, batch: PropertyBatch):
+        self.batch = batch
+        self.ranges = {name: SortedIndex(values(batch)) for name, values in RANGE_INDEXES.items()}
+        self.hashes = {name: HashIndex(batch.strings[name]) for name in HASH_INDEXES}
+
+    @classmethod
+    def from_properties(cls, items: Sequence[Any]) -> 'PropertyIndex':
+        return cls(PropertyBatch.from_properties(items))
+
+    def __len__(self) -> int:
+        return len(self.batch)
+
+    def _index_lookups(self, params: SearchParams) -> List[np.ndarray]:
+        """可由索引回答的條件，各自回傳符合的物件位置（範圍查詢為排序陣列的切片，不複製）"""
+        lookups = []
+
+        ranged = [
+            ('price', params.price_min, params.price_max),
+            ('size', params.size_min, params.size_max),
+            ('main_area', params.main_area_min, params.main_area_max),
+            ('unit_price', params.unit_price_min, params.unit_price_max),
+            ('age', None, params.age_max),
+            ('room_count', params.room_count_min, params.room_count_max),
+        ]
+        for name, low, high in ranged:
+            if low is not None or high is not None:
+                lookups.append(self.ranges[name].range(low, high))
+
+        # 舊資料可能沒有 property_type，缺值時不排除（與 property_search 相同）
+        if params.property_type:
+            lookups.append(self.hashes['property_type'].equals(params.property_type, include_missing=True))
+        if params.region:
+            lookups.append(self.hashes['region'].equals(params.region))
+        if params.district:
+            lookups.append(self.hashes['district'].equals(params.district))
+        if params.building_types:
+            lookups.append(self.hashes['building_type'].contains_any(params.building_types))
+        return lookups
+
+    def candidates(self, params: SearchParams) -> np.ndarray:
+        """候選物件位置（已排序）
+
+        以各索引結果的大小估計交集的比例（假設條件彼此獨立），比例過高時回傳所有物件（全表掃描）；
+        否則從最小的結果開始依序與其他有選擇性的索引結果取交集
+        """
+        total = len(self.batch)
+        lookups = sorted(self._index_lookups(params), key=len)
+        if not lookups or not total:
+            return np.arange(total)
+
+        estimate = 1.0
+        for lookup in lookups:
+            estimate *= len(lookup) / total
+        if estimate > SCAN_FRACTION:
+            return np.arange(total)
+
+        positions = np.sort(lookups[0])
+        member = np.empty(total, dtype=bool)
+        for lookup in lookups[1:]:
+            if not len(positions) or len(lookup) > total * INTERSECT_FRACTION:
+                break
+            member[:] = False
+            member[lookup] = True
+            positions = positions[member[positions]]
+        return positions
+
+    def query(self, params: SearchParams) -> np.ndarray:
+        """依搜尋參數查詢，回傳排序後的物件位置"""
+        positions = self.candidates(params)
+        if len(positions) == len(self.batch):
+            return search_indices(self.batch, params)
+
+        # 在候選物件的子集合上驗證所有條件並排序
+        subset = self.batch.take(positions, with_items=False, numeric_columns=SEARCH_NUMERIC_COLUMNS,
+                                 string_columns=SEARCH_STRING_COLUMNS)
+        return positions[search_indices(subset, params)]
+
+    def search(self, params: SearchParams) -> List[Any]:
+        """依搜尋參數查詢，回傳原始物件"""
+        items = self.batch.items
+        return [items[i] for i in self.query(params).tolist()]
+
+
+def load_listings(data_dirs: Sequence[str], filename_prefix: str) -> List[Dict[str, Any]]:
+    """載入資料目錄中的所有快照，同一物件 id 以最新的快照為準"""
+    listings: Dict[str, Dict[str, Any]] = {}
+    for data_dir in data_dirs:
+        if not os.path.isdir(data_dir):
+            continue
+        filenames = [name for name in list_snapshot_files(os.listdir(data_dir)) if name.startswith(filename_prefix)]
+        for filename in filenames:
+            try:
+                records = read_snapshot(os.path.join(data_dir, filename))
+            except (OSError, ValueError) as e:
+                print(f"⚠️  無法載入 {filename}: {e}")
+                continue
+            for record in records:
+                if isinstance(record, dict):
+                    listings[record.get('id') or record.get('source_url') or str(len(listings))] = record
+    return list(listings.values())
+
+
+def benchmark(items: Sequence[Any], params: SearchParams, repeat: int = 20) -> Dict[str, float]:
+    """量測索引建立時間與查詢延遲（毫秒），並與全表掃描比較"""
+    start = time.perf_counter()
+    batch = PropertyBatch.from_properties(items)
+    batch_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    index = PropertyIndex(batch)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = index.query(params)
+    query_ms = (time.perf_counter() - start) * 1000 / repeat
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        search_indices(batch, params)
+    scan_ms = (time.perf_counter() - start) * 1000 / repeat
+
+    return {
+        'count': len(batch),
+        'matches': len(result),
+        'batch_ms': batch_ms,
+        'build_ms': build_ms,
+        'query_ms': query_ms,
+        'scan_ms': scan_ms,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='建立物件索引並量測查詢效能')
+    parser.add_argument('--data-dir', action='append', default=None, help='資料目錄（可重複指定）')
+    parser.add_argument('--prefix', default='sanchong_luzhou_houses', help='快照檔名前綴')
+    parser.add_argument('--price-min', type=float)
+    parser.add_argument('--price-max', type=float)
+    parser.add_argument('--size-min', type=float)
+    parser.add_argument('--rooms', type=int, help='最少房數')
+    parser.add_argument('--district')
+    args = parser.parse_args()
+
+    items = load_listings(args.data_dir or ['data'], args.prefix)
+    if not items:
+        print("❌ 沒有找到任何物件資料")
+        return
+
+    params = SearchParams(
+        property_type='sale', district=args.district,
+        price_min=args.price_min, price_max=args.price_max,
+        size_min=args.size_min, room_count_min=args.rooms,
+    )
+    result = benchmark(items, params)
+    print(f"📊 物件數: {result['count']}，符合: {result['matches']}")
+    print(f"⏱️  建立批次: {result['batch_ms']:.1f} ms，建立索引: {result['build_ms']:.1f} ms")
+    print(f"⏱️  索引查詢: {result['query_ms']:.2f} ms，全表掃描: {result['scan_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+向量化物件搜尋
+將 SearchParams 編譯成一組 PropertyBatch 上的布林遮罩，排序時只對前 max_results 筆做完整排序
+"""
+
+from typing import Any, Callable, List, Optional, Sequence
+
+import numpy as np
+
+from .property import SearchParams
+from .property_batch import PropertyBatch
+
+# 單一條件：輸入批次，輸出布林遮罩
+Condition = Callable[[PropertyBatch], np.ndarray]
+
+# 搜尋條件與排序會用到的欄位
+SEARCH_NUMERIC_COLUMNS = (
+    'price', 'total_price', 'unit_price', 'size', 'main_area', 'room_count',
+    'age', 'total_floors', 'parking', 'parking_space',
+)
+SEARCH_STRING_COLUMNS = ('property_type', 'region', 'district', 'floor', 'building_type', 'house_type')
+
+# sort_by 可用的欄位，price 與 unit_price 使用有效值（含缺值回補）
+SORT_KEYS = {
+    'price': lambda batch: batch.effective_price(),
+    'unit_price': lambda batch: batch.effective_unit_price(),
+    'size': lambda batch: batch.numeric['size'],
+    'main_area': lambda batch: batch.effective_size(),
+    'room_count': lambda batch: batch.numeric['room_count'],
+    'age': lambda batch: batch.numeric['age'],
+    'floor': lambda batch: batch.floor_numbers()[0],
+}
+
+
+def _range(values: Callable[[PropertyBatch], np.ndarray], low: Optional[float], high: Optional[float]) -> Condition:
+    """數值範圍條件，缺值（NaN）視為不符合"""
+    def condition(batch: PropertyBatch) -> np.ndarray:
+        column = values(batch)
+        with np.errstate(invalid='ignore'):
+            if low is not None and high is not None:
+                return (column >= low) & (column <= high)
+            if low is not None:
+                return column >= low
+            return column <= high
+    return condition
+
+
+def _equals(name: str, value: str, allow_missing: bool = False) -> Condition:
+    """字串欄位等值條件（比對 code，不逐筆比較字串）"""
+    def condition(batch: PropertyBatch) -> np.ndarray:
+        column = batch.strings[name]
+        mask = column.codes == column.code_of(value)
+        if allow_missing:
+            mask |= column.codes == -1
+        return mask
+    return condition
+
+
+def _contains_any(name: str, keywords: Sequence[str]) -> Condition:
+    """字串欄位包含任一關鍵字（如 "華廈" 符合 "華廈/大樓"），只檢查不重複的字串"""
+    def condition(batch: PropertyBatch) -> np.ndarray:
+        column = batch.strings[name]
+        codes = [code for code, value in enumerate(column.values) if any(keyword in value for keyword in keywords)]
+        return np.isin(column.codes, codes)
+    return condition
+
+
+def _exclude_top_floor(batch: PropertyBatch) -> np.ndarray:
+    floor, total = batch.floor_numbers()
+    return ~(floor == total)
+
+
+def _exclude_ground_floor(batch: PropertyBatch) -> np.ndarray:
+    floor, _ = batch.floor_numbers()
+    return ~(floor <= 1)
+
+
+def compile_conditions(params: SearchParams) -> List[Condition]:
+    """將搜尋參數轉為條件清單（未設定的參數不產生條件）"""
+    conditions: List[Condition] = []
+
+    # 舊資料可能沒有 property_type，缺值時不排除
+    if params.property_type:
+        conditions.append(_equals('property_type', params.property_type, allow_missing=True))
+    if params.region:
+        conditions.append(_equals('region', params.region))
+    if params.district:
+        conditions.append(_equals('district', params.district))
+
+    ranges = [
+        (lambda batch: batch.effective_price(), params.price_min, params.price_max),
+        (lambda batch: batch.numeric['room_count'], params.room_count_min, params.room_count_max),
+        (lambda batch: batch.numeric['size'], params.size_min, params.size_max),
+        (lambda batch: batch.effective_size(), params.main_area_min, params.main_area_max),
+        (lambda batch: batch.effective_unit_price(), params.unit_price_min, params.unit_price_max),
+        (lambda batch: batch.floor_numbers()[0], params.floor_min, params.floor_max),
+        (lambda batch: batch.numeric['parking_space'], params.parking_space_min, None),
+        (lambda batch: batch.numeric['age'], None, params.age_max),
+    ]
+    for values, low, high in ranges:
+        if low is not None or high is not None:
+            conditions.append(_range(values, low, high))
+
+    if params.building_types:
+        conditions.append(_contains_any('building_type', params.building_types))
+    if params.house_types:
+        conditions.append(_contains_any('house_type', params.house_types))
+
+    if params.exclude_top_floor:
+        conditions.append(_exclude_top_floor)
+    if params.exclude_ground_floor:
+        conditions.append(_exclude_ground_floor)
+
+    if params.has_parking is not None:
+        wanted = 1.0 if params.has_parking else 0.0
+        conditions.append(lambda batch: batch.numeric['parking'] == wanted)
+
+    return conditions
+
+
+def filter_mask(batch: PropertyBatch, params: SearchParams) -> np.ndarray:
+    """符合所有條件的布林遮罩"""
+    mask = np.ones(len(batch), dtype=bool)
+    for condition in compile_conditions(params):
+        mask &= condition(batch)
+    return mask
+
+
+def top_k(values: np.ndarray, k: int, descending: bool = False) -> np.ndarray:
+    """回傳排序後前 k 筆的位置，缺值排在最後；只對前 k 筆做完整排序"""
+    keys = -values if descending else values.copy()
+    keys[np.isnan(keys)] = np.inf
+
+    if k <= 0:
+        return np.arange(0)
+    if k < len(keys):
+        # 比第 k 小的值更小的全部保留，與它同值的依原始順序補足 k 筆（與完整穩定排序的結果相同）
+        boundary = np.partition(keys, k - 1)[k - 1]
+        below = np.flatnonzero(keys < boundary)
+        ties = np.flatnonzero(keys == boundary)[:k - len(below)]
+        candidates = np.concatenate([below, ties])
+    else:
+        candidates = np.arange(len(keys))
+    # 穩定排序，同值時保留原始順序
+    candidates.sort()
+    return candidates[np.argsort(keys[candidates], kind='stable')]
+
+
+def search_indices(batch: PropertyBatch, params: SearchParams) -> np.ndarray:
+    """依搜尋參數篩選並排序，回傳批次中的索引"""
+    indices = np.flatnonzero(filter_mask(batch, params))
+    limit = params.max_results if params.max_results and params.max_results > 0 else len(indices)
+
+    sort_key = SORT_KEYS.get(params.sort_by)
+    if sort_key is None:
+        return indices[:limit]
+
+    values = sort_key(batch)[indices]
+    return indices[top_k(values, limit, descending=params.sort_order == 'desc')]
+
+
+def search_properties(items: Sequence[Any], params: SearchParams, batch: Optional[PropertyBatch] = None) -> List[Any]:
+    """在物件清單（字典或 Property）中搜尋，可傳入已建立的批次重複使用"""
+    if batch is None:
+        batch = PropertyBatch.from_properties(items)
+    return [items[i] for i in search_indices(batch, params).tolist()]
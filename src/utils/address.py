@@ -0,0 +1,142 @@
+"""
+地址正規化工具
+將原始地址轉為標準形式（縣市、行政區、路街、段、巷、弄、號），並以持久化的對照表避免重複正規化
+"""
+
+import json
+import os
+import re
+import unicodedata
+from typing import Dict, NamedTuple, Optional
+
+from .storage import atomic_write
+
+# 正規化規則變更時遞增，讓舊的對照表失效
+INDEX_VERSION = 1
+
+# 常見行政區所屬縣市，地址缺少縣市時用來補齊
+DISTRICT_CITY = {
+    '三重區': '新北市', '蘆洲區': '新北市', '板橋區': '新北市', '新莊區': '新北市',
+    '中和區': '新北市', '永和區': '新北市', '新店區': '新北市', '土城區': '新北市',
+    '五股區': '新北市', '泰山區': '新北市', '汐止區': '新北市', '林口區': '新北市',
+    '中正區': '台北市', '大同區': '台北市', '中山區': '台北市', '松山區': '台北市',
+    '大安區': '台北市', '萬華區': '台北市', '信義區': '台北市', '士林區': '台北市',
+    '北投區': '台北市', '內湖區': '台北市', '南港區': '台北市', '文山區': '台北市',
+}
+
+CHINESE_DIGITS = {'零': 0, '一': 1, '二': 2, '三': 3, '四': 4, '五': 5, '六': 6, '七': 7, '八': 8, '九': 9}
+
+WHITESPACE_RE = re.compile(r'\s+')
+CHINESE_NUMBER_UNIT_RE = re.compile(r'([零一二三四五六七八九十]+)(段|巷|弄|號|樓)')
+ADDRESS_RE = re.compile(
+    r'^(?P<city>[^\d]{2}[市縣])?'
+    r'(?P<district>[^\d]{1,3}?[區鄉鎮市])?'
+    r'(?P<road>[^\d]+?(?:大道|路|街))?'
+    r'(?:(?P<section>\d+)段)?'
+    r'(?:(?P<lane>\d+)巷)?'
+    r'(?:(?P<alley>\d+)弄)?'
+    r'(?:(?P<number>\d+(?:之\d+)?)號)?'
+    r'(?P<rest>.*)$'
+)
+
+
+class CanonicalAddress(NamedTuple):
+    """標準化地址"""
+    city: str = ''
+    district: str = ''
+    road: str = ''
+    section: str = ''
+    lane: str = ''
+    alley: str = ''
+    number: str = ''
+    rest: str = ''
+
+    @property
+    def key(self) -> str:
+        """用於比對與索引的標準鍵"""
+        return '|'.join(self)
+
+
+def _chinese_to_int(text: str) -> int:
+    """轉換一到九十九的中文數字"""
+    if '十' not in text:
+        value = 0
+        for ch in text:
+            value = value * 10 + CHINESE_DIGITS[ch]
+        return value
+
+    tens, _, ones = text.partition('十')
+    return (CHINESE_DIGITS.get(tens, 1) if tens else 1) * 10 + (CHINESE_DIGITS.get(ones, 0) if ones else 0)
+
+
+def clean_address(raw: str) -> str:
+    """統一全形/半形、移除空白、統一「臺」與中文數字"""
+    text = unicodedata.normalize('NFKC', raw or '')
+    text = WHITESPACE_RE.sub('', text).replace('臺', '台')
+    return CHINESE_NUMBER_UNIT_RE.sub(lambda m: f"{_chinese_to_int(m.group(1))}{m.group(2)}", text)
+
+
+def normalize_address(raw: str, default_city: Optional[str] = None) -> CanonicalAddress:
+    """將原始地址轉為標準形式"""
+    text = clean_address(raw)
+    match = ADDRESS_RE.match(text)
+    parts = {name: value or '' for name, value in match.groupdict().items()}
+
+    if not parts['city']:
+        parts['city'] = DISTRICT_CITY.get(parts['district'], default_city or '')
+
+    for name in ('section', 'lane', 'alley'):
+        if parts[name]:
+            parts[name] = str(int(parts[name]))
+
+    return CanonicalAddress(**parts)
+
+
+class AddressIndex:
+    """原始地址到標準鍵的持久化對照表"""
+
+    def __init__(self, path: Optional[str] = None, default_city: Optional[str] = None):
+        self.path = path
+        self.default_city = default_city
+        self.keys: Dict[str, str] = {}
+        self._dirty = False
+
+    def key(self, raw: str) -> str:
+        """取得原始地址的標準鍵（已知地址直接查表）"""
+        raw = raw or ''
+        key = self.keys.get(raw)
+        if key is None:
+            key = normalize_address(raw, self.default_city).key
+            self.keys[raw] = key
+            self._dirty = True
+        return key
+
+    def load(self, path: Optional[str] = None) -> int:
+        """從檔案載入對照表（預設為 self.path），回傳筆數"""
+        path = path or self.path
+        if not path or not os.path.exists(path):
+            return 0
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  無法載入地址對照表 {path}: {e}")
+            return 0
+
+        if data.get('version') == INDEX_VERSION:
+            self.keys.update(data.get('keys', {}))
+        return len(self.keys)
+
+    def save(self):
+        """有新增地址時寫入對照表"""
+        if not self.path or not self._dirty:
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with atomic_write(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'keys': self.keys}, f, ensure_ascii=False)
+        self._dirty = False
@@ -0,0 +1,205 @@
+"""
+時間點查詢（as-of）
+查詢某個時間點市場上的所有物件，或某個物件在當時的資料：
+先以物件資料庫的索引找出當時最近一次完成的執行（runs）再讀取 observations，
+資料庫沒有涵蓋的時間改由快照清單（每日快照與壓縮檔）找出對應的檔案
+"""
+
+import argparse
+import os
+import time
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from .compaction import CompactedSnapshots
+from .listing_store import ListingStore
+from .manifest import MANIFEST_FILENAME, SnapshotManifest
+from .serialization import dumps, loads
+from .snapshot import read_snapshot, write_snapshot
+from .snapshot_archive import ARCHIVE_EXTENSION, SnapshotArchive
+
+DEFAULT_DATA_DIRS = ("data", "./previous_data")
+
+TimePoint = Union[str, date, datetime]
+
+
+def as_of_text(at: TimePoint) -> str:
+    """查詢時間轉為可與 run_at 比較的字串；只有日期時包含當天所有的執行"""
+    if isinstance(at, datetime):
+        return at.isoformat()
+    if isinstance(at, date):
+        return f"{at.isoformat()}T23:59:59.999999"
+    text = str(at).strip()
+    if len(text) == 10:
+        return f"{text}T23:59:59.999999"
+    return datetime.fromisoformat(text).isoformat()
+
+
+def _object_id(record: Dict[str, Any]) -> Optional[str]:
+    object_id = record.get('object_id') or record.get('id')
+    return str(object_id) if object_id else None
+
+
+class AsOfQuery:
+    """時間點查詢"""
+
+    def __init__(self, store: ListingStore, data_dirs: Sequence[str] = DEFAULT_DATA_DIRS):
+        self.store = store
+        self.data_dirs = data_dirs
+        self._manifests: Optional[List[SnapshotManifest]] = None
+
+    @property
+    def manifests(self) -> List[SnapshotManifest]:
+        if self._manifests is None:
+            self._manifests = []
+            for data_dir in self.data_dirs:
+                manifest = SnapshotManifest(os.path.join(data_dir, MANIFEST_FILENAME))
+                if manifest.load():
+                    self._manifests.append(manifest)
+        return self._manifests
+
+    def run_as_of(self, region: str, at: TimePoint):
+        """at 當時最近一次完成的執行"""
+        return self.store.conn.execute(
+            """
+            SELECT * FROM runs WHERE region = ? AND complete = 1 AND run_at <= ?
+            ORDER BY run_at DESC LIMIT 1
+            """,
+            (region, as_of_text(at)),
+        ).fetchone()
+
+    def _snapshot_file_as_of(self, region: str, at: str) -> Optional[Dict[str, Any]]:
+        """清單中 at 當時最近的快照：{'timestamp', 'path'} 或壓縮檔 {'timestamp', 'path', 'compacted'}"""
+        best = None
+        for manifest in self.manifests:
+            for entry in manifest.entries(region):
+                if entry.get('complete') and entry['timestamp'] <= at and (best is None or entry['timestamp'] > best['timestamp']):
+                    best = {'timestamp': entry['timestamp'], 'path': manifest.resolve(entry)}
+            for entry in manifest.compacted.get(region, []):
+                if entry['start'] <= at and (best is None or entry['start'] > best['timestamp']):
+                    best = {'timestamp': min(entry['end'], at), 'path': manifest.resolve(entry), 'compacted': True}
+        return best
+
+    def _read_file_snapshot(self, source: Dict[str, Any], at: str) -> List[Dict[str, Any]]:
+        if not source.get('compacted'):
+            return read_snapshot(source['path'])
+        compacted = CompactedSnapshots.open(source['path'])
+        position = max(index for index, timestamp in enumerate(compacted.timestamps) if timestamp <= at)
+        return compacted.snapshot(position)
+
+    def source_as_of(self, region: str, at: TimePoint) -> Optional[Dict[str, Any]]:
+        """at 當時的資料來源（資料庫的執行或快照檔案），取兩者中較新的一個"""
+        at_text = as_of_text(at)
+        run = self.run_as_of(region, at_text)
+        source = {'timestamp': run['run_at'], 'run_id': run['run_id']} if run else None
+
+        file_source = self._snapshot_file_as_of(region, at_text)
+        if file_source and (source is None or file_source['timestamp'] > source['timestamp']):
+            source = file_source
+        return source
+
+    def listings_as_of(self, region: str, at: TimePoint) -> List[Dict[str, Any]]:
+        """at 當時市場上的所有物件"""
+        source = self.source_as_of(region, at)
+        if source is None:
+            return []
+        if 'run_id' in source:
+            return self.store.run_listings(source['run_id'])
+        return self._read_file_snapshot(source, as_of_text(at))
+
+    def region_of(self, object_id: str) -> Optional[str]:
+        row = self.store.conn.execute("SELECT region FROM listings WHERE object_id = ?", (object_id,)).fetchone()
+        return row[0] if row else None
+
+    def listing_as_of(self, object_id: str, at: TimePoint, region: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        at 當時的物件資料，當時不在市場上時回傳 None
+        物件不在資料庫中（只存在於快照檔案）時需要指定 region
+        """
+        object_id = str(object_id)
+        region = region or self.region_of(object_id)
+        if region is None:
+            raise ValueError(f"物件資料庫中沒有物件 {object_id}，請指定 region")
+
+        source = self.source_as_of(region, at)
+        if source is None:
+            return None
+        if 'run_id' in source:
+            row = self.store.conn.execute(
+                "SELECT data FROM observations WHERE run_id = ? AND object_id = ?", (source['run_id'], object_id)
+            ).fetchone()
+            return loads(row[0]) if row else None
+
+        if not source.get('compacted') and source['path'].endswith(ARCHIVE_EXTENSION):
+            # 完整快照以 object_id 索引直接讀取，只解壓縮所在的區塊
+            with SnapshotArchive(source['path']) as archive:
+                return archive.get(object_id)
+
+        for record in self._read_file_snapshot(source, as_of_text(at)):
+            if _object_id(record) == object_id:
+                return record
+        return None
+
+    def last_known(self, object_id: str, at: TimePoint) -> Optional[Dict[str, Any]]:
+        """at 之前最後一次看到的物件資料（已下架的物件也可查到）"""
+        row = self.store.conn.execute(
+            """
+            SELECT data FROM observations WHERE object_id = ? AND observed_date <= ?
+            ORDER BY observed_date DESC LIMIT 1
+            """,
+            (str(object_id), as_of_text(at)[:10]),
+        ).fetchone()
+        return loads(row[0]) if row else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='時間點查詢')
+    parser.add_argument('--db', default='data/listings.db', help='資料庫路徑')
+    parser.add_argument('--data-dir', action='append', default=None, help='快照資料目錄（可重複指定）')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    listings_parser = subparsers.add_parser('listings', help='某個時間點市場上的所有物件')
+    listings_parser.add_argument('region')
+    listings_parser.add_argument('at', help='日期或時間，如 2025-01-01 或 2025-01-01T09:00:00')
+    listings_parser.add_argument('--output', help='另存為 JSON 快照')
+
+    listing_parser = subparsers.add_parser('listing', help='某個物件在某個時間點的資料')
+    listing_parser.add_argument('object_id')
+    listing_parser.add_argument('at')
+    listing_parser.add_argument('--region')
+    listing_parser.add_argument('--last-known', action='store_true', help='當時不在市場上時顯示最後一次看到的資料')
+
+    args = parser.parse_args()
+
+    with ListingStore(args.db) as store:
+        query = AsOfQuery(store, args.data_dir or DEFAULT_DATA_DIRS)
+        start = time.perf_counter()
+        if args.command == 'listings':
+            source = query.source_as_of(args.region, args.at)
+            records = query.listings_as_of(args.region, args.at)
+            elapsed = (time.perf_counter() - start) * 1000
+            if source is None:
+                print(f"❌ {args.at} 之前沒有 {args.region} 的資料")
+                return
+            print(f"📅 {args.region} 於 {args.at}（資料時間 {source['timestamp']}）: {len(records)} 個物件，{elapsed:.1f} ms")
+            if args.output:
+                write_snapshot(args.output, records, compact=False)
+                print(f"📁 已儲存到: {args.output}")
+        elif args.command == 'listing':
+            try:
+                record = query.listing_as_of(args.object_id, args.at, args.region)
+            except ValueError as e:
+                print(f"❌ {e}")
+                return
+            if record is None and args.last_known:
+                record = query.last_known(args.object_id, args.at)
+            elapsed = (time.perf_counter() - start) * 1000
+            if record is None:
+                print(f"❌ {args.at} 時沒有物件 {args.object_id}")
+                return
+            print(dumps(record, indent=True).decode('utf-8'))
+            print(f"⏱️  {elapsed:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+歷史快照回填
+找出各資料目錄中所有既有的 *_houses_*.hsa / *.json 快照，在多行程中讀取並統一欄位
+（台北的舊資料沒有 total_price、age 等欄位），依時間順序寫入物件資料庫；
+已匯入的快照會略過，中斷後重新執行即可接續
+"""
+
+import argparse
+import os
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .listing_store import ListingStore
+from .manifest import SNAPSHOT_NAME_RE, list_snapshot_files
+from .parse_pool import ParsePool
+from .snapshot import read_snapshot
+
+DEFAULT_DATA_DIRS = ("./previous_data", "data")
+
+# 各區域爬蟲固定寫入的欄位，舊快照缺少時補上
+REGION_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    'sanchong_luzhou': {
+        'district': '三重蘆洲',
+        'region': '新北市',
+        'building_type': '華廈/大樓',
+        'id_prefix': 'sinyi_sanchong_luzhou_',
+    },
+    'taipei': {
+        'district': '台北',
+        'region': '台北市',
+        'building_type': None,
+        'id_prefix': 'taipei_',
+    },
+}
+
+# 所有物件都有的欄位（Property.to_dict 中爬蟲會用到的部分），缺少時補 None
+NORMALIZED_FIELDS = (
+    'id', 'object_id', 'title', 'address', 'district', 'region', 'price', 'total_price',
+    'room_count', 'living_room_count', 'bathroom_count', 'size', 'main_area', 'floor', 'age',
+    'building_type', 'source_site', 'source_url', 'property_type',
+)
+
+# 同時在子行程中讀取的快照數（每個行程兩個），限制主行程暫存的資料量
+PENDING_PER_WORKER = 2
+
+# 回填任務：(路徑, 區域, 執行時間 isoformat)
+BackfillTask = Tuple[str, str, str]
+
+
+def normalize_record(record: Dict[str, Any], region: str) -> Dict[str, Any]:
+    """補齊不同時期、不同區域快照缺少的欄位（不覆蓋既有的值）"""
+    defaults = REGION_DEFAULTS.get(region, {})
+    normalized = dict(record)
+
+    object_id = normalized.get('object_id')
+    if not object_id:
+        record_id = str(normalized.get('id') or '')
+        prefix = defaults.get('id_prefix', '')
+        if prefix and record_id.startswith(prefix):
+            object_id = record_id[len(prefix):]
+        elif normalized.get('source_url'):
+            object_id = str(normalized['source_url']).rstrip('/').split('/')[-1].split('?')[0]
+        normalized['object_id'] = object_id or None
+    if not normalized.get('id') and normalized.get('object_id'):
+        normalized['id'] = f"{defaults.get('id_prefix', '')}{normalized['object_id']}"
+
+    if normalized.get('total_price') is None:
+        normalized['total_price'] = normalized.get('price')
+    if normalized.get('price') is None:
+        normalized['price'] = normalized.get('total_price')
+    for name in ('district', 'region', 'building_type'):
+        if normalized.get(name) is None and defaults.get(name) is not None:
+            normalized[name] = defaults[name]
+    normalized.setdefault('source_site', '信義房屋')
+    normalized.setdefault('property_type', 'sale')
+
+    for name in NORMALIZED_FIELDS:
+        normalized.setdefault(name, None)
+    return normalized
+
+
+def discover_snapshots(data_dirs: Sequence[str] = DEFAULT_DATA_DIRS,
+                       regions: Optional[Sequence[str]] = None) -> List[BackfillTask]:
+    """找出所有快照檔案，同名檔案（如 previous_data 與 data 中的副本）只取一個，依區域與時間排序"""
+    found: Dict[str, BackfillTask] = {}
+    for data_dir in data_dirs:
+        if not os.path.isdir(data_dir):
+            continue
+        for filename in list_snapshot_files(os.listdir(data_dir)):
+            match = SNAPSHOT_NAME_RE.match(filename)
+            if filename in found:
+                continue
+            region = match.group('region')
+            if regions and region not in regions:
+                continue
+            run_at = datetime.strptime(match.group('date') + match.group('time'), '%Y%m%d%H%M%S')
+            found[filename] = (os.path.join(data_dir, filename), region, run_at.isoformat())
+    return sorted(found.values(), key=lambda task: (task[1], task[2]))
+
+
+def load_task(task: BackfillTask) -> Tuple[BackfillTask, Optional[List[Dict[str, Any]]], Optional[str]]:
+    """在子行程中讀取並統一一個快照，回傳 (任務, 物件, 錯誤訊息)"""
+    path, region, _ = task
+    try:
+        records = read_snapshot(path)
+    except (OSError, ValueError) as e:
+        return task, None, str(e)
+    if not isinstance(records, list):
+        return task, None, "不是物件陣列"
+    return task, [normalize_record(record, region) for record in records if isinstance(record, dict)], None
+
+
+class Backfill:
+    """將既有快照回填到物件資料庫"""
+
+    def __init__(self, store: ListingStore, workers: Optional[int] = None, progress_every: int = 10):
+        self.store = store
+        self.workers = workers
+        self.progress_every = progress_every
+        self.stats = {'files': 0, 'skipped': 0, 'failed': 0, 'records': 0, 'seconds': 0.0}
+
+    def pending(self, tasks: Sequence[BackfillTask]) -> List[BackfillTask]:
+        """排除已匯入的快照（資料庫本身就是進度紀錄）"""
+        imported = {
+            (row[0], row[1]) for row in self.store.conn.execute("SELECT region, snapshot_path FROM runs")
+        }
+        remaining = [task for task in tasks if (task[1], os.path.basename(task[0])) not in imported]
+        self.stats['skipped'] += len(tasks) - len(remaining)
+        return remaining
+
+    def _store(self, task: BackfillTask, records: List[Dict[str, Any]]):
+        path, region, run_at = task
+        # 價格歷史最後依日期一次重建，避免逐次匯入舊資料時反覆重算
+        self.store.import_snapshot(region, records, datetime.fromisoformat(run_at),
+                                   snapshot_path=os.path.basename(path), update_history=False)
+
+    def _report(self, total: int):
+        elapsed = time.perf_counter() - self._started
+        rate = self.stats['records'] / elapsed if elapsed else 0
+        print(f"  📥 {self.stats['files']}/{total} 個快照，{self.stats['records']:,} 筆，{rate:,.0f} 筆/秒")
+
+    def run(self, tasks: Sequence[BackfillTask]) -> Dict[str, Any]:
+        """讀取在子行程中平行進行，寫入依時間順序在主行程進行（每個快照一個交易）"""
+        tasks = self.pending(tasks)
+        self._started = time.perf_counter()
+        regions = set()
+
+        with ParsePool(self.workers) as pool:
+            window = max(1, pool.max_workers * PENDING_PER_WORKER)
+            queue = deque()
+            remaining = iter(tasks)
+            for task in remaining:
+                queue.append(pool.submit(load_task, task))
+                if len(queue) >= window:
+                    break
+
+            while queue:
+                task, records, error = queue.popleft().result()
+                next_task = next(remaining, None)
+                if next_task is not None:
+                    queue.append(pool.submit(load_task, next_task))
+
+                if error is not None:
+                    print(f"⚠️  無法載入 {task[0]}: {error}")
+                    self.stats['failed'] += 1
+                    continue
+
+                self._store(task, records)
+                regions.add(task[1])
+                self.stats['files'] += 1
+                self.stats['records'] += len(records)
+                if self.stats['files'] % self.progress_every == 0:
+                    self._report(len(tasks))
+
+        # 包含先前中斷、已匯入但尚未重建價格歷史的區域
+        with self.store.conn:
+            for region in sorted(regions | set(self.store.price_history.stale_regions())):
+                self.store.price_history.rebuild(region)
+
+        self.stats['seconds'] = time.perf_counter() - self._started
+        return self.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='將既有快照回填到物件資料庫')
+    parser.add_argument('--db', default='data/listings.db', help='資料庫路徑')
+    parser.add_argument('--data-dir', action='append', default=None, help='資料目錄（可重複指定，預設 previous_data 與 data）')
+    parser.add_argument('--region', action='append', default=None, help='只匯入指定區域')
+    parser.add_argument('--workers', type=int, default=None, help='讀取行程數量（預設依 CRAWLER_PARSE_WORKERS 或 CPU 核心數）')
+    parser.add_argument('--dry-run', action='store_true', help='只列出尚未匯入的快照')
+    args = parser.parse_args()
+
+    tasks = discover_snapshots(args.data_dir or DEFAULT_DATA_DIRS, args.region)
+    print(f"🔍 找到 {len(tasks)} 個快照")
+
+    with ListingStore(args.db) as store:
+        backfill = Backfill(store, workers=args.workers)
+        if args.dry_run:
+            for path, region, run_at in backfill.pending(tasks):
+                print(f"  • {region} {run_at} {path}")
+            return
+
+        stats = backfill.run(tasks)
+        rate = stats['records'] / stats['seconds'] if stats['seconds'] else 0
+        print(f"✅ 匯入 {stats['files']} 個快照、{stats['records']:,} 筆（{rate:,.0f} 筆/秒），"
+              f"略過已匯入 {stats['skipped']} 個，失敗 {stats['failed']} 個")
+
+
+if __name__ == "__main__":
+    main()
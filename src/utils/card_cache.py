@@ -0,0 +1,139 @@
+"""
+列表卡片解析快取
+以卡片文字的雜湊值為鍵，保存解析後的欄位字典，依筆數做 LRU 淘汰並持久化到 JSON 檔案；
+檔案中記錄解析器版本，解析邏輯變更後舊的快取結果不會再被使用
+"""
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from .storage import atomic_write
+
+# 2：檔案中記錄解析器版本
+# 3：標題只保存不查社區名稱字典的解析結果（字典查詢在快取之外）
+CACHE_VERSION = 3
+
+
+def card_key(*parts: str) -> str:
+    """由卡片的標題與文字片段產生快取鍵"""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update((part or "").encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+class CardCache:
+    """卡片解析結果的 LRU 快取"""
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 5000, parser_version: str = ''):
+        """parser_version：產生快取結果的解析器版本，與檔案中記錄的不同時不載入"""
+        self.path = path
+        self.max_entries = max_entries
+        self.parser_version = parser_version
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        # 自上次 report() 後的變動，解析行程用來回報給主行程
+        self._new_entries: Dict[str, Dict[str, Any]] = {}
+        self._hit_keys: List[str] = []
+        self._miss_count = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """取得快取結果，命中時移到最近使用的位置"""
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            self._miss_count += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        self._hit_keys.append(key)
+        return value
+
+    def put(self, key: str, value: Dict[str, Any]):
+        """寫入快取，超過上限時淘汰最久未使用的項目"""
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        self._new_entries[key] = value
+        self._evict()
+
+    def _evict(self):
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def report(self) -> Dict[str, Any]:
+        """取出自上次回報後的命中統計與新增項目"""
+        report = {
+            'hits': len(self._hit_keys),
+            'misses': self._miss_count,
+            'hit_keys': self._hit_keys,
+            'entries': self._new_entries,
+        }
+        self._hit_keys = []
+        self._new_entries = {}
+        self._miss_count = 0
+        return report
+
+    def absorb(self, report: Dict[str, Any]):
+        """合併解析行程回報的結果"""
+        self.hits += report.get('hits', 0)
+        self.misses += report.get('misses', 0)
+
+        for key in report.get('hit_keys', []):
+            if key in self.entries:
+                self.entries.move_to_end(key)
+
+        for key, value in report.get('entries', {}).items():
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+        self._evict()
+
+    @property
+    def hit_rate(self) -> float:
+        """命中率（0-1）"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def load(self, path: Optional[str] = None) -> int:
+        """從檔案載入快取（預設為 self.path），回傳載入筆數"""
+        path = path or self.path
+        if not path or not os.path.exists(path):
+            return 0
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  無法載入卡片快取 {path}: {e}")
+            return 0
+
+        if data.get('version') != CACHE_VERSION or data.get('parser') != self.parser_version:
+            return 0
+
+        # 檔案中由舊到新排列
+        for key, value in data.get('entries', []):
+            self.entries[key] = value
+        self._evict()
+        return len(self.entries)
+
+    def save(self):
+        """以原子替換的方式寫入快取檔案"""
+        if not self.path:
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with atomic_write(self.path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': CACHE_VERSION,
+                'parser': self.parser_version,
+                'entries': list(self.entries.items()),
+            }, f, ensure_ascii=False)
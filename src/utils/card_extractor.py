@@ -0,0 +1,208 @@
+"""
+列表卡片欄位融合解析器
+一次呼叫解析出價格、地址、房型、坪數、樓層、屋齡，正則表達式全部預先編譯
+"""
+
+import re
+from datetime import datetime
+from typing import Dict, Any
+
+# 價格（萬元）；原本的 r'(\d{3,4})\s*萬' 是第一個模式的子集，不需要再掃描
+PRICE_RE = re.compile(r'(\d{1,4}(?:,\d{3})*(?:\.\d+)?)\s*萬')
+TOTAL_PRICE_RE = re.compile(r'總價[：:\s]*(\d{1,4}(?:,\d{3})*(?:\.\d+)?)')
+
+# 地址（卡片文字中地址後直接接著屋齡、坪數等欄位，從這些欄位開始的部分截掉）
+CITY_ADDRESS_RE = re.compile(r'(新北市(?:三重|蘆洲)區[^，\n]{0,30})')
+DISTRICT_ADDRESS_RE = re.compile(r'((?:三重|蘆洲)區[^，\n]{0,30})')
+ADDRESS_END_RE = re.compile(r'屋齡|民國|建坪|總坪數|主建物|總價|\d+(?:\.\d+)?\s*(?:年|坪|房|樓|萬|R|F)')
+
+# 房型
+ROOM_FULL_RE = re.compile(r'(\d+)房(\d+)廳(\d+)衛')
+ROOM_RLB_RE = re.compile(r'(\d+)R(\d+)L(\d+)B')
+ROOM_ONLY_RE = re.compile(r'(\d+)\s*房')
+
+# 坪數
+BUILDING_SIZE_RE = re.compile(r'建坪[：:\s]*(\d+(?:\.\d+)?)')
+TOTAL_SIZE_RE = re.compile(r'總坪數[：:\s]*(\d+(?:\.\d+)?)')
+PING_RE = re.compile(r'(\d+(?:\.\d+)?)\s*坪')
+MAIN_AREA_RE = re.compile(r'主建物[：:\s]*(\d+(?:\.\d+)?)')
+
+# 樓層
+FLOOR_PAIR_RE = re.compile(r'(\d+)樓/(\d+)樓')
+FLOOR_F_PAIR_RE = re.compile(r'(\d+)F/(\d+)F')
+FLOOR_RE = re.compile(r'(\d+)樓')
+FLOOR_F_RE = re.compile(r'(\d+)F')
+
+# 屋齡
+AGE_RE = re.compile(r'屋齡[：:\s]*(\d+(?:\.\d+)?)\s*年')
+AGE_HOUSE_RE = re.compile(r'(\d+(?:\.\d+)?)\s*年屋')
+ROC_YEAR_RE = re.compile(r'民國\s*(\d+)\s*年')
+
+WHITESPACE_RE = re.compile(r'\s+')
+
+# 解析結果改變時遞增（卡片快取以此判斷舊的結果是否可用）
+EXTRACTOR_VERSION = 3
+
+
+def clean_text(text: str) -> str:
+    """清理文字"""
+    if not text:
+        return ""
+    return WHITESPACE_RE.sub(' ', str(text)).strip()
+
+
+def extract_card_fields(text: str) -> Dict[str, Any]:
+    """
+    一次解析卡片文字中的所有欄位
+
+    結果與 SanchongLuzhouCrawler 的 extract_price、extract_address、
+    extract_room_info、extract_size_info、extract_floor_info、extract_age_info
+    完全一致；每個模式先以關鍵字檢查，文字中沒有關鍵字就不執行正則掃描
+    """
+    return {
+        'price': _extract_price(text),
+        'address': _extract_address(text),
+        **_extract_rooms(text),
+        **_extract_sizes(text),
+        'floor': _extract_floor(text),
+        'age': _extract_age(text),
+    }
+
+
+def _extract_price(text: str) -> float:
+    """提取價格（萬元）"""
+    if '萬' in text:
+        match = PRICE_RE.search(text)
+        if match:
+            return float(match.group(1).replace(',', ''))
+
+    if '總價' in text:
+        match = TOTAL_PRICE_RE.search(text)
+        if match:
+            return float(match.group(1).replace(',', ''))
+
+    return 0
+
+
+def _extract_address(text: str) -> str:
+    """提取地址"""
+    if '區' in text:
+        match = None
+        if '新北市' in text:
+            match = CITY_ADDRESS_RE.search(text)
+        if not match:
+            match = DISTRICT_ADDRESS_RE.search(text)
+        if match:
+            return clean_text(ADDRESS_END_RE.split(match.group(1), 1)[0])
+
+    if '三重' in text:
+        return "三重區"
+    elif '蘆洲' in text:
+        return "蘆洲區"
+    else:
+        return "三重蘆洲區"
+
+
+def _extract_rooms(text: str) -> Dict[str, int]:
+    """提取房型資訊"""
+    has_room = '房' in text
+
+    if has_room and '衛' in text:
+        match = ROOM_FULL_RE.search(text)
+        if match:
+            rooms, living_rooms, bathrooms = (int(g) for g in match.groups())
+            if 1 <= rooms <= 10 and 1 <= living_rooms <= 5 and 1 <= bathrooms <= 5:
+                return {'rooms': rooms, 'living_rooms': living_rooms, 'bathrooms': bathrooms}
+
+    if 'R' in text:
+        match = ROOM_RLB_RE.search(text)
+        if match:
+            rooms, living_rooms, bathrooms = (int(g) for g in match.groups())
+            if 1 <= rooms <= 10 and 1 <= living_rooms <= 5 and 1 <= bathrooms <= 5:
+                return {'rooms': rooms, 'living_rooms': living_rooms, 'bathrooms': bathrooms}
+
+    if has_room:
+        match = ROOM_ONLY_RE.search(text)
+        if match:
+            rooms = int(match.group(1))
+            if 1 <= rooms <= 10:
+                return {'rooms': rooms, 'living_rooms': 2, 'bathrooms': 2}
+
+    return {'rooms': 3, 'living_rooms': 2, 'bathrooms': 2}
+
+
+def _extract_sizes(text: str) -> Dict[str, float]:
+    """提取坪數資訊"""
+    total_size = 0
+
+    if '坪' in text:
+        match = None
+        if '建坪' in text:
+            match = BUILDING_SIZE_RE.search(text)
+        if not match and '總坪數' in text:
+            match = TOTAL_SIZE_RE.search(text)
+        if not match:
+            match = PING_RE.search(text)
+        if match:
+            total_size = float(match.group(1))
+
+    main_match = MAIN_AREA_RE.search(text) if '主建物' in text else None
+    main_area = float(main_match.group(1)) if main_match else total_size * 0.8
+
+    return {'total_size': total_size, 'main_area': main_area}
+
+
+def _extract_floor(text: str) -> str:
+    """提取樓層資訊"""
+    has_lou = '樓' in text
+    has_f = 'F' in text
+
+    if has_lou:
+        match = FLOOR_PAIR_RE.search(text)
+        if match:
+            return f"{match.group(1)}樓/{match.group(2)}樓"
+
+    if has_f:
+        match = FLOOR_F_PAIR_RE.search(text)
+        if match:
+            return f"{match.group(1)}樓/{match.group(2)}樓"
+
+    if has_lou:
+        match = FLOOR_RE.search(text)
+        if match:
+            return f"{match.group(1)}樓"
+
+    if has_f:
+        match = FLOOR_F_RE.search(text)
+        if match:
+            return f"{match.group(1)}樓"
+
+    return "未知樓層"
+
+
+def _extract_age(text: str) -> int:
+    """提取屋齡"""
+    if '年' not in text:
+        return 0
+
+    if '屋齡' in text:
+        match = AGE_RE.search(text)
+        if match:
+            return int(float(match.group(1)))
+
+    if '年屋' in text:
+        match = AGE_HOUSE_RE.search(text)
+        if match:
+            return int(float(match.group(1)))
+
+    if '民國' in text:
+        match = ROC_YEAR_RE.search(text)
+        if match:
+            age = float(match.group(1))
+            # 如果是民國年份，轉換為屋齡
+            if age > 50:
+                current_year = datetime.now().year - 1911  # 民國年
+                age = current_year - age
+            return int(age)
+
+    return 0
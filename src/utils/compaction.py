@@ -0,0 +1,377 @@
+"""
+快照壓縮與保留
+超過保留天數的每日快照併入每週壓縮檔，超過保留週數的每週壓縮檔再併入每月壓縮檔；
+壓縮檔中相同狀態的物件只存一次，並記錄它出現在哪些快照（連續區間），
+寫入後逐一比對每個快照重建的結果，全部相符才刪除原本的檔案
+"""
+
+import argparse
+import os
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .manifest import MANIFEST_FILENAME, SnapshotManifest, file_checksum
+from .serialization import dump_file, dumps, load_file
+from .snapshot import decode_snapshot, encode_snapshot, read_snapshot
+from .snapshot_archive import archive_path_for
+from .storage import FileLock, temporary_path
+
+COMPACTED_FORMAT = 'house-compacted'
+COMPACTED_VERSION = 1
+
+# 每次爬取都會更新的時間欄位，不視為物件狀態的變動（壓縮後保留該狀態第一次出現時的值）
+VOLATILE_FIELDS = ('created_at', 'updated_at', 'crawl_time')
+
+
+@dataclass
+class RetentionPolicy:
+    """保留策略"""
+    keep_daily: int = 14  # 每日快照保留天數
+    keep_weekly: int = 8  # 每週壓縮檔保留週數，之後併入每月壓縮檔
+    keep_monthly: Optional[int] = None  # 每月壓縮檔保留月數（None 表示全部保留）
+
+
+def _state_key(record: Dict[str, Any]) -> bytes:
+    return dumps(sorted((name, value) for name, value in record.items() if name not in VOLATILE_FIELDS))
+
+
+def compact_snapshots(snapshots: Sequence[Tuple[str, List[Dict[str, Any]]]]) -> Dict[str, Any]:
+    """
+    將多個快照 [(時間, 物件清單), ...]（依時間排序）合併為壓縮檔結構：
+    records 為不重複的物件狀態，spans[i] 為第 i 個狀態出現的快照區間 [[起, 迄], ...]
+    """
+    index: Dict[Tuple[bytes, int], int] = {}
+    records: List[Dict[str, Any]] = []
+    spans: List[List[List[int]]] = []
+
+    for position, (_, snapshot) in enumerate(snapshots):
+        # 同一個快照中完全相同的物件以出現次數區分，重建後筆數不變
+        occurrences: Dict[bytes, int] = {}
+        for record in snapshot:
+            state = _state_key(record)
+            occurrence = occurrences.get(state, 0)
+            occurrences[state] = occurrence + 1
+
+            version = index.get((state, occurrence))
+            if version is None:
+                version = len(records)
+                index[(state, occurrence)] = version
+                records.append(record)
+                spans.append([])
+
+            ranges = spans[version]
+            if ranges and ranges[-1][1] == position - 1:
+                ranges[-1][1] = position
+            else:
+                ranges.append([position, position])
+
+    return {
+        'format': COMPACTED_FORMAT,
+        'version': COMPACTED_VERSION,
+        'snapshots': [{'timestamp': timestamp, 'count': len(snapshot)} for timestamp, snapshot in snapshots],
+        'records': encode_snapshot(records),
+        'spans': spans,
+    }
+
+
+def is_compacted(data: Any) -> bool:
+    return isinstance(data, dict) and data.get('format') == COMPACTED_FORMAT
+
+
+class CompactedSnapshots:
+    """讀取壓縮檔，依時間取回當時的快照"""
+
+    def __init__(self, data: Dict[str, Any]):
+        if data.get('version') != COMPACTED_VERSION:
+            raise ValueError(f"不支援的壓縮檔版本: {data.get('version')}")
+        self.snapshots = data['snapshots']
+        self.records = decode_snapshot(data['records'])
+        self.spans = data['spans']
+
+    @classmethod
+    def open(cls, path: str) -> 'CompactedSnapshots':
+        return cls(load_file(path))
+
+    @property
+    def timestamps(self) -> List[str]:
+        return [snapshot['timestamp'] for snapshot in self.snapshots]
+
+    def snapshot(self, position: int) -> List[Dict[str, Any]]:
+        """第 position 個快照的物件"""
+        return [self.records[version] for version, ranges in enumerate(self.spans)
+                if any(start <= position <= end for start, end in ranges)]
+
+    def __iter__(self) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+        """依序產生 (時間, 物件清單)，一次走訪所有狀態"""
+        members: List[List[Dict[str, Any]]] = [[] for _ in self.snapshots]
+        for version, ranges in enumerate(self.spans):
+            record = self.records[version]
+            for start, end in ranges:
+                for position in range(start, end + 1):
+                    members[position].append(record)
+        return iter(zip(self.timestamps, members))
+
+
+def _comparable(records: List[Dict[str, Any]]) -> List[bytes]:
+    return sorted(_state_key(record) for record in records)
+
+
+def verify_compacted(path: str, snapshots: Sequence[Tuple[str, List[Dict[str, Any]]]]) -> bool:
+    """重新讀取壓縮檔，確認每個快照重建的物件與原本相同（不比較 VOLATILE_FIELDS）"""
+    compacted = CompactedSnapshots.open(path)
+    restored = list(compacted)
+    if [timestamp for timestamp, _ in restored] != [timestamp for timestamp, _ in snapshots]:
+        return False
+    return all(_comparable(got) == _comparable(expected)
+               for (_, got), (_, expected) in zip(restored, snapshots))
+
+
+def compacted_entry(manifest: SnapshotManifest, path: str, kind: str, period: str,
+                    data: Dict[str, Any]) -> Dict[str, Any]:
+    timestamps = [snapshot['timestamp'] for snapshot in data['snapshots']]
+    return {
+        'file': os.path.relpath(path, manifest.directory),
+        'kind': kind,
+        'period': period,
+        'start': timestamps[0],
+        'end': timestamps[-1],
+        'snapshots': len(timestamps),
+        'checksum': file_checksum(path),
+    }
+
+
+def _week_period(day: date) -> str:
+    # 以月份 + ISO 週分組，每週壓縮檔不跨月，之後可直接併入每月壓縮檔
+    return f"{day.year}-{day.month:02d}-W{day.isocalendar()[1]:02d}"
+
+
+def compacted_path(directory: str, region: str, period: str) -> str:
+    return os.path.join(directory, f"{region}_compacted_{period}.json")
+
+
+def _remove_file(path: str):
+    for target in (path, archive_path_for(path)):
+        if os.path.exists(target):
+            os.remove(target)
+
+
+class CompactionJob:
+    """單一區域的壓縮與保留作業"""
+
+    def __init__(self, region: str, data_dir: str = "data", policy: Optional[RetentionPolicy] = None,
+                 today: Optional[date] = None, dry_run: bool = False, carry_from: Sequence[str] = ()):
+        """carry_from：先將這些目錄（如 previous_data/）清單中的快照與壓縮檔複製到 data_dir 再壓縮"""
+        self.region = region
+        self.data_dir = data_dir
+        self.policy = policy or RetentionPolicy()
+        self.today = today or date.today()
+        self.dry_run = dry_run
+        self.carry_from = carry_from
+        self.manifest = SnapshotManifest(os.path.join(data_dir, MANIFEST_FILENAME))
+        self.summary = {'carried_files': 0, 'compacted_snapshots': 0, 'weekly_files': 0, 'monthly_files': 0,
+                        'deleted_files': 0, 'expired_files': 0, 'failed': 0}
+
+    def _protected_files(self, kept: List[Dict[str, Any]]) -> set:
+        """保留中的差異快照所依賴的 parent 鏈（這些檔案暫時不能刪除）"""
+        by_file = {entry['file']: entry for entry in self.manifest.entries(self.region)}
+        protected = set()
+        for entry in kept:
+            parent = entry.get('parent')
+            while parent and parent not in protected:
+                protected.add(parent)
+                parent = by_file.get(parent, {}).get('parent')
+        return protected
+
+    def _compacted_entries(self, kind: str) -> List[Dict[str, Any]]:
+        return [entry for entry in self.manifest.compacted.get(self.region, []) if entry['kind'] == kind]
+
+    def _write_group(self, kind: str, period: str, snapshots: List[Tuple[str, List[Dict[str, Any]]]]) -> bool:
+        """寫入並驗證一個壓縮檔，成功時更新清單"""
+        snapshots = sorted(snapshots, key=lambda item: item[0])
+        path = compacted_path(self.data_dir, self.region, period)
+        if self.dry_run:
+            print(f"  🔍 {os.path.basename(path)}: {len(snapshots)} 個快照")
+            return True
+
+        # 先寫入暫存檔驗證，通過後才取代同一期間既有的壓縮檔
+        data = compact_snapshots(snapshots)
+        candidate = temporary_path(path)
+        dump_file(candidate, data)
+        if not verify_compacted(candidate, snapshots):
+            print(f"❌ {path} 驗證失敗，保留原本的檔案")
+            os.remove(candidate)
+            self.summary['failed'] += 1
+            return False
+        os.replace(candidate, path)
+
+        entries = [entry for entry in self.manifest.compacted.get(self.region, []) if entry['period'] != period]
+        entries.append(compacted_entry(self.manifest, path, kind, period, data))
+        self.manifest.compacted[self.region] = sorted(entries, key=lambda entry: entry['start'])
+        return True
+
+    def _load_compacted(self, entry: Dict[str, Any]) -> List[Tuple[str, List[Dict[str, Any]]]]:
+        return list(CompactedSnapshots.open(self.manifest.resolve(entry)))
+
+    def compact_daily(self):
+        """超過保留天數的每日快照併入每週壓縮檔"""
+        cutoff = (self.today - timedelta(days=self.policy.keep_daily)).isoformat()
+        entries = self.manifest.entries(self.region)
+        old = [entry for entry in entries if entry.get('complete') and entry['date'] < cutoff]
+        kept = [entry for entry in entries if entry not in old]
+        protected = self._protected_files(kept)
+
+        # 被保留的差異快照依賴而暫時留下的檔案已併入壓縮檔（compacted），之後只需刪除
+        removable = [entry['file'] for entry in old if entry.get('compacted') and entry['file'] not in protected]
+
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for entry in old:
+            if entry.get('compacted'):
+                continue
+            groups.setdefault(_week_period(date.fromisoformat(entry['date'])), []).append(entry)
+
+        existing = {entry['period']: entry for entry in self._compacted_entries('weekly')}
+        # 全部寫入後才刪除，後面幾週的差異快照可能以前一週的檔案為基底
+        for period, group in sorted(groups.items()):
+            snapshots = [(entry['timestamp'], read_snapshot(self.manifest.resolve(entry))) for entry in group]
+            # 同一週已有壓縮檔時一起合併
+            if period in existing:
+                merged = {timestamp for timestamp, _ in snapshots}
+                snapshots.extend(item for item in self._load_compacted(existing[period]) if item[0] not in merged)
+            if not self._write_group('weekly', period, snapshots):
+                continue
+
+            self.summary['compacted_snapshots'] += len(group)
+            self.summary['weekly_files'] += 1
+            for entry in group:
+                if entry['file'] in protected:
+                    entry['compacted'] = True
+                else:
+                    removable.append(entry['file'])
+
+        if not self.dry_run:
+            for filename in removable:
+                _remove_file(os.path.join(self.data_dir, filename))
+            self.manifest.remove(self.region, removable)
+        self.summary['deleted_files'] += len(removable)
+
+    def compact_weekly(self):
+        """超過保留週數的每週壓縮檔併入每月壓縮檔"""
+        cutoff = (self.today - timedelta(weeks=self.policy.keep_weekly)).isoformat()
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for entry in self._compacted_entries('weekly'):
+            if entry['end'] < cutoff:
+                groups.setdefault(entry['period'][:7], []).append(entry)
+
+        existing = {entry['period']: entry for entry in self._compacted_entries('monthly')}
+        for period, group in sorted(groups.items()):
+            snapshots = []
+            for entry in group:
+                snapshots.extend(self._load_compacted(entry))
+            if period in existing:
+                merged = {timestamp for timestamp, _ in snapshots}
+                snapshots.extend(item for item in self._load_compacted(existing[period]) if item[0] not in merged)
+            if not self._write_group('monthly', period, snapshots):
+                continue
+
+            self.summary['monthly_files'] += 1
+            if not self.dry_run:
+                for entry in group:
+                    _remove_file(self.manifest.resolve(entry))
+                files = {entry['file'] for entry in group}
+                self.manifest.compacted[self.region] = [
+                    entry for entry in self.manifest.compacted[self.region] if entry['file'] not in files
+                ]
+            self.summary['deleted_files'] += len(group)
+
+    def expire_monthly(self):
+        """刪除超過保留月數的每月壓縮檔"""
+        if self.policy.keep_monthly is None:
+            return
+        monthly = sorted(self._compacted_entries('monthly'), key=lambda entry: entry['period'])
+        expired = monthly[:max(0, len(monthly) - self.policy.keep_monthly)]
+        for entry in expired:
+            print(f"  🗑️  {entry['file']}")
+            if not self.dry_run:
+                _remove_file(self.manifest.resolve(entry))
+        if expired and not self.dry_run:
+            files = {entry['file'] for entry in expired}
+            self.manifest.compacted[self.region] = [
+                entry for entry in self.manifest.compacted[self.region] if entry['file'] not in files
+            ]
+        self.summary['expired_files'] += len(expired)
+
+    def carry_over(self):
+        """複製前一次執行留下的歷史，避免只保留本次執行的快照"""
+        for data_dir in self.carry_from:
+            source = SnapshotManifest(os.path.join(data_dir, MANIFEST_FILENAME))
+            if os.path.abspath(source.directory) == os.path.abspath(self.manifest.directory) or not source.load():
+                continue
+            if self.dry_run:
+                print(f"  🔍 從 {data_dir} 複製 {len(source.entries(self.region))} 個快照、"
+                      f"{len(source.compacted.get(self.region, []))} 個壓縮檔")
+                continue
+            self.summary['carried_files'] += self.manifest.carry_over(source, [self.region])
+
+    def run(self) -> Dict[str, int]:
+        # 整個作業期間鎖定清單：爬蟲行程此時寫入的快照會等作業結束後再記錄，不會被覆蓋
+        with FileLock(self.manifest.path):
+            if not self.manifest.load():
+                # 沒有清單時先掃描目錄建立
+                self.manifest.rebuild()
+            self.carry_over()
+            self.compact_daily()
+            self.compact_weekly()
+            self.expire_monthly()
+            if not self.dry_run:
+                self.manifest.save()
+        return self.summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='快照壓縮與保留')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='壓縮舊快照並套用保留策略')
+    run_parser.add_argument('--region', action='append', default=None, help='區域（可重複指定，預設為清單中的所有區域）')
+    run_parser.add_argument('--data-dir', default='data')
+    run_parser.add_argument('--keep-daily', type=int, default=RetentionPolicy.keep_daily, help='每日快照保留天數')
+    run_parser.add_argument('--keep-weekly', type=int, default=RetentionPolicy.keep_weekly, help='每週壓縮檔保留週數')
+    run_parser.add_argument('--keep-monthly', type=int, default=None, help='每月壓縮檔保留月數（預設全部保留）')
+    run_parser.add_argument('--carry-from', action='append', default=[],
+                            help='先複製這個目錄（如 previous_data）中的快照與壓縮檔（可重複指定）')
+    run_parser.add_argument('--dry-run', action='store_true', help='只顯示會執行的動作')
+
+    show_parser = subparsers.add_parser('show', help='顯示壓縮檔包含的快照')
+    show_parser.add_argument('path')
+
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        policy = RetentionPolicy(args.keep_daily, args.keep_weekly, args.keep_monthly)
+        regions = args.region
+        if not regions:
+            regions = set()
+            for data_dir in [args.data_dir] + args.carry_from:
+                manifest = SnapshotManifest.open(os.path.join(data_dir, MANIFEST_FILENAME))
+                regions.update(manifest.regions, manifest.compacted)
+            regions = sorted(regions)
+        for region in regions:
+            print(f"🗜️  {region}")
+            summary = CompactionJob(region, args.data_dir, policy, dry_run=args.dry_run, carry_from=args.carry_from).run()
+            if summary['carried_files']:
+                print(f"  📥 複製 {summary['carried_files']} 個前一次執行的檔案")
+            print(f"  ✅ 壓縮 {summary['compacted_snapshots']} 個每日快照，"
+                  f"每週 {summary['weekly_files']} 個、每月 {summary['monthly_files']} 個壓縮檔，"
+                  f"刪除 {summary['deleted_files'] + summary['expired_files']} 個檔案")
+            if summary['failed']:
+                print(f"  ⚠️  {summary['failed']} 個壓縮檔驗證失敗")
+    elif args.command == 'show':
+        compacted = CompactedSnapshots.open(args.path)
+        print(f"📦 {len(compacted.records)} 個不重複的物件狀態")
+        for snapshot in compacted.snapshots:
+            print(f"  • {snapshot['timestamp']}: {snapshot['count']} 個物件")
+
+
+if __name__ == "__main__":
+    main()
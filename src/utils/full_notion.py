@@ -3,13 +3,14 @@
 能夠真正創建 Notion 頁面
 """
 
-import json
 import urllib.request
 import urllib.parse
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 
 from ..models.property import Property
+from ..models.property_batch import PropertyBatch
+from .serialization import dumps, loads
 
 
 class FullNotionClient:
@@ -31,11 +32,10 @@ class FullNotionClient:
             req.get_method = lambda: method
             
             if data:
-                req.data = json.dumps(data).encode('utf-8')
+                req.data = dumps(data)
             
             with urllib.request.urlopen(req) as response:
-                response_data = response.read().decode('utf-8')
-                return json.loads(response_data)
+                return loads(response.read())
                 
         except urllib.error.HTTPError as e:
             error_data = e.read().decode('utf-8')
@@ -1098,20 +1098,8 @@ class FullNotionClient:
         if not properties:
             return {}
         
-        prices = [p.total_price for p in properties if p.total_price and p.total_price > 0]
-        sizes = [p.main_area or p.size for p in properties if (p.main_area or p.size) and (p.main_area or p.size) > 0]
-        
-        stats = {}
-        
-        if prices:
-            stats['avg_price'] = sum(prices) / len(prices)
-            stats['min_price'] = min(prices)
-            stats['max_price'] = max(prices)
-        
-        if sizes:
-            stats['avg_size'] = sum(sizes) / len(sizes)
-        
-        return stats
+        batch = PropertyBatch.from_properties(properties, ('price', 'total_price', 'size', 'main_area'), ())
+        return batch.summary_stats(price_fallback=False)
     
     def _create_local_backup(self, properties: List[Property], search_date: datetime):
         """創建本地備份檔案"""
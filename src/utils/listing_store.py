@@ -0,0 +1,364 @@
+"""
+SQLite 物件資料庫
+以 WAL 模式的 SQLite 保存每次執行（runs）、物件（listings，以 object_id 為鍵）與每日觀測（observations），
+前一天資料改為有索引的查詢，並保留匯出 JSON 快照的功能
+"""
+
+import argparse
+import os
+import sqlite3
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from .manifest import SNAPSHOT_NAME_RE, list_snapshot_files
+from .price_history import PRICE_HISTORY_SCHEMA, PriceHistory
+from .serialization import dumps, loads
+from .snapshot import read_snapshot, write_snapshot
+from .snapshot_archive import SUMMARY_FIELDS
+from .storage import FileLock
+
+# 資料表結構變更時遞增（2：新增 price_history；3：新增 observations.summary；4：新增 price_history_stale）
+SCHEMA_VERSION = 4
+
+# 其他行程持有寫入鎖時等待的秒數
+BUSY_TIMEOUT = 30.0
+
+# 每次 executemany 的筆數
+BATCH_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    region TEXT NOT NULL,
+    run_at TEXT NOT NULL,
+    run_date TEXT NOT NULL,
+    listing_count INTEGER NOT NULL DEFAULT 0,
+    snapshot_path TEXT,
+    complete INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_runs_region_date ON runs (region, complete, run_date, run_at);
+
+CREATE TABLE IF NOT EXISTS listings (
+    object_id TEXT PRIMARY KEY,
+    region TEXT NOT NULL,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    last_run_id INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_listings_region_seen ON listings (region, last_seen);
+
+CREATE TABLE IF NOT EXISTS observations (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id),
+    object_id TEXT NOT NULL,
+    observed_date TEXT NOT NULL,
+    price REAL,
+    data TEXT NOT NULL,
+    summary TEXT,
+    PRIMARY KEY (run_id, object_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_observations_object ON observations (object_id, observed_date);
+"""
+
+
+# listings 更新時判斷這次執行是否不早於物件目前記錄的執行（同一天時比較 run_at）
+NEWER_RUN = """(
+    excluded.last_seen > listings.last_seen
+    OR (excluded.last_seen = listings.last_seen
+        AND (SELECT run_at FROM runs WHERE run_id = excluded.last_run_id)
+            >= COALESCE((SELECT run_at FROM runs WHERE run_id = listings.last_run_id), ''))
+)"""
+
+
+def _object_id(record: Dict[str, Any]) -> Optional[str]:
+    object_id = record.get('object_id') or record.get('id')
+    return str(object_id) if object_id else None
+
+
+def _price(record: Dict[str, Any]) -> Optional[float]:
+    price = record.get('total_price') or record.get('price')
+    try:
+        return float(price) if price is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _summary(record: Dict[str, Any]) -> str:
+    """比較用欄位（物件沒有的欄位不放入），存於 observations.summary，載入前一天資料時不需要解析完整物件"""
+    return dumps({name: record[name] for name in SUMMARY_FIELDS if name in record}).decode('utf-8')
+
+
+def _chunks(rows: List[tuple], size: int = BATCH_SIZE) -> Iterable[List[tuple]]:
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+class ListingStore:
+    """物件資料庫"""
+
+    def __init__(self, path: str = "data/listings.db", seed_path: Optional[str] = None):
+        """seed_path：本地資料庫不存在時，先從此檔案複製（例如 GitHub Actions 下載的上一次資料庫）"""
+        self.path = path
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # 多個爬蟲行程同時開啟時，複製種子資料庫與升級結構只由一個行程進行
+        with FileLock(path):
+            if seed_path and not os.path.exists(path) and os.path.exists(seed_path):
+                self._copy_from(seed_path)
+
+            self.conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT)
+            # 寫入交易以 BEGIN IMMEDIATE 開始，一開始就取得寫入鎖，避免兩個行程讀取後升級寫入時互相死結
+            self.conn.isolation_level = 'IMMEDIATE'
+            self.conn.row_factory = sqlite3.Row
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("PRAGMA foreign_keys=ON")
+            self.price_history = PriceHistory(self.conn)
+            self._migrate()
+
+    def _copy_from(self, seed_path: str):
+        """以 SQLite 備份 API 複製（包含尚未合併的 WAL 內容）"""
+        source = sqlite3.connect(seed_path)
+        target = sqlite3.connect(self.path)
+        try:
+            source.backup(target)
+            print(f"📂 從 {seed_path} 複製物件資料庫")
+        finally:
+            target.close()
+            source.close()
+
+    def _migrate(self):
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < SCHEMA_VERSION:
+            with self.conn:
+                self.conn.executescript(SCHEMA + PRICE_HISTORY_SCHEMA)
+                if version == 1:
+                    # 既有的資料庫由 observations 建立價格歷史
+                    for (region,) in self.conn.execute("SELECT DISTINCT region FROM runs").fetchall():
+                        self.price_history.rebuild(region)
+                columns = {row['name'] for row in self.conn.execute("PRAGMA table_info(observations)")}
+                if 'summary' not in columns:
+                    self.conn.execute("ALTER TABLE observations ADD COLUMN summary TEXT")
+                if version in (1, 2):
+                    # 既有的觀察紀錄補上比較用欄位
+                    self.conn.create_function('observation_summary', 1, lambda data: _summary(loads(data)))
+                    self.conn.execute("UPDATE observations SET summary = observation_summary(data) WHERE summary IS NULL")
+                self.conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def close(self):
+        """關閉前合併 WAL，讓資料庫檔案可以單獨複製或上傳"""
+        try:
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def record_run(self, region: str, properties: List[Dict[str, Any]], run_at: Optional[datetime] = None,
+                   snapshot_path: Optional[str] = None, update_history: bool = True) -> int:
+        """
+        在同一個交易中寫入一次執行的所有物件，回傳 run_id
+        update_history=False 時不更新價格歷史（大量匯入舊資料後再以 price_history.rebuild 一次重建）
+        """
+        run_at = run_at or datetime.now()
+        run_at_text = run_at.isoformat()
+        run_date = run_at.date().isoformat()
+
+        observations = []
+        listings = []
+        for record in properties:
+            object_id = _object_id(record)
+            if not object_id:
+                continue
+            data = dumps(record).decode('utf-8')
+            observations.append((object_id, run_date, _price(record), data, _summary(record)))
+            listings.append((object_id, region, run_date, run_date, data))
+
+        # 整個執行在同一個交易中寫入，中斷時不會留下部分資料
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO runs (region, run_at, run_date, listing_count, snapshot_path, complete) VALUES (?, ?, ?, ?, ?, 1)",
+                (region, run_at_text, run_date, len(observations), snapshot_path),
+            )
+            run_id = cursor.lastrowid
+
+            for chunk in _chunks(observations):
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO observations (run_id, object_id, observed_date, price, data, summary) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(run_id,) + row for row in chunk],
+                )
+            # 匯入較舊的快照（如回填）時只往前延伸 first_seen，不以舊資料覆蓋較新的狀態
+            for chunk in _chunks(listings):
+                self.conn.executemany(
+                    f"""
+                    INSERT INTO listings (object_id, region, first_seen, last_seen, last_run_id, data)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (object_id) DO UPDATE SET
+                        first_seen = MIN(listings.first_seen, excluded.first_seen),
+                        region = CASE WHEN {NEWER_RUN} THEN excluded.region ELSE listings.region END,
+                        last_seen = CASE WHEN {NEWER_RUN} THEN excluded.last_seen ELSE listings.last_seen END,
+                        last_run_id = CASE WHEN {NEWER_RUN} THEN excluded.last_run_id ELSE listings.last_run_id END,
+                        data = CASE WHEN {NEWER_RUN} THEN excluded.data ELSE listings.data END
+                    """,
+                    [row[:4] + (run_id, row[4]) for row in chunk],
+                )
+
+            if update_history:
+                # 與 observations 相同，同一個物件重複時以最後一筆為準
+                self.price_history.append_run(region, run_date, {row[0]: row[2] for row in observations})
+            else:
+                self.price_history.mark_stale(region)
+        return run_id
+
+    def previous_run(self, region: str, before: Optional[date] = None) -> Optional[sqlite3.Row]:
+        """before（預設今天）之前最近一次完成的執行；沒有時改用最近一次完成的執行"""
+        before_text = (before or date.today()).isoformat()
+        row = self.conn.execute(
+            """
+            SELECT * FROM runs
+            WHERE region = ? AND complete = 1 AND run_date < ?
+            ORDER BY run_date DESC, run_at DESC LIMIT 1
+            """,
+            (region, before_text),
+        ).fetchone()
+        if row is None:
+            row = self.latest_run(region)
+        return row
+
+    def latest_run(self, region: str) -> Optional[sqlite3.Row]:
+        return self.conn.execute(
+            "SELECT * FROM runs WHERE region = ? AND complete = 1 ORDER BY run_date DESC, run_at DESC LIMIT 1",
+            (region,),
+        ).fetchone()
+
+    def run_listings(self, run_id: int) -> List[Dict[str, Any]]:
+        """某次執行的所有物件（與寫入時相同的字典）"""
+        rows = self.conn.execute("SELECT data FROM observations WHERE run_id = ?", (run_id,))
+        return [loads(row[0]) for row in rows]
+
+    def previous_listings(self, region: str, before: Optional[date] = None) -> List[Dict[str, Any]]:
+        """前一天的物件，找不到時回傳空清單"""
+        run = self.previous_run(region, before)
+        return self.run_listings(run['run_id']) if run else []
+
+    def export_json(self, run_id: int, path: str, compact: bool = False) -> int:
+        """將某次執行匯出為快照檔案（預設為原本的 JSON 陣列格式），回傳筆數"""
+        records = self.run_listings(run_id)
+        write_snapshot(path, records, compact=compact)
+        return len(records)
+
+    def import_snapshot(self, region: str, records: List[Dict[str, Any]], run_at: datetime,
+                        snapshot_path: Optional[str] = None, update_history: bool = True) -> Optional[int]:
+        """匯入既有的快照檔案（同一個快照已匯入時略過）"""
+        if snapshot_path:
+            exists = self.conn.execute(
+                "SELECT 1 FROM runs WHERE region = ? AND snapshot_path = ?", (region, snapshot_path)
+            ).fetchone()
+            if exists:
+                return None
+        return self.record_run(region, records, run_at=run_at, snapshot_path=snapshot_path,
+                               update_history=update_history)
+
+
+def import_snapshot_files(store: ListingStore, region: str, data_dirs: List[str], filename_prefix: str) -> int:
+    """匯入資料目錄中既有的快照檔案，回傳匯入的執行數"""
+    imported = 0
+    for data_dir in data_dirs:
+        if not os.path.isdir(data_dir):
+            continue
+        for filename in list_snapshot_files(os.listdir(data_dir)):
+            if not filename.startswith(filename_prefix):
+                continue
+            match = SNAPSHOT_NAME_RE.match(filename)
+            run_at = datetime.strptime(match.group('date') + match.group('time'), '%Y%m%d%H%M%S')
+            try:
+                records = read_snapshot(os.path.join(data_dir, filename))
+            except (OSError, ValueError) as e:
+                print(f"⚠️  無法載入 {filename}: {e}")
+                continue
+            if store.import_snapshot(region, records, run_at, snapshot_path=filename) is not None:
+                imported += 1
+    return imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description='物件資料庫工具')
+    parser.add_argument('--db', default='data/listings.db', help='資料庫路徑')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    runs_parser = subparsers.add_parser('runs', help='列出執行紀錄')
+    runs_parser.add_argument('region')
+
+    import_parser = subparsers.add_parser('import', help='匯入既有的 JSON 快照檔案')
+    import_parser.add_argument('region', help='區域名稱，如 sanchong_luzhou、taipei')
+    import_parser.add_argument('--data-dir', action='append', default=None, help='資料目錄（可重複指定）')
+    import_parser.add_argument('--prefix', help='快照檔名前綴（預設為 {region}_houses）')
+
+    export_parser = subparsers.add_parser('export', help='將某次執行匯出為 JSON')
+    export_parser.add_argument('region')
+    export_parser.add_argument('target')
+    export_parser.add_argument('--run-id', type=int, help='預設為最近一次執行')
+
+    history_parser = subparsers.add_parser('history', help='顯示物件的價格歷史')
+    history_parser.add_argument('object_id')
+    history_parser.add_argument('--start', help='起始日期（YYYY-MM-DD）')
+    history_parser.add_argument('--end', help='結束日期（YYYY-MM-DD）')
+
+    drops_parser = subparsers.add_parser('drops', help='列出自第一次出現以來降價最多的物件')
+    drops_parser.add_argument('region')
+    drops_parser.add_argument('--limit', type=int, default=20)
+
+    args = parser.parse_args()
+
+    with ListingStore(args.db) as store:
+        if args.command == 'runs':
+            for row in store.conn.execute(
+                "SELECT run_id, run_at, listing_count, complete FROM runs WHERE region = ? ORDER BY run_at",
+                (args.region,),
+            ):
+                status = "✅" if row['complete'] else "⚠️ "
+                print(f"{status} #{row['run_id']} {row['run_at']}: {row['listing_count']} 個物件")
+        elif args.command == 'import':
+            prefix = args.prefix or f"{args.region}_houses"
+            imported = import_snapshot_files(store, args.region, args.data_dir or ['data'], prefix)
+            print(f"✅ 已匯入 {imported} 個快照")
+        elif args.command == 'export':
+            run_id = args.run_id
+            if run_id is None:
+                run = store.latest_run(args.region)
+                if run is None:
+                    print(f"❌ 沒有 {args.region} 的執行紀錄")
+                    return
+                run_id = run['run_id']
+            count = store.export_json(run_id, args.target)
+            print(f"✅ 已匯出 {count} 個物件: {args.target}")
+        elif args.command == 'history':
+            history = store.price_history
+            if args.start or args.end:
+                points = history.range(args.object_id, args.start or '0000-00-00', args.end or '9999-99-99')
+            else:
+                points = history.series(args.object_id)
+            if not points:
+                print(f"❌ 沒有物件 {args.object_id} 的價格歷史")
+                return
+            for observed_date, price, status in points:
+                print(f"  {observed_date}  {price if price is not None else '-':>8}  {status}")
+            summary = history.drop_since_first_seen(args.object_id)
+            if summary:
+                print(f"📉 自 {summary['first_seen']} 以來: {summary['first_price']:,.0f} → {summary['current_price']:,.0f}"
+                      f" ({-summary['drop_percentage']:+.1f}%)，變價 {summary['changes']} 次")
+        elif args.command == 'drops':
+            for item in store.price_history.biggest_drops(args.region, args.limit):
+                print(f"📉 {item['object_id']}: {item['first_price']:,.0f} → {item['current_price']:,.0f}"
+                      f" ({-item['drop_percentage']:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+"""
+快照清單（manifest）
+data/ 目錄下以原子替換更新的清單檔，每個快照一筆紀錄（區域、時間、筆數、檢查碼、是否完成），
+找前一天的完整快照只需查表，不必列出並排序目錄中的檔案
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import shutil
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .serialization import dump_file, load_file
+from .snapshot import decode_snapshot
+from .snapshot_archive import ARCHIVE_EXTENSION, SnapshotArchive
+from .snapshot_delta import is_delta_snapshot, load_snapshot_data, replay
+from .storage import FileLock, temporary_path
+
+MANIFEST_VERSION = 1
+MANIFEST_FILENAME = "manifest.json"
+
+# 快照檔名，如 sanchong_luzhou_houses_20250912_090000.hsa（完整快照）或 .json（差異快照、舊版快照）
+SNAPSHOT_NAME_RE = re.compile(r'^(?P<region>.+)_houses_(?P<date>\d{8})_(?P<time>\d{6})\.(?:json|hsa)$')
+SNAPSHOT_EXTENSIONS = ('.json', ARCHIVE_EXTENSION)
+
+# 壓縮檔名，如 taipei_compacted_2025-09-W37.json（每週）、taipei_compacted_2025-09.json（每月）
+COMPACTED_NAME_RE = re.compile(r'^(?P<region>.+)_compacted_(?P<period>\d{4}-\d{2}(?:-W\d{2})?)\.json$')
+
+
+def file_checksum(path: str) -> str:
+    """檔案內容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def list_snapshot_files(filenames: Iterable[str]) -> List[str]:
+    """
+    符合快照命名規則的檔名（依檔名排序）
+    舊版在 JSON 快照旁另存的同名封存檔與 JSON 內容相同，不重複列入
+    """
+    names = sorted(name for name in filenames if SNAPSHOT_NAME_RE.match(name))
+    present = set(names)
+    return [
+        name for name in names
+        if not (name.endswith(ARCHIVE_EXTENSION) and name[:-len(ARCHIVE_EXTENSION)] + '.json' in present)
+    ]
+
+
+class SnapshotManifest:
+    """快照清單，路徑以清單檔所在目錄為基準，整個目錄搬移（如 GitHub Actions artifact）後仍可使用"""
+
+    def __init__(self, path: str = os.path.join("data", MANIFEST_FILENAME)):
+        self.path = path
+        self.directory = os.path.dirname(path) or "."
+        self.regions: Dict[str, List[Dict[str, Any]]] = {}
+        # 每週、每月壓縮檔（見 compaction.py）
+        self.compacted: Dict[str, List[Dict[str, Any]]] = {}
+
+    @classmethod
+    def open(cls, path: str = os.path.join("data", MANIFEST_FILENAME)) -> 'SnapshotManifest':
+        manifest = cls(path)
+        manifest.load()
+        return manifest
+
+    def load(self) -> bool:
+        """載入清單檔，不存在或格式不符時回傳 False"""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            data = load_file(self.path)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  無法載入快照清單 {self.path}: {e}")
+            return False
+        if data.get('version') != MANIFEST_VERSION:
+            return False
+        self.regions = data.get('regions', {})
+        self.compacted = data.get('compacted', {})
+        return True
+
+    def save(self):
+        dump_file(self.path, {'version': MANIFEST_VERSION, 'regions': self.regions, 'compacted': self.compacted},
+                  indent=True)
+
+    def entries(self, region: str) -> List[Dict[str, Any]]:
+        """區域的所有快照（依時間排序）"""
+        return self.regions.get(region, [])
+
+    def remove(self, region: str, files: Sequence[str]):
+        """移除紀錄（檔案已刪除或已併入壓縮檔）"""
+        files = set(files)
+        self.regions[region] = [entry for entry in self.entries(region) if entry['file'] not in files]
+
+    def _insert(self, region: str, entry: Dict[str, Any]):
+        entries = self.regions.setdefault(region, [])
+        entries[:] = [existing for existing in entries if existing['file'] != entry['file']]
+        entries.append(entry)
+        # 清單通常已依時間排序，新快照直接附加在最後
+        if len(entries) > 1 and entries[-2]['timestamp'] > entry['timestamp']:
+            entries.sort(key=lambda item: item['timestamp'])
+
+    def make_entry(self, snapshot_path: str, timestamp: datetime, count: int, complete: bool = True,
+                   parent: Optional[str] = None) -> Dict[str, Any]:
+        """parent：差異快照所依據的前一個快照"""
+        entry = {
+            'file': os.path.relpath(snapshot_path, self.directory),
+            'timestamp': timestamp.isoformat(),
+            'date': timestamp.date().isoformat(),
+            'count': count,
+            'size': os.path.getsize(snapshot_path),
+            'checksum': file_checksum(snapshot_path),
+            'complete': complete,
+        }
+        if parent:
+            entry['parent'] = os.path.relpath(parent, self.directory)
+        return entry
+
+    def record(self, region: str, snapshot_path: str, timestamp: datetime, count: int, complete: bool = True,
+               parent: Optional[str] = None) -> Dict[str, Any]:
+        """新增一個快照並寫回清單檔（鎖定清單後重新載入，保留其他行程同時寫入的紀錄）"""
+        entry = self.make_entry(snapshot_path, timestamp, count, complete, parent)
+        with FileLock(self.path):
+            self.load()
+            self._insert(region, entry)
+            self.save()
+        return entry
+
+    def previous(self, region: str, before: Optional[date] = None) -> Optional[Dict[str, Any]]:
+        """before（預設今天）之前最近一次完整的快照；沒有時改用最近一次完整的快照"""
+        before_text = (before or date.today()).isoformat()
+        latest = None
+        # 由新到舊找，通常第一、二筆就符合
+        for entry in reversed(self.entries(region)):
+            if not entry.get('complete'):
+                continue
+            if latest is None:
+                latest = entry
+            if entry['date'] < before_text:
+                return entry
+        return latest
+
+    def latest(self, region: str) -> Optional[Dict[str, Any]]:
+        """最近一次完整的快照（不限日期）"""
+        for entry in reversed(self.entries(region)):
+            if entry.get('complete'):
+                return entry
+        return None
+
+    def resolve(self, entry: Dict[str, Any]) -> str:
+        """紀錄中的檔案路徑"""
+        return os.path.join(self.directory, entry['file'])
+
+    def verify(self, entry: Dict[str, Any], full: bool = False) -> bool:
+        """
+        檔案存在且大小相符；full 時（或舊的紀錄沒有大小時）改為比對整個檔案的檢查碼
+        （不比對修改時間：artifact 下載或複製後修改時間會改變）
+        """
+        path = self.resolve(entry)
+        if not os.path.exists(path):
+            return False
+        if not full and 'size' in entry:
+            return os.path.getsize(path) == entry['size']
+        return file_checksum(path) == entry.get('checksum')
+
+    def delta_parent(self, region: str, fallback_dirs: Sequence[str] = ("./previous_data",)) -> Optional[str]:
+        """
+        差異快照的 parent：清單中最近一次的完整快照
+        清單中沒有時（如 GitHub Actions 的 data/ 一開始是空的），改用備用目錄清單中最近一次的快照，
+        連同它的差異鏈一起複製到清單所在目錄並加入清單，重建時才找得到基底
+        """
+        latest = self.latest(region)
+        if latest and self.verify(latest):
+            return self.resolve(latest)
+
+        for data_dir in fallback_dirs:
+            source = SnapshotManifest(os.path.join(data_dir, MANIFEST_FILENAME))
+            if not source.load():
+                continue
+            entry = source.latest(region)
+            if entry is None or not source.verify(entry):
+                continue
+            try:
+                return self._adopt_chain(region, source, entry)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"⚠️  無法從 {data_dir} 複製差異快照的基底: {e}")
+        return None
+
+    def _adopt_chain(self, region: str, source: 'SnapshotManifest', entry: Dict[str, Any]) -> str:
+        """將 entry 的快照與它依據的所有前一個快照複製到清單所在目錄，回傳複製後的路徑"""
+        source_entries = {item['file']: item for item in source.entries(region)}
+        adopted = []
+        path = source.resolve(entry)
+        while True:
+            self._copy_in(source, path)
+            item = source_entries.get(os.path.relpath(path, source.directory))
+            if item is not None:
+                adopted.append(item)
+            data = load_snapshot_data(path)
+            if not is_delta_snapshot(data):
+                break
+            path = os.path.join(os.path.dirname(path), data['parent'])
+
+        with FileLock(self.path):
+            self.load()
+            for item in adopted:
+                self._insert(region, dict(item))
+            self.save()
+        return os.path.join(self.directory, entry['file'])
+
+    def _copy_in(self, source: 'SnapshotManifest', path: str) -> str:
+        """將來源清單目錄中的檔案複製到清單所在目錄（已存在時略過），回傳複製後的路徑"""
+        target = os.path.join(self.directory, os.path.relpath(path, source.directory))
+        if not os.path.exists(target):
+            tmp_path = temporary_path(target)
+            try:
+                shutil.copyfile(path, tmp_path)
+                os.replace(tmp_path, target)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        return target
+
+    def carry_over(self, source: 'SnapshotManifest', regions: Optional[Sequence[str]] = None) -> int:
+        """
+        將來源清單（如 GitHub Actions 下載的 previous_data/）中的快照與壓縮檔複製過來並加入清單，
+        回傳複製的檔案數；同名的紀錄以本清單為準。呼叫端需先鎖定本清單
+        """
+        copied = 0
+        for region in regions or sorted(set(source.regions) | set(source.compacted)):
+            files = {entry['file'] for entry in self.entries(region)}
+            for entry in source.entries(region):
+                if entry['file'] in files or not os.path.exists(source.resolve(entry)):
+                    continue
+                self._copy_in(source, source.resolve(entry))
+                self._insert(region, dict(entry))
+                copied += 1
+
+            compacted = self.compacted.setdefault(region, [])
+            periods = {entry['period'] for entry in compacted}
+            for entry in source.compacted.get(region, []):
+                if entry['period'] in periods or not os.path.exists(source.resolve(entry)):
+                    continue
+                self._copy_in(source, source.resolve(entry))
+                compacted.append(dict(entry))
+                copied += 1
+            compacted.sort(key=lambda entry: entry['start'])
+        return copied
+
+    def rebuild(self, regions: Optional[Sequence[str]] = None) -> int:
+        """掃描清單所在目錄的快照檔案重建清單，回傳快照數"""
+        from .compaction import compacted_entry
+
+        self.regions = {}
+        self.compacted = {}
+        total = 0
+        filenames = sorted(os.listdir(self.directory))
+        snapshot_files = set(list_snapshot_files(filenames))
+        for filename in filenames:
+            match = COMPACTED_NAME_RE.match(filename)
+            if match and not (regions and match.group('region') not in regions):
+                path = os.path.join(self.directory, filename)
+                period = match.group('period')
+                try:
+                    entry = compacted_entry(self, path, 'weekly' if '-W' in period else 'monthly', period, load_file(path))
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"⚠️  無法載入壓縮檔 {filename}: {e}")
+                    continue
+                self.compacted.setdefault(match.group('region'), []).append(entry)
+                continue
+
+            match = SNAPSHOT_NAME_RE.match(filename)
+            if filename not in snapshot_files or (regions and match.group('region') not in regions):
+                continue
+
+            path = os.path.join(self.directory, filename)
+            timestamp = datetime.strptime(match.group('date') + match.group('time'), '%Y%m%d%H%M%S')
+            parent = None
+            try:
+                if filename.endswith(ARCHIVE_EXTENSION):
+                    # 封存檔只需讀取檔尾的索引
+                    with SnapshotArchive(path) as archive:
+                        count, complete = len(archive), True
+                else:
+                    data = load_file(path)
+                    if is_delta_snapshot(data):
+                        parent = os.path.join(self.directory, data['parent'])
+                        records = replay(path, data)
+                    else:
+                        records = decode_snapshot(data)
+                    count, complete = len(records), isinstance(records, list)
+            except (OSError, ValueError, KeyError):
+                # 無法解析的檔案（寫到一半或缺少基底）記為未完成
+                count, complete = 0, False
+
+            self._insert(match.group('region'), self.make_entry(path, timestamp, count, complete, parent))
+            total += 1
+        return total
+
+
+def find_previous_snapshot(region: str, data_dirs: Sequence[str] = ("./previous_data", "data"),
+                           before: Optional[date] = None, full: bool = False) -> Optional[str]:
+    """
+    依序在各資料目錄的清單中找前一天的完整快照，回傳檔案路徑
+    只檢查檔案大小；讀取失敗時以 full=True 重新查詢，比對檢查碼略過內容已損毀的快照
+    """
+    for data_dir in data_dirs:
+        manifest = SnapshotManifest(os.path.join(data_dir, MANIFEST_FILENAME))
+        if not manifest.load():
+            continue
+        entry = manifest.previous(region, before)
+        if entry is None:
+            continue
+        if not manifest.verify(entry, full):
+            print(f"⚠️  快照 {entry['file']} 不存在或{'檢查碼' if full else '大小'}不符，略過")
+            continue
+        return manifest.resolve(entry)
+    return None
+
+
+def load_previous_snapshot(region: str, load: Callable[[str], Any],
+                           data_dirs: Sequence[str] = ("./previous_data", "data"),
+                           before: Optional[date] = None) -> Optional[Tuple[str, Any]]:
+    """找前一天的完整快照並以 load 讀取，回傳 (路徑, 結果)；讀取失敗時比對檢查碼重新查詢一次"""
+    failed = None
+    for full in (False, True):
+        path = find_previous_snapshot(region, data_dirs, before, full)
+        if path is None or path == failed:
+            return None
+        try:
+            return path, load(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️  載入 {path} 失敗: {e}")
+            failed = path
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='快照清單工具')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    rebuild_parser = subparsers.add_parser('rebuild', help='掃描目錄中的快照重建清單')
+    rebuild_parser.add_argument('--data-dir', action='append', default=None, help='資料目錄（可重複指定）')
+    rebuild_parser.add_argument('--region', action='append', default=None, help='只重建指定區域')
+
+    show_parser = subparsers.add_parser('show', help='顯示清單內容')
+    show_parser.add_argument('--data-dir', default='data')
+
+    verify_parser = subparsers.add_parser('verify', help='比對清單中所有快照的檢查碼')
+    verify_parser.add_argument('--data-dir', default='data')
+
+    args = parser.parse_args()
+
+    if args.command == 'rebuild':
+        for data_dir in args.data_dir or ['data']:
+            if not os.path.isdir(data_dir):
+                print(f"❌ {data_dir} 目錄不存在")
+                continue
+            manifest = SnapshotManifest(os.path.join(data_dir, MANIFEST_FILENAME))
+            with FileLock(manifest.path):
+                total = manifest.rebuild(args.region)
+                manifest.save()
+            print(f"✅ {manifest.path}: {total} 個快照")
+    elif args.command == 'show':
+        manifest = SnapshotManifest.open(os.path.join(args.data_dir, MANIFEST_FILENAME))
+        for region, entries in manifest.regions.items():
+            print(f"📂 {region}: {len(entries)} 個快照")
+            for entry in entries:
+                status = "✅" if entry.get('complete') else "⚠️ "
+                print(f"  {status} {entry['timestamp']} {entry['file']} ({entry['count']} 個物件)")
+    elif args.command == 'verify':
+        manifest = SnapshotManifest.open(os.path.join(args.data_dir, MANIFEST_FILENAME))
+        failed = 0
+        for region, entries in manifest.regions.items():
+            for entry in entries:
+                if not manifest.verify(entry, full=True):
+                    print(f"❌ {region}: {entry['file']} 不存在或檢查碼不符")
+                    failed += 1
+        total = sum(len(entries) for entries in manifest.regions.values())
+        print(f"{'⚠️ ' if failed else '✅'} {total - failed}/{total} 個快照檢查碼相符")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+串流 NDJSON 快照
+爬取時每解析出一個物件就寫入一行，結束時寫入尾端紀錄並 fsync 標示完成；
+讀取時逐行產生物件，中斷的執行也會留下可讀取的部分檔案
+"""
+
+import argparse
+import os
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+from .serialization import dumps, loads
+from .snapshot import write_snapshot
+from .storage import reserve_timestamped_path
+
+NDJSON_FORMAT = 'house-ndjson'
+NDJSON_EXTENSION = '.ndjson'
+NDJSON_VERSION = 1
+
+# 標頭與尾端紀錄以這個鍵區分（物件本身不會有此欄位）
+META_KEY = '_meta'
+
+# 讀取尾端紀錄時從檔案結尾往回讀取的位元組數
+FOOTER_PROBE_SIZE = 4096
+
+
+def default_object_id(record: Dict[str, Any]) -> Optional[str]:
+    return record.get('object_id') or record.get('id')
+
+
+def stream_path(filename_prefix: str, started_at: Optional[datetime] = None, data_dir: str = "data") -> str:
+    """與 JSON 快照相同命名規則的串流檔案路徑（保留不重複的檔名，同時執行的行程不會寫入同一個檔案）"""
+    path, _ = reserve_timestamped_path(data_dir, filename_prefix, started_at, NDJSON_EXTENSION)
+    return path
+
+
+class NDJSONSnapshotWriter:
+    """逐筆寫入的快照檔案，以 with 使用時正常結束才寫入完成標記"""
+
+    def __init__(self, path: str, region: Optional[str] = None,
+                 key: Optional[Callable[[Dict[str, Any]], Optional[str]]] = default_object_id):
+        """key：去重用的鍵（同一個鍵只寫入第一次），None 表示不去重"""
+        self.path = path
+        self.key = key
+        self.count = 0
+        self._seen = set()
+        self._closed = False
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._file = open(path, 'wb')
+        self._write_line({
+            META_KEY: 'header',
+            'format': NDJSON_FORMAT,
+            'version': NDJSON_VERSION,
+            'region': region,
+            'started_at': datetime.now().isoformat(),
+        })
+
+    def _write_line(self, obj: Dict[str, Any]):
+        self._file.write(dumps(obj) + b'\n')
+
+    def write(self, record: Dict[str, Any]) -> bool:
+        """寫入一筆物件，重複的物件略過時回傳 False"""
+        if self.key is not None:
+            key = self.key(record)
+            if key is not None:
+                if key in self._seen:
+                    return False
+                self._seen.add(key)
+        self._write_line(record)
+        self.count += 1
+        return True
+
+    def write_many(self, records: Iterable[Dict[str, Any]]) -> int:
+        """寫入多筆物件並送出緩衝區（行程中斷時已寫入的物件仍在檔案中），回傳寫入筆數"""
+        written = sum(1 for record in records if self.write(record))
+        self._file.flush()
+        return written
+
+    def close(self, complete: bool = True):
+        """結束寫入；complete 時寫入尾端紀錄並 fsync"""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            if complete:
+                self._write_line({
+                    META_KEY: 'footer',
+                    'count': self.count,
+                    'completed_at': datetime.now().isoformat(),
+                })
+                self._file.flush()
+                os.fsync(self._file.fileno())
+        finally:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(complete=exc_type is None)
+
+
+class NDJSONSnapshotReader:
+    """逐筆讀取串流快照"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.header: Optional[Dict[str, Any]] = None
+        self.footer: Optional[Dict[str, Any]] = None
+        self.count = 0
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """逐筆產生物件；最後一行寫到一半（行程中斷）時略過"""
+        self.count = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    obj = loads(line)
+                except ValueError:
+                    # 只容許最後一行不完整
+                    if not line.endswith(b'\n'):
+                        break
+                    raise
+
+                meta = obj.get(META_KEY) if isinstance(obj, dict) else None
+                if meta == 'header':
+                    self.header = obj
+                elif meta == 'footer':
+                    self.footer = obj
+                else:
+                    self.count += 1
+                    yield obj
+
+    @property
+    def complete(self) -> bool:
+        return self.footer is not None
+
+
+def read_footer(path: str) -> Optional[Dict[str, Any]]:
+    """只讀取檔案結尾取得尾端紀錄，未完成的檔案回傳 None"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - FOOTER_PROBE_SIZE))
+        tail = f.read()
+
+    lines = tail.rstrip(b'\n').rsplit(b'\n', 1)
+    try:
+        obj = loads(lines[-1])
+    except ValueError:
+        return None
+    if isinstance(obj, dict) and obj.get(META_KEY) == 'footer':
+        return obj
+    return None
+
+
+def is_complete(path: str) -> bool:
+    return read_footer(path) is not None
+
+
+def discard_completed(path: Optional[str], expected_count: Optional[int] = None) -> bool:
+    """
+    刪除已完成的串流檔案（內容已寫入其他快照時使用）；
+    未完成、或尾端紀錄的筆數與 expected_count 不同（發布的快照沒有包含全部物件）時保留以便檢查
+    """
+    if not path or not os.path.exists(path):
+        return False
+    footer = read_footer(path)
+    if footer is None or (expected_count is not None and footer.get('count') != expected_count):
+        return False
+    os.remove(path)
+    return True
+
+
+def iter_records(path: str) -> Iterator[Dict[str, Any]]:
+    """逐筆讀取串流快照中的物件"""
+    return iter(NDJSONSnapshotReader(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='串流 NDJSON 快照工具')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    status_parser = subparsers.add_parser('status', help='顯示快照是否完成與筆數')
+    status_parser.add_argument('path')
+
+    convert_parser = subparsers.add_parser('to-json', help='轉為 JSON 快照（未完成的檔案轉換已寫入的部分）')
+    convert_parser.add_argument('path')
+    convert_parser.add_argument('target')
+    convert_parser.add_argument('--compact', action='store_true', help='輸出精簡快照格式')
+
+    args = parser.parse_args()
+
+    if args.command == 'status':
+        reader = NDJSONSnapshotReader(args.path)
+        count = sum(1 for _ in reader)
+        status = "✅ 已完成" if reader.complete else "⚠️  未完成（部分資料）"
+        print(f"{status}: {count} 個物件")
+    elif args.command == 'to-json':
+        records = list(iter_records(args.path))
+        write_snapshot(args.target, records, compact=args.compact)
+        print(f"✅ 已轉換 {len(records)} 個物件: {args.target}")
+
+
+if __name__ == "__main__":
+    main()
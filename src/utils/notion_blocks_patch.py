@@ -6,6 +6,7 @@ Notion 區塊數量限制修復補丁
 from typing import List, Dict
 from datetime import datetime
 from ..models.property import Property
+from ..models.property_batch import PropertyBatch
 
 def generate_optimized_district_blocks(properties: List[Property], search_date: datetime, district_name: str, comparison: Dict = None) -> List[Dict]:
     """
@@ -302,33 +303,8 @@ def _calculate_stats(properties: List[Property]) -> Dict[str, float]:
     if not properties:
         return {}
     
-    prices = []
-    sizes = []
-    
-    for prop in properties:
-        # 處理價格
-        if hasattr(prop, 'total_price') and prop.total_price and prop.total_price > 0:
-            prices.append(prop.total_price)
-        elif hasattr(prop, 'price') and prop.price and prop.price > 0:
-            prices.append(prop.price)
-        
-        # 處理坪數
-        if hasattr(prop, 'main_area') and prop.main_area and prop.main_area > 0:
-            sizes.append(prop.main_area)
-        elif hasattr(prop, 'size') and prop.size and prop.size > 0:
-            sizes.append(prop.size)
-    
-    stats = {}
-    
-    if prices:
-        stats['avg_price'] = sum(prices) / len(prices)
-        stats['min_price'] = min(prices)
-        stats['max_price'] = max(prices)
-    
-    if sizes:
-        stats['avg_size'] = sum(sizes) / len(sizes)
-    
-    return stats
+    batch = PropertyBatch.from_properties(properties, ('price', 'total_price', 'size', 'main_area'), ())
+    return batch.summary_stats()
 
 def _is_in_changes(prop: Property, comparison: Dict) -> bool:
     """檢查物件是否在變更清單中"""
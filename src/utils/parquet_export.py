@@ -0,0 +1,206 @@
+"""
+欄式歷史資料匯出
+將每次執行的物件（Property.to_dict 的欄位）寫成依區域與日期分區的 Parquet 或 Arrow IPC 檔案：
+    data/history/store_region=taipei/run_date=2025-01-01/part-20250101090000.parquet
+每次執行新增一個檔案（同一次執行重新匯出時覆蓋），分析時只需讀取需要的欄位與分區
+需要安裝 pyarrow（不在 requirements.txt 中，只在本機分析時使用；GitHub Actions 不會寫入，也不上傳 data/history/）
+"""
+
+import argparse
+import os
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Union, get_type_hints
+
+from ..models.property import Property
+from .manifest import SNAPSHOT_NAME_RE, list_snapshot_files
+from .snapshot import read_snapshot
+from .storage import temporary_path
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+HAS_PYARROW = pa is not None
+
+DEFAULT_HISTORY_DIR = os.path.join("data", "history")
+
+# 分區欄位（Property 本身已有 region 欄位，存的是「台北市」等名稱）
+PARTITION_COLUMNS = ('store_region', 'run_date')
+
+FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+# to_dict 中以 isoformat 字串表示的時間欄位
+TIMESTAMP_COLUMNS = ('created_at', 'updated_at')
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError("匯出 Parquet/Arrow 需要 pyarrow，請執行 pip install pyarrow")
+
+
+def _arrow_type(field_type: Any):
+    # Optional[X] 取出 X
+    if getattr(field_type, '__origin__', None) is Union:
+        field_type = next(arg for arg in field_type.__args__ if arg is not type(None))
+    if field_type is int:
+        return pa.int64()
+    if field_type is float:
+        return pa.float64()
+    if field_type is bool:
+        return pa.bool_()
+    if field_type is datetime:
+        return pa.timestamp('us')
+    if getattr(field_type, '__origin__', None) is list:
+        return pa.list_(pa.string())
+    return pa.string()
+
+
+@lru_cache(maxsize=None)
+def history_schema() -> 'pa.Schema':
+    """Property.to_dict 的欄位，加上 object_id 與執行時間"""
+    require_pyarrow()
+    hints = get_type_hints(Property)
+    sample = Property(**{name: None for name in hints}).to_dict()
+    fields = [pa.field('object_id', pa.string()), pa.field('run_at', pa.timestamp('us'))]
+    fields.extend(pa.field(name, _arrow_type(hints[name])) for name in sample)
+    return pa.schema(fields)
+
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def to_table(records: List[Dict[str, Any]], run_at: datetime) -> 'pa.Table':
+    """將一次執行的物件轉為 Arrow Table（無法轉換的物件略過）"""
+    schema = history_schema()
+    columns: Dict[str, List[Any]] = {name: [] for name in schema.names}
+    for record in records:
+        try:
+            row = Property.from_dict(record).to_dict()
+        except ValueError as e:
+            print(f"⚠️  轉換物件失敗: {e}")
+            continue
+        row['object_id'] = record.get('object_id')
+        row['run_at'] = run_at
+        for name in TIMESTAMP_COLUMNS:
+            row[name] = _parse_timestamp(row[name])
+        for name, column in columns.items():
+            column.append(row[name])
+    return pa.table(columns, schema=schema)
+
+
+def partition_path(root: str, region: str, run_at: datetime, fmt: str = 'parquet') -> str:
+    """某次執行的檔案路徑（Hive 分區命名，可直接以 pyarrow.dataset 或 pandas 讀取）"""
+    directory = os.path.join(root, f"store_region={region}", f"run_date={run_at.date().isoformat()}")
+    return os.path.join(directory, f"part-{run_at.strftime('%Y%m%d%H%M%S')}{FORMATS[fmt]}")
+
+
+def append_run(region: str, records: List[Dict[str, Any]], run_at: datetime,
+               root: str = DEFAULT_HISTORY_DIR, fmt: str = 'parquet') -> str:
+    """新增一次執行的檔案（原子替換），回傳檔案路徑"""
+    require_pyarrow()
+    path = partition_path(root, region, run_at, fmt)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    table = to_table(records, run_at)
+    tmp_path = temporary_path(path)
+    if fmt == 'parquet':
+        pq.write_table(table, tmp_path, compression='zstd')
+    else:
+        feather.write_feather(table, tmp_path, compression='zstd')
+    os.replace(tmp_path, path)
+    return path
+
+
+def export_snapshots(region: str, data_dirs: Sequence[str], root: str = DEFAULT_HISTORY_DIR,
+                     fmt: str = 'parquet') -> int:
+    """將資料目錄中既有的快照匯出（已匯出的執行略過），回傳新增的檔案數"""
+    exported = 0
+    for data_dir in data_dirs:
+        if not os.path.isdir(data_dir):
+            continue
+        for filename in list_snapshot_files(os.listdir(data_dir)):
+            match = SNAPSHOT_NAME_RE.match(filename)
+            if match.group('region') != region:
+                continue
+            run_at = datetime.strptime(match.group('date') + match.group('time'), '%Y%m%d%H%M%S')
+            if os.path.exists(partition_path(root, region, run_at, fmt)):
+                continue
+            try:
+                records = read_snapshot(os.path.join(data_dir, filename))
+            except (OSError, ValueError) as e:
+                print(f"⚠️  無法載入 {filename}: {e}")
+                continue
+            append_run(region, records, run_at, root, fmt)
+            exported += 1
+    return exported
+
+
+def read_history(root: str = DEFAULT_HISTORY_DIR, columns: Optional[Sequence[str]] = None,
+                 regions: Optional[Sequence[str]] = None, start_date: Optional[str] = None,
+                 end_date: Optional[str] = None, fmt: str = 'parquet') -> 'pa.Table':
+    """讀取歷史資料，只讀取指定的欄位與分區（日期為 YYYY-MM-DD，包含兩端）"""
+    require_pyarrow()
+    dataset = ds.dataset(root, format='parquet' if fmt == 'parquet' else 'ipc', partitioning='hive')
+
+    condition = None
+    if regions:
+        condition = ds.field('store_region').isin(list(regions))
+    if start_date:
+        term = ds.field('run_date') >= start_date
+        condition = term if condition is None else condition & term
+    if end_date:
+        term = ds.field('run_date') <= end_date
+        condition = term if condition is None else condition & term
+
+    return dataset.to_table(columns=list(columns) if columns else None, filter=condition)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='匯出 Parquet/Arrow 歷史資料')
+    parser.add_argument('--root', default=DEFAULT_HISTORY_DIR, help='輸出目錄')
+    parser.add_argument('--format', choices=sorted(FORMATS), default='parquet')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help='匯出既有的快照檔案（只新增尚未匯出的執行）')
+    export_parser.add_argument('region', help='區域名稱，如 sanchong_luzhou、taipei')
+    export_parser.add_argument('--data-dir', action='append', default=None, help='資料目錄（可重複指定）')
+
+    scan_parser = subparsers.add_parser('scan', help='讀取部分欄位與分區並顯示筆數與耗時')
+    scan_parser.add_argument('--columns', help='以逗號分隔的欄位，如 object_id,price')
+    scan_parser.add_argument('--region', action='append', default=None)
+    scan_parser.add_argument('--start-date')
+    scan_parser.add_argument('--end-date')
+
+    args = parser.parse_args()
+
+    try:
+        require_pyarrow()
+    except ImportError as e:
+        print(f"❌ {e}")
+        return
+
+    if args.command == 'export':
+        exported = export_snapshots(args.region, args.data_dir or ['data'], args.root, args.format)
+        print(f"✅ 已匯出 {exported} 次執行到 {args.root}")
+    elif args.command == 'scan':
+        columns = args.columns.split(',') if args.columns else None
+        start = time.perf_counter()
+        table = read_history(args.root, columns, args.region, args.start_date, args.end_date, args.format)
+        elapsed = time.perf_counter() - start
+        print(f"📊 {table.num_rows} 筆、{table.num_columns} 個欄位，耗時 {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+多行程解析池
+將原始頁面內容送到子行程解析，回傳純字典資料，讓 HTML 解析可以使用所有 CPU 核心
+"""
+
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
+# 設定解析行程數量的環境變數（小型 runner 可設為 1，改為在主行程解析）
+PARSE_WORKERS_ENV = "CRAWLER_PARSE_WORKERS"
+
+
+def resolve_worker_count(max_workers: Optional[int] = None) -> int:
+    """決定解析行程數量：參數 > 環境變數 > CPU 核心數"""
+    if max_workers is None:
+        env_value = os.getenv(PARSE_WORKERS_ENV, "").strip()
+        if env_value:
+            try:
+                max_workers = int(env_value)
+            except ValueError:
+                print(f"⚠️  {PARSE_WORKERS_ENV}={env_value} 不是有效數字，改用 CPU 核心數")
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    return max(1, max_workers)
+
+
+class ParsePool:
+    """可重複使用的解析行程池"""
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = resolve_worker_count(max_workers)
+        self._executor = None
+        self._inline = self.max_workers <= 1
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        """延遲建立行程池，無法建立時改為在主行程解析"""
+        if self._inline:
+            return None
+
+        if self._executor is None:
+            try:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                print(f"🧵 啟動解析行程池: {self.max_workers} 個行程")
+            except (OSError, NotImplementedError) as e:
+                print(f"⚠️  無法建立解析行程池，改為單行程解析: {e}")
+                self._inline = True
+
+        return self._executor
+
+    def submit(self, func: Callable[..., Any], *args: Any) -> Future:
+        """送出解析工作（func 必須是模組層級函式才能傳到子行程）"""
+        executor = self._get_executor()
+        if executor is not None:
+            return executor.submit(func, *args)
+
+        future = Future()
+        try:
+            future.set_result(func(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def submit_ordered(self, func: Callable[..., Any], jobs: Iterable[Tuple[Any, tuple]],
+                       window: Optional[int] = None) -> Iterator[Tuple[Any, Future]]:
+        """
+        依序送出 jobs 中的 (key, 參數)，依送出順序產生 (key, future)
+        最多同時有 window（預設為行程數）個工作尚未取回；jobs 通常是邊抓取邊產生的產生器，
+        呼叫端停止迭代後不再從 jobs 取用（不會再抓取後面的頁面），已送出的工作結果捨棄
+        """
+        window = max(1, window or self.max_workers)
+        pending = deque()
+        for key, args in jobs:
+            pending.append((key, self.submit(func, *args)))
+            if len(pending) >= window:
+                yield pending.popleft()
+        while pending:
+            yield pending.popleft()
+
+    def close(self):
+        """關閉行程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def __enter__(self) -> "ParsePool":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,195 @@
+"""
+前一次快照的精簡索引
+與前一天比較時只需要識別鍵用到的欄位與價格：載入時每筆只保留這幾個欄位與位置
+（資料庫中的 object_id 或快照中的序號），完整物件只在需要時（例如下架的物件）才讀取；
+壓縮封存檔以 mmap 開啟，讀取完整物件時只解壓縮所在的區塊
+"""
+
+import argparse
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from .listing_store import BATCH_SIZE, SUMMARY_FIELDS, ListingStore
+from .ndjson_snapshot import NDJSON_EXTENSION, iter_records
+from .serialization import load_file, loads
+from .snapshot import decode_column, decode_rows, is_compact_snapshot, read_snapshot
+from .snapshot_archive import ARCHIVE_EXTENSION, SnapshotArchive
+from .snapshot_delta import is_delta_snapshot, replay
+
+# 兩個爬蟲的識別鍵（地址、房數、坪數）與比較價格用到的欄位（與資料庫中的 summary 相同）
+INDEX_FIELDS = SUMMARY_FIELDS
+
+# 物件沒有這個欄位（與值為 None 不同：prop.get(name, 預設值) 會得到預設值）
+MISSING = object()
+
+# 識別鍵 -> (價格, 位置)
+PreviousIndex = Dict[str, Tuple[Any, int]]
+
+
+class PreviousSnapshot:
+    """前一次快照：欄位以欄式保存，可依位置批次讀取完整物件"""
+
+    def __init__(self, columns: Dict[str, List[Any]], locators: List[Any],
+                 fetch: Callable[[List[Any]], List[Dict[str, Any]]], source: str = ''):
+        self.columns = columns
+        self.locators = locators
+        self.source = source
+        self._fetch = fetch
+
+    @classmethod
+    def from_records(cls, records: List[Dict[str, Any]], source: str = '',
+                     fields: Sequence[str] = INDEX_FIELDS) -> 'PreviousSnapshot':
+        """已載入的物件陣列（舊格式的快照等），完整物件直接取自原本的陣列"""
+        columns = {name: [record.get(name, MISSING) for record in records] for name in fields}
+        return cls(columns, list(range(len(records))), lambda positions: [records[i] for i in positions], source)
+
+    @classmethod
+    def from_store(cls, store: ListingStore, region: str, before=None) -> Optional['PreviousSnapshot']:
+        """資料庫中前一天的執行，只讀取 observations.summary（比較用欄位）；沒有執行時回傳 None"""
+        run = store.previous_run(region, before)
+        if run is None:
+            return None
+
+        rows = store.conn.execute(
+            "SELECT object_id, summary FROM observations WHERE run_id = ?", (run['run_id'],)
+        ).fetchall()
+        summaries = [loads(row[1]) for row in rows]
+        columns = {name: [summary.get(name, MISSING) for summary in summaries] for name in SUMMARY_FIELDS}
+        locators = [row[0] for row in rows]
+        run_id = run['run_id']
+
+        def fetch(object_ids: List[str]) -> List[Dict[str, Any]]:
+            found = {}
+            for start in range(0, len(object_ids), BATCH_SIZE):
+                chunk = object_ids[start:start + BATCH_SIZE]
+                placeholders = ', '.join('?' * len(chunk))
+                found.update(store.conn.execute(
+                    f"SELECT object_id, data FROM observations WHERE run_id = ? AND object_id IN ({placeholders})",
+                    [run_id] + chunk,
+                ).fetchall())
+            return [loads(found[object_id]) for object_id in object_ids]
+
+        return cls(columns, locators, fetch, f"{store.path} (run {run_id}, {run['run_at']})")
+
+    @classmethod
+    def from_file(cls, path: str, fields: Sequence[str] = INDEX_FIELDS) -> 'PreviousSnapshot':
+        """
+        快照檔案：精簡格式只解碼需要的欄位，讀取完整物件時重新載入檔案並只解碼指定的物件；
+        壓縮封存檔與串流快照見 from_archive、from_stream；其他格式（原本的 JSON 陣列、差異快照等）需要完整讀取
+        """
+        if path.endswith(ARCHIVE_EXTENSION):
+            return cls.from_archive(path, fields)
+        if path.endswith(NDJSON_EXTENSION):
+            return cls.from_stream(path, fields)
+        if not path.endswith('.json'):
+            return cls.from_records(read_snapshot(path), path, fields)
+        data = load_file(path)
+        if is_delta_snapshot(data):
+            return cls.from_records(replay(path, data), path, fields)
+        if not is_compact_snapshot(data):
+            return cls.from_records(data, path, fields)
+
+        # 改存封存檔之前寫入的精簡 JSON 快照
+
+        columns = {name: decode_column(data, name, MISSING) for name in fields}
+
+        def fetch(positions: List[int]) -> List[Dict[str, Any]]:
+            return decode_rows(load_file(path), positions) if positions else []
+
+        return cls(columns, list(range(data['count'])), fetch, path)
+
+    @classmethod
+    def from_archive(cls, path: str, fields: Sequence[str] = INDEX_FIELDS) -> 'PreviousSnapshot':
+        """
+        壓縮封存檔：索引欄位取自摘要區塊（舊的封存檔沒有摘要區塊時才逐區塊解碼完整物件），
+        讀取完整物件時以序號只解壓縮所在的區塊
+        """
+        with SnapshotArchive(path) as archive:
+            columns = archive.summary_columns(fields, MISSING)
+            if columns is None:
+                columns = {name: [] for name in fields}
+                for record in archive:
+                    for name, column in columns.items():
+                        column.append(record.get(name, MISSING))
+            count = len(archive)
+
+        def fetch(positions: List[int]) -> List[Dict[str, Any]]:
+            if not positions:
+                return []
+            with SnapshotArchive(path) as archive:
+                return archive.records_at(positions)
+
+        return cls(columns, list(range(count)), fetch, path)
+
+    @classmethod
+    def from_stream(cls, path: str, fields: Sequence[str] = INDEX_FIELDS) -> 'PreviousSnapshot':
+        """
+        串流快照（.ndjson）：逐行讀取時只保留索引欄位，不建立完整物件的陣列；
+        讀取完整物件時重新逐行掃描，只保留指定位置的物件（未完成的檔案只含已寫入的部分）
+        """
+        columns: Dict[str, List[Any]] = {name: [] for name in fields}
+        count = 0
+        for record in iter_records(path):
+            for name, column in columns.items():
+                column.append(record.get(name, MISSING))
+            count += 1
+
+        def fetch(positions: List[int]) -> List[Dict[str, Any]]:
+            wanted = set(positions)
+            found = {}
+            if wanted:
+                for position, record in enumerate(iter_records(path)):
+                    if position in wanted:
+                        found[position] = record
+                        if len(found) == len(wanted):
+                            break
+            return [found[position] for position in positions]
+
+        return cls(columns, list(range(count)), fetch, path)
+
+    @classmethod
+    def wrap(cls, data: Union['PreviousSnapshot', List[Dict[str, Any]]]) -> 'PreviousSnapshot':
+        return data if isinstance(data, PreviousSnapshot) else cls.from_records(data)
+
+    def __len__(self) -> int:
+        return len(self.locators)
+
+    def views(self) -> Iterator[Dict[str, Any]]:
+        """每筆物件只含索引欄位的字典（沒有的欄位不放入，與完整物件的 get 結果相同）"""
+        names = list(self.columns)
+        for values in zip(*self.columns.values()):
+            yield {name: value for name, value in zip(names, values) if value is not MISSING}
+
+    def index(self, key: Callable[[Dict[str, Any]], str]) -> PreviousIndex:
+        """識別鍵 -> (價格, 位置)；同一個鍵重複時以最後一筆為準（與建立 dict 映射相同）"""
+        return {key(view): (view.get('price', 0), position) for position, view in enumerate(self.views())}
+
+    def records(self, positions: List[int]) -> List[Dict[str, Any]]:
+        """讀取指定位置的完整物件（依 positions 的順序）"""
+        return self._fetch([self.locators[position] for position in positions])
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.records(list(range(len(self)))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='載入前一次快照的精簡索引')
+    parser.add_argument('source', help='區域名稱（從資料庫載入）或快照檔案路徑')
+    parser.add_argument('--db', default='data/listings.db', help='資料庫路徑')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.source.endswith(('.json', '.ndjson', '.hsa')):
+        previous = PreviousSnapshot.from_file(args.source)
+    else:
+        with ListingStore(args.db) as store:
+            previous = PreviousSnapshot.from_store(store, args.source)
+    elapsed = (time.perf_counter() - start) * 1000
+    if previous is None:
+        print(f"❌ 資料庫中沒有 {args.source} 的資料")
+        return
+    print(f"📂 {previous.source}: {len(previous)} 個物件，{elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+物件價格歷史
+每個 object_id 只在狀態改變時記錄一個點（新上架、變價、下架、重新上架），
+與物件資料庫共用同一個 SQLite 檔案，每次執行在同一個交易中追加；
+查詢單一物件只需一次主鍵範圍查詢
+"""
+
+import sqlite3
+from datetime import date
+from itertools import groupby
+from typing import Any, Dict, List, Optional, Tuple
+
+PRICE_HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS price_history (
+    object_id TEXT NOT NULL,
+    observed_date TEXT NOT NULL,
+    region TEXT NOT NULL,
+    price REAL,
+    status TEXT NOT NULL,
+    PRIMARY KEY (object_id, observed_date)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_price_history_region ON price_history (region, object_id, observed_date);
+CREATE TABLE IF NOT EXISTS price_history_stale (
+    region TEXT PRIMARY KEY
+) WITHOUT ROWID;
+"""
+
+# 狀態
+STATUS_NEW = 'new'
+STATUS_PRICE_CHANGED = 'price_changed'
+STATUS_REMOVED = 'removed'
+STATUS_RELISTED = 'relisted'
+
+# (日期, 價格, 狀態)
+PricePoint = Tuple[str, Optional[float], str]
+
+
+def _date_text(value: Any) -> str:
+    return value.isoformat() if isinstance(value, date) else str(value)
+
+
+def _day_rows(region: str, run_date: str, day_prices: Dict[str, Optional[float]],
+              latest: Dict[str, Tuple[str, Optional[float], str]]) -> List[tuple]:
+    """一天的物件價格與前一天為止每個物件最新的點比較，產生當天的變動點"""
+    rows = []
+    for object_id, price in day_prices.items():
+        point = latest.get(object_id)
+        if point is None:
+            rows.append((object_id, run_date, region, price, STATUS_NEW))
+        elif point[2] == STATUS_REMOVED:
+            rows.append((object_id, run_date, region, price, STATUS_RELISTED))
+        elif point[1] != price:
+            rows.append((object_id, run_date, region, price, STATUS_PRICE_CHANGED))
+
+    for object_id, point in latest.items():
+        if object_id not in day_prices and point[2] != STATUS_REMOVED:
+            rows.append((object_id, run_date, region, point[1], STATUS_REMOVED))
+    return rows
+
+
+class PriceHistory:
+    """價格時間序列（使用物件資料庫的連線，不自行提交交易）"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def latest_points(self, region: str, before: Any = None) -> Dict[str, Tuple[str, Optional[float], str]]:
+        """區域內每個物件最新的一個點（指定 before 時只看該日期之前的點）：object_id -> (日期, 價格, 狀態)"""
+        before_text = _date_text(before) if before is not None else '9999-12-31'
+        rows = self.conn.execute(
+            """
+            SELECT h.object_id, h.observed_date, h.price, h.status
+            FROM price_history h
+            JOIN (
+                SELECT object_id, MAX(observed_date) AS observed_date
+                FROM price_history WHERE region = ? AND observed_date < ? GROUP BY object_id
+            ) latest USING (object_id, observed_date)
+            """,
+            (region, before_text),
+        )
+        return {row[0]: (row[1], row[2], row[3]) for row in rows}
+
+    def _day_prices(self, region: str, run_date: str) -> Dict[str, Optional[float]]:
+        """同一天所有已完成執行的物件價格（同一個物件以較晚的執行為準）"""
+        return dict(self.conn.execute(
+            """
+            SELECT o.object_id, o.price FROM observations o
+            JOIN runs r ON r.run_id = o.run_id
+            WHERE r.region = ? AND r.run_date = ? AND r.complete = 1
+            ORDER BY r.run_at
+            """,
+            (region, run_date),
+        ).fetchall())
+
+    def append_run(self, region: str, run_date: Any, prices: Dict[str, Optional[float]]) -> int:
+        """
+        追加一次執行（object_id -> 價格）的變動點，回傳當天的點數
+        同一天有多次執行時（如部分重跑），當天的物件為所有執行的聯集，與前一天為止的點比較後重寫當天的點；
+        執行日期早於既有資料時（例如補匯入舊快照）或區域標記為需要重建時，改由 observations 重建整個區域
+        """
+        run_date = _date_text(run_date)
+        later = self.conn.execute(
+            "SELECT 1 FROM price_history WHERE region = ? AND observed_date > ? LIMIT 1", (region, run_date)
+        ).fetchone()
+        stale = self.conn.execute("SELECT 1 FROM price_history_stale WHERE region = ?", (region,)).fetchone()
+        if later or stale:
+            return self.rebuild(region)
+
+        # 這次執行通常已寫入 observations（依 run_at 排序，較晚的執行為準），prices 只補上不在其中的物件
+        day_prices = self._day_prices(region, run_date)
+        for object_id, price in prices.items():
+            day_prices.setdefault(object_id, price)
+        rows = _day_rows(region, run_date, day_prices, self.latest_points(region, before=run_date))
+
+        self.conn.execute("DELETE FROM price_history WHERE region = ? AND observed_date = ?", (region, run_date))
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO price_history (object_id, observed_date, region, price, status) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+        return len(rows)
+
+    def mark_stale(self, region: str):
+        """寫入執行但未更新價格歷史（與寫入執行在同一個交易中標記，中斷後仍知道需要重建）"""
+        self.conn.execute("INSERT OR IGNORE INTO price_history_stale (region) VALUES (?)", (region,))
+
+    def stale_regions(self) -> List[str]:
+        """有執行尚未反映到價格歷史、需要重建的區域"""
+        return [row[0] for row in self.conn.execute("SELECT region FROM price_history_stale ORDER BY region")]
+
+    def rebuild(self, region: str) -> int:
+        """
+        由 observations 依日期重新計算區域內所有物件的價格歷史：依 (日期, 執行時間) 排序讀取一次，
+        在記憶體中維護每個物件最新的點，逐日產生變動點（同一天以較晚的執行為準，與 append_run 相同）
+        """
+        self.conn.execute("DELETE FROM price_history WHERE region = ?", (region,))
+        self.conn.execute("DELETE FROM price_history_stale WHERE region = ?", (region,))
+        observations = self.conn.execute(
+            """
+            SELECT r.run_date, o.object_id, o.price FROM observations o
+            JOIN runs r ON r.run_id = o.run_id
+            WHERE r.region = ? AND r.complete = 1
+            ORDER BY r.run_date, r.run_at
+            """,
+            (region,),
+        )
+
+        latest: Dict[str, Tuple[str, Optional[float], str]] = {}
+        rows: List[tuple] = []
+        for run_date, day in groupby(observations, key=lambda row: row[0]):
+            day_rows = _day_rows(region, run_date, {object_id: price for _, object_id, price in day}, latest)
+            for object_id, observed_date, _, price, status in day_rows:
+                latest[object_id] = (observed_date, price, status)
+            rows.extend(day_rows)
+
+        self.conn.executemany(
+            "INSERT INTO price_history (object_id, observed_date, region, price, status) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+        return len(rows)
+
+    def series(self, object_id: str) -> List[PricePoint]:
+        """物件所有的變動點（依日期排序）"""
+        return [tuple(row) for row in self.conn.execute(
+            "SELECT observed_date, price, status FROM price_history WHERE object_id = ? ORDER BY observed_date",
+            (object_id,),
+        )]
+
+    def point_at(self, object_id: str, on: Any) -> Optional[PricePoint]:
+        """某一天有效的點（當天或之前最近的一個）"""
+        row = self.conn.execute(
+            """
+            SELECT observed_date, price, status FROM price_history
+            WHERE object_id = ? AND observed_date <= ?
+            ORDER BY observed_date DESC LIMIT 1
+            """,
+            (object_id, _date_text(on)),
+        ).fetchone()
+        return tuple(row) if row else None
+
+    def price_at(self, object_id: str, on: Any) -> Optional[float]:
+        """某一天的價格，尚未上架或已下架時回傳 None"""
+        point = self.point_at(object_id, on)
+        if point is None or point[2] == STATUS_REMOVED:
+            return None
+        return point[1]
+
+    def range(self, object_id: str, start: Any, end: Any) -> List[PricePoint]:
+        """期間內的點，開頭加上期間開始時有效的點"""
+        points = [tuple(row) for row in self.conn.execute(
+            """
+            SELECT observed_date, price, status FROM price_history
+            WHERE object_id = ? AND observed_date > ? AND observed_date <= ?
+            ORDER BY observed_date
+            """,
+            (object_id, _date_text(start), _date_text(end)),
+        )]
+        opening = self.point_at(object_id, start)
+        return ([opening] if opening else []) + points
+
+    def drop_since_first_seen(self, object_id: str) -> Optional[Dict[str, Any]]:
+        """第一次出現時的價格與目前價格的差異（降價為正數）"""
+        points = [point for point in self.series(object_id) if point[1] is not None]
+        if not points:
+            return None
+        first_date, first_price, _ = points[0]
+        last_date, last_price, status = points[-1]
+        drop = first_price - last_price
+        return {
+            'object_id': object_id,
+            'first_seen': first_date,
+            'first_price': first_price,
+            'last_date': last_date,
+            'current_price': last_price,
+            'status': status,
+            'drop': drop,
+            'drop_percentage': drop / first_price * 100 if first_price else 0,
+            'changes': sum(1 for point in points if point[2] == STATUS_PRICE_CHANGED),
+        }
+
+    def biggest_drops(self, region: str, limit: int = 20, include_removed: bool = False) -> List[Dict[str, Any]]:
+        """區域內自第一次出現以來降價最多的物件"""
+        first_prices = dict(self.conn.execute(
+            """
+            SELECT h.object_id, h.price FROM price_history h
+            JOIN (
+                SELECT object_id, MIN(observed_date) AS observed_date
+                FROM price_history WHERE region = ? GROUP BY object_id
+            ) first USING (object_id, observed_date)
+            """,
+            (region,),
+        ).fetchall())
+
+        drops = []
+        for object_id, (last_date, price, status) in self.latest_points(region).items():
+            first_price = first_prices.get(object_id)
+            if not first_price or price is None or price >= first_price:
+                continue
+            if status == STATUS_REMOVED and not include_removed:
+                continue
+            drops.append({
+                'object_id': object_id,
+                'first_price': first_price,
+                'current_price': price,
+                'last_date': last_date,
+                'status': status,
+                'drop': first_price - price,
+                'drop_percentage': (first_price - price) / first_price * 100,
+            })
+        drops.sort(key=lambda item: item['drop_percentage'], reverse=True)
+        return drops[:limit]
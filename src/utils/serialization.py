@@ -0,0 +1,134 @@
+"""
+JSON 序列化
+有安裝 orjson 時使用 orjson（快照與 Notion 請求），否則退回標準函式庫 json；
+兩者輸出相同的資料（datetime 以 isoformat、Property 以 to_dict 轉換）
+"""
+
+import argparse
+import json
+import os
+import time
+from dataclasses import asdict, is_dataclass
+from datetime import date, datetime
+from typing import Any, Dict, List, Union
+
+from .storage import atomic_write
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 設為 json 可強制使用標準函式庫（除錯或比較效能用）
+JSON_BACKEND_ENV = "CRAWLER_JSON_BACKEND"
+
+
+def _default(value: Any) -> Any:
+    """非 JSON 原生型別的轉換"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    to_dict = getattr(value, 'to_dict', None)
+    if callable(to_dict):
+        return to_dict()
+    if is_dataclass(value) and not isinstance(value, type):
+        return asdict(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    return str(value)
+
+
+def resolve_backend(backend: str = None) -> str:
+    """實際使用的後端：orjson 或 json"""
+    backend = (backend or os.environ.get(JSON_BACKEND_ENV) or 'orjson').lower()
+    if backend == 'orjson' and orjson is not None:
+        return 'orjson'
+    return 'json'
+
+
+BACKEND = resolve_backend()
+
+if orjson is not None:
+    # datetime 與 dataclass 交給 _default，讓輸出與標準函式庫一致
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+
+def _use_orjson(backend: str = None) -> bool:
+    return (resolve_backend(backend) if backend else BACKEND) == 'orjson'
+
+
+def dumps(obj: Any, indent: bool = False, backend: str = None) -> bytes:
+    """序列化為 UTF-8 bytes（不跳脫中文）"""
+    if _use_orjson(backend):
+        options = _ORJSON_OPTIONS | orjson.OPT_INDENT_2 if indent else _ORJSON_OPTIONS
+        return orjson.dumps(obj, default=_default, option=options)
+
+    if indent:
+        text = json.dumps(obj, ensure_ascii=False, indent=2, default=_default)
+    else:
+        text = json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=_default)
+    return text.encode('utf-8')
+
+
+def loads(data: Union[bytes, str], backend: str = None) -> Any:
+    """由 bytes 或字串反序列化"""
+    if _use_orjson(backend):
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dump_file(path: str, obj: Any, indent: bool = False):
+    """以原子替換的方式寫入 JSON 檔案（多個行程同時寫入也不會留下寫到一半的檔案）"""
+    payload = dumps(obj, indent=indent)
+    with atomic_write(path) as f:
+        f.write(payload)
+
+
+def load_file(path: str) -> Any:
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+def benchmark(records: List[Dict[str, Any]], repeat: int = 3) -> Dict[str, Dict[str, float]]:
+    """比較各後端的編碼與解碼吞吐量（筆/秒）"""
+    results = {}
+    backends = ['json'] + (['orjson'] if orjson is not None else [])
+    for backend in backends:
+        encode = min(_timed(lambda: dumps(records, backend=backend)) for _ in range(repeat))
+        payload = dumps(records, backend=backend)
+        decode = min(_timed(lambda: loads(payload, backend=backend)) for _ in range(repeat))
+        results[backend] = {
+            'encode_per_sec': len(records) / encode,
+            'decode_per_sec': len(records) / decode,
+            'bytes': len(payload),
+        }
+    return results
+
+
+def _timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    from .snapshot import read_snapshot
+
+    parser = argparse.ArgumentParser(description='量測 JSON 序列化吞吐量')
+    parser.add_argument('snapshot', help='作為樣本的快照檔案')
+    parser.add_argument('--count', type=int, action='append', help='測試筆數（可重複指定，預設 10000 與 100000）')
+    args = parser.parse_args()
+
+    sample = read_snapshot(args.snapshot)
+    if not sample:
+        print("❌ 快照中沒有物件")
+        return
+
+    for count in args.count or [10000, 100000]:
+        records = (sample * (count // len(sample) + 1))[:count]
+        for backend, result in benchmark(records).items():
+            print(f"📊 {count} 筆 {backend}: 編碼 {result['encode_per_sec']:,.0f} 筆/秒，"
+                  f"解碼 {result['decode_per_sec']:,.0f} 筆/秒")
+
+
+if __name__ == "__main__":
+    main()
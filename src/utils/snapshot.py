@@ -0,0 +1,241 @@
+"""
+精簡快照格式
+以欄式儲存物件陣列：所有物件值相同的欄位只存一次、低基數字串欄位以字典編碼，
+檔案仍是 JSON，可隨時轉回原本的物件陣列格式
+
+每日完整快照已改存為壓縮封存檔（.hsa，見 snapshot_archive.py），爬蟲不再寫入精簡格式的完整快照；
+精簡格式現在用於差異快照與壓縮檔中的物件，以及讀取先前寫入的精簡 JSON 快照（轉換工具仍可輸出）
+"""
+
+import argparse
+import os
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional
+
+from .serialization import dump_file, load_file
+
+SNAPSHOT_FORMAT = 'house-snapshot'
+SNAPSHOT_VERSION = 1
+
+# 不重複值不超過總筆數的這個比例時才做字典編碼
+DICTIONARY_RATIO = 0.5
+
+_SCALAR_TYPES = (str, int, float, bool, type(None))
+_ABSENT = object()
+
+
+def _is_constant(values: List[Any]) -> bool:
+    first = values[0]
+    first_type = first.__class__
+    return all(value.__class__ is first_type and value == first for value in values)
+
+
+def _dictionary_encode(values: List[Any]) -> Optional[Dict[str, list]]:
+    """低基數的純量欄位轉為 (字典, code 陣列)，不適合時回傳 None"""
+    limit = max(1, int(len(values) * DICTIONARY_RATIO))
+    lookup: Dict[Any, int] = {}
+    dictionary = []
+    codes = []
+    for value in values:
+        if not isinstance(value, _SCALAR_TYPES):
+            return None
+        # 以 (型別, 值) 為鍵，避免 True 與 1 被視為同一個值
+        key = (value.__class__, value)
+        code = lookup.get(key)
+        if code is None:
+            if len(dictionary) >= limit:
+                return None
+            code = len(dictionary)
+            lookup[key] = code
+            dictionary.append(value)
+        codes.append(code)
+    return {'values': dictionary, 'codes': codes}
+
+
+def encode_snapshot(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """將物件陣列轉為精簡快照結構"""
+    fields: Dict[str, None] = {}
+    for record in records:
+        for name in record:
+            if name not in fields:
+                fields[name] = None
+
+    constants = {}
+    dictionaries = {}
+    columns = {}
+    absent = {}
+    for name in fields:
+        missing = [index for index, record in enumerate(records) if name not in record]
+        if missing:
+            absent[name] = missing
+            missing_set = set(missing)
+            values = [record[name] for index, record in enumerate(records) if index not in missing_set]
+        else:
+            values = [record[name] for record in records]
+
+        if values and _is_constant(values):
+            constants[name] = values[0]
+            continue
+
+        encoded = _dictionary_encode(values)
+        if encoded is not None:
+            dictionaries[name] = encoded['values']
+            columns[name] = encoded['codes']
+        else:
+            columns[name] = values
+
+    return {
+        'format': SNAPSHOT_FORMAT,
+        'version': SNAPSHOT_VERSION,
+        'count': len(records),
+        'fields': list(fields),
+        'constants': constants,
+        'dictionaries': dictionaries,
+        'columns': columns,
+        'absent': absent,
+    }
+
+
+def is_compact_snapshot(data: Any) -> bool:
+    return isinstance(data, dict) and data.get('format') == SNAPSHOT_FORMAT
+
+
+def decode_snapshot(data: Any) -> List[Dict[str, Any]]:
+    """將精簡快照結構轉回物件陣列（舊格式的陣列原樣回傳）"""
+    if not is_compact_snapshot(data):
+        return data
+    if data.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(f"不支援的快照版本: {data.get('version')}")
+
+    count = data['count']
+    fields = data['fields']
+    constants = data['constants']
+    dictionaries = data['dictionaries']
+    absent = data['absent']
+
+    decoded = []
+    for name in fields:
+        if name in constants:
+            value = constants[name]
+            if isinstance(value, (list, dict)):
+                # 可變的常數每筆各自複製，避免物件間共用
+                column = [value.copy() for _ in range(count - len(absent.get(name, ())))]
+            else:
+                column = [value] * (count - len(absent.get(name, ())))
+        elif name in dictionaries:
+            dictionary = dictionaries[name]
+            column = [dictionary[code] for code in data['columns'][name]]
+        else:
+            column = data['columns'][name]
+
+        missing = absent.get(name)
+        if missing:
+            values = iter(column)
+            missing = set(missing)
+            column = [_ABSENT if index in missing else next(values) for index in range(count)]
+        decoded.append(column)
+
+    if not fields:
+        return [{} for _ in range(count)]
+    records = [dict(zip(fields, row)) for row in zip(*decoded)]
+
+    # 只有缺少欄位的物件需要再移除佔位值
+    for name, missing in absent.items():
+        for index in missing:
+            del records[index][name]
+    return records
+
+
+def _value_position(data: Dict[str, Any], name: str, index: int) -> Optional[int]:
+    """第 index 個物件在欄位陣列中的位置（缺少的物件不佔位置），缺少該欄位時回傳 None"""
+    missing = data['absent'].get(name)
+    if not missing:
+        return index
+    position = bisect_left(missing, index)
+    if position < len(missing) and missing[position] == index:
+        return None
+    return index - position
+
+
+def decode_column(data: Dict[str, Any], name: str, missing: Any = None) -> List[Any]:
+    """只解碼精簡快照中的一個欄位（依物件順序），缺少該欄位的物件以 missing 表示"""
+    count = data['count']
+    if name not in data['fields']:
+        return [missing] * count
+
+    if name in data['constants']:
+        column = [data['constants'][name]] * (count - len(data['absent'].get(name, ())))
+    elif name in data['dictionaries']:
+        dictionary = data['dictionaries'][name]
+        column = [dictionary[code] for code in data['columns'][name]]
+    else:
+        column = data['columns'][name]
+
+    absent = data['absent'].get(name)
+    if not absent:
+        return list(column)
+    values = iter(column)
+    absent = set(absent)
+    return [missing if index in absent else next(values) for index in range(count)]
+
+
+def decode_rows(data: Dict[str, Any], indexes: List[int]) -> List[Dict[str, Any]]:
+    """只解碼精簡快照中指定位置的物件（依 indexes 的順序）"""
+    records = []
+    for index in indexes:
+        record = {}
+        for name in data['fields']:
+            position = _value_position(data, name, index)
+            if position is None:
+                continue
+            if name in data['constants']:
+                value = data['constants'][name]
+                record[name] = value.copy() if isinstance(value, (list, dict)) else value
+            elif name in data['dictionaries']:
+                record[name] = data['dictionaries'][name][data['columns'][name][position]]
+            else:
+                record[name] = data['columns'][name][position]
+        records.append(record)
+    return records
+
+
+def write_snapshot(path: str, records: List[Dict[str, Any]], compact: bool = True):
+    """寫入快照（compact=False 時為原本的縮排 JSON 陣列），以原子替換避免寫到一半的檔案"""
+    if compact:
+        dump_file(path, encode_snapshot(records))
+    else:
+        dump_file(path, records, indent=True)
+
+
+def read_snapshot(path: str) -> List[Dict[str, Any]]:
+    """讀取快照，支援精簡格式、原本的 JSON 陣列、差異快照、NDJSON 串流與壓縮封存檔"""
+    extension = os.path.splitext(path)[1]
+    # 這些模組也會使用本模組，因此在這裡才匯入
+    if extension == '.hsa':
+        from .snapshot_archive import read_archive
+        return read_archive(path)
+    if extension == '.ndjson':
+        from .ndjson_snapshot import iter_records
+        return list(iter_records(path))
+
+    data = load_file(path)
+    if isinstance(data, dict) and data.get('format') == 'house-delta':
+        from .snapshot_delta import replay
+        return replay(path, data)
+    return decode_snapshot(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='快照格式轉換')
+    parser.add_argument('command', choices=['to-json', 'compact'], help='to-json: 轉回原本的 JSON 陣列；compact: 轉為精簡格式')
+    parser.add_argument('source', help='來源快照檔案')
+    parser.add_argument('target', help='輸出檔案')
+    args = parser.parse_args()
+
+    records = read_snapshot(args.source)
+    write_snapshot(args.target, records, compact=args.command == 'compact')
+    print(f"✅ 已轉換 {len(records)} 個物件: {args.target}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+壓縮快照封存檔（完整快照的儲存格式）
+物件以固定筆數分成多個壓縮區塊（有 zstandard 時用 zstd，否則用 gzip），檔尾附上區塊位置與
+object_id 索引；讀取時以 mmap 開啟，查詢單一物件只需解壓縮所在的區塊。
+比較用的欄位另以欄式存於摘要區塊，載入前一天的比較索引時不需要解壓縮完整物件
+
+檔案結構：
+    MAGIC | 區塊 0 | 區塊 1 | ... | 摘要區塊 | 壓縮的索引 JSON | 索引位置 (8 bytes) | 索引長度 (4 bytes) | MAGIC
+"""
+
+import argparse
+import gzip
+import mmap
+import os
+import struct
+from bisect import bisect_right
+from itertools import accumulate
+from typing import Any, Dict, Iterator, List, Optional
+
+from .serialization import dumps, loads
+from .snapshot import read_snapshot, write_snapshot
+from .storage import atomic_write
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIC = b'HSAR'
+ARCHIVE_VERSION = 1
+ARCHIVE_EXTENSION = '.hsa'
+
+# 每個壓縮區塊的物件數：越大壓縮率越好，查詢單筆時需解壓縮的資料也越多
+FRAME_RECORDS = 64
+
+# 與前一天比較時用到的欄位（識別鍵與價格），存於摘要區塊（舊的封存檔沒有摘要區塊）
+SUMMARY_FIELDS = ('address', 'room_count', 'size', 'main_area', 'price')
+
+_TRAILER = struct.Struct('<QI')
+
+
+def _object_id(record: Dict[str, Any]) -> Optional[str]:
+    object_id = record.get('object_id') or record.get('id')
+    return str(object_id) if object_id else None
+
+
+def _compressor(codec: str):
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=10).compress
+    return lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _decompressor(codec: str):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise ValueError("此封存檔使用 zstd 壓縮，請安裝 zstandard 套件")
+        return zstandard.ZstdDecompressor().decompress
+    return gzip.decompress
+
+
+def default_codec() -> str:
+    return 'zstd' if zstandard is not None else 'gzip'
+
+
+def _summary_payload(records: List[Dict[str, Any]], fields) -> bytes:
+    """摘要區塊：各欄位的值依序號排列，物件沒有的欄位記錄在 missing（與值為 None 不同）"""
+    columns = {name: [] for name in fields}
+    missing = {name: [] for name in fields}
+    for position, record in enumerate(records):
+        for name in fields:
+            if name in record:
+                columns[name].append(record[name])
+            else:
+                columns[name].append(None)
+                missing[name].append(position)
+    return dumps({
+        'fields': list(fields),
+        'columns': columns,
+        'missing': {name: positions for name, positions in missing.items() if positions},
+    })
+
+
+def write_archive(path: str, records: List[Dict[str, Any]], codec: Optional[str] = None,
+                  frame_records: int = FRAME_RECORDS) -> Dict[str, Any]:
+    """寫入封存檔（原子替換），回傳索引資訊"""
+    codec = codec or default_codec()
+    compress = _compressor(codec)
+
+    frames = []  # [位置, 長度, 筆數]
+    ids: Dict[str, List[int]] = {}  # object_id -> [區塊, 區塊內序號]
+
+    with atomic_write(path) as f:
+        f.write(MAGIC)
+        for start in range(0, len(records), frame_records):
+            chunk = records[start:start + frame_records]
+            for position, record in enumerate(chunk):
+                object_id = _object_id(record)
+                if object_id is not None and object_id not in ids:
+                    ids[object_id] = [len(frames), position]
+
+            payload = compress(b'\n'.join(dumps(record) for record in chunk))
+            frames.append([f.tell(), len(payload), len(chunk)])
+            f.write(payload)
+
+        summary_payload = compress(_summary_payload(records, SUMMARY_FIELDS))
+        summary = [f.tell(), len(summary_payload)]
+        f.write(summary_payload)
+
+        index = {
+            'version': ARCHIVE_VERSION,
+            'codec': codec,
+            'count': len(records),
+            'frames': frames,
+            'ids': ids,
+            'summary': summary,
+        }
+        index_offset = f.tell()
+        index_payload = gzip.compress(dumps(index), mtime=0)
+        f.write(index_payload)
+        f.write(_TRAILER.pack(index_offset, len(index_payload)))
+        f.write(MAGIC)
+    return index
+
+
+class SnapshotArchive:
+    """以 mmap 讀取的封存檔"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # 空檔案無法 mmap
+            self._file.close()
+            raise ValueError(f"不是有效的封存檔: {path}")
+
+        trailer_size = _TRAILER.size + len(MAGIC)
+        if len(self._map) < len(MAGIC) + trailer_size or self._map[:len(MAGIC)] != MAGIC or self._map[-len(MAGIC):] != MAGIC:
+            self.close()
+            raise ValueError(f"不是有效的封存檔: {path}")
+
+        index_offset, index_length = _TRAILER.unpack(self._map[-trailer_size:-len(MAGIC)])
+        index = loads(gzip.decompress(self._map[index_offset:index_offset + index_length]))
+        if index.get('version') != ARCHIVE_VERSION:
+            self.close()
+            raise ValueError(f"不支援的封存檔版本: {index.get('version')}")
+
+        self.codec = index['codec']
+        self.count = index['count']
+        self.frames = index['frames']
+        self.ids = index['ids']
+        self.summary = index.get('summary')
+        self._decompress = _decompressor(self.codec)
+        self._cached_frame = (None, None)
+        # 每個區塊之後的累計筆數，以序號查詢時找出所在區塊
+        self._frame_ends = list(accumulate(frame[2] for frame in self.frames))
+
+    def close(self):
+        if getattr(self, '_map', None) is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, object_id: str) -> bool:
+        return object_id in self.ids
+
+    def _frame_lines(self, frame_no: int) -> List[bytes]:
+        """解壓縮單一區塊（保留最近一次的結果，連續查詢同一區塊時不重複解壓縮）"""
+        cached_no, cached_lines = self._cached_frame
+        if cached_no == frame_no:
+            return cached_lines
+
+        offset, length, _ = self.frames[frame_no]
+        lines = self._decompress(self._map[offset:offset + length]).split(b'\n')
+        self._cached_frame = (frame_no, lines)
+        return lines
+
+    def get(self, object_id: str) -> Optional[Dict[str, Any]]:
+        """以 object_id 取得單一物件"""
+        location = self.ids.get(str(object_id))
+        if location is None:
+            return None
+        frame_no, position = location
+        return loads(self._frame_lines(frame_no)[position])
+
+    def records_at(self, positions: List[int]) -> List[Dict[str, Any]]:
+        """依序號（0 起算，依 positions 的順序）取得物件，只解壓縮所在的區塊"""
+        records = []
+        for position in positions:
+            if not 0 <= position < self.count:
+                raise IndexError(f"序號超出範圍: {position}")
+            frame_no = bisect_right(self._frame_ends, position)
+            start = self._frame_ends[frame_no - 1] if frame_no else 0
+            records.append(loads(self._frame_lines(frame_no)[position - start]))
+        return records
+
+    def summary_columns(self, fields, missing: Any = None) -> Optional[Dict[str, List[Any]]]:
+        """
+        摘要區塊中 fields 各欄位的值（依序號排列，物件沒有的欄位為 missing），
+        沒有摘要區塊或摘要不含所有欄位時回傳 None
+        """
+        if self.summary is None:
+            return None
+        offset, length = self.summary
+        data = loads(self._decompress(self._map[offset:offset + length]))
+        if any(name not in data['columns'] for name in fields):
+            return None
+        columns = {name: data['columns'][name] for name in fields}
+        for name, positions in data['missing'].items():
+            if name in columns:
+                for position in positions:
+                    columns[name][position] = missing
+        return columns
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """依序逐區塊解壓縮並產生物件"""
+        for frame_no in range(len(self.frames)):
+            for line in self._frame_lines(frame_no):
+                yield loads(line)
+
+
+def read_archive(path: str) -> List[Dict[str, Any]]:
+    with SnapshotArchive(path) as archive:
+        return list(archive)
+
+
+def archive_path_for(snapshot_path: str) -> str:
+    """快照檔案對應的封存檔路徑（同檔名、不同副檔名）"""
+    return os.path.splitext(snapshot_path)[0] + ARCHIVE_EXTENSION
+
+
+def main():
+    parser = argparse.ArgumentParser(description='壓縮快照封存檔工具')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    pack_parser = subparsers.add_parser('pack', help='將 JSON 快照轉為封存檔')
+    pack_parser.add_argument('sources', nargs='+', help='JSON 快照檔案')
+    pack_parser.add_argument('--codec', choices=['gzip', 'zstd'], default=None)
+
+    get_parser = subparsers.add_parser('get', help='以 object_id 取得單一物件')
+    get_parser.add_argument('archive')
+    get_parser.add_argument('object_id')
+
+    unpack_parser = subparsers.add_parser('unpack', help='將封存檔轉回 JSON 快照')
+    unpack_parser.add_argument('archive')
+    unpack_parser.add_argument('target')
+
+    args = parser.parse_args()
+
+    if args.command == 'pack':
+        for source in args.sources:
+            records = read_snapshot(source)
+            target = archive_path_for(source)
+            write_archive(target, records, codec=args.codec)
+            ratio = os.path.getsize(source) / max(1, os.path.getsize(target))
+            print(f"✅ {target}: {len(records)} 個物件，壓縮比 {ratio:.1f}x")
+    elif args.command == 'get':
+        with SnapshotArchive(args.archive) as archive:
+            record = archive.get(args.object_id)
+        if record is None:
+            print(f"❌ 找不到物件 {args.object_id}")
+        else:
+            print(dumps(record, indent=True).decode('utf-8'))
+    elif args.command == 'unpack':
+        records = read_archive(args.archive)
+        write_snapshot(args.target, records, compact=False)
+        print(f"✅ 已轉換 {len(records)} 個物件: {args.target}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""
+差異快照
+每日物件大多與前一次相同，差異模式下只儲存與前一個快照（parent）相比新增、下架與變動的欄位，
+每隔固定次數寫入一次完整快照作為基底；讀取時從最近的基底依序套用差異重建當天的物件
+完整快照以壓縮封存檔 (.hsa) 儲存，差異快照為 JSON（舊版的完整快照也是 JSON，仍可作為基底）
+"""
+
+import argparse
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from .serialization import dump_file, dumps, load_file
+from .snapshot import decode_snapshot, encode_snapshot, write_snapshot
+from .snapshot_archive import ARCHIVE_EXTENSION, read_archive, write_archive
+
+DELTA_FORMAT = 'house-delta'
+# 2：記錄物件順序（版本 1 的差異快照重建時新增物件排在最後）
+DELTA_VERSION = 2
+SUPPORTED_DELTA_VERSIONS = (1, 2)
+
+# 設為 delta 啟用差異快照（預設 full，每天寫入完整快照）
+SNAPSHOT_MODE_ENV = "CRAWLER_SNAPSHOT_MODE"
+SNAPSHOT_MODES = ('full', 'delta')
+
+# 每個基底之後最多連續的差異快照數（即每 7 個快照一個完整基底），限制重建時需要讀取的檔案數
+BASE_INTERVAL = 7
+
+# 差異內容超過完整快照大小的這個比例時（例如大量物件重新上架）直接寫入完整快照
+MAX_DELTA_RATIO = 0.8
+
+# 變動欄位以精簡快照格式儲存，物件鍵放在這個欄位（物件本身不會有此欄位）
+KEY_FIELD = '_key'
+
+
+def _object_id(record: Dict[str, Any]) -> Optional[str]:
+    object_id = record.get('object_id') or record.get('id')
+    return str(object_id) if object_id else None
+
+
+def _same(a: Any, b: Any) -> bool:
+    # 型別也要相同，避免 True 與 1、1 與 1.0 被視為沒有變動
+    return a.__class__ is b.__class__ and a == b
+
+
+def resolve_snapshot_mode(mode: Optional[str] = None) -> str:
+    """決定快照模式：參數 > 環境變數 > full"""
+    mode = (mode or os.getenv(SNAPSHOT_MODE_ENV, "") or 'full').strip().lower()
+    if mode not in SNAPSHOT_MODES:
+        print(f"⚠️  {SNAPSHOT_MODE_ENV}={mode} 不是有效的快照模式，改用 full")
+        return 'full'
+    return mode
+
+
+def is_delta_snapshot(data: Any) -> bool:
+    return isinstance(data, dict) and data.get('format') == DELTA_FORMAT
+
+
+def snapshot_extension(kind: str) -> str:
+    """write_daily_snapshot 寫入類型對應的副檔名：完整快照為壓縮封存檔，差異快照為 JSON"""
+    return ARCHIVE_EXTENSION if kind == 'full' else '.json'
+
+
+def load_snapshot_data(path: str) -> Any:
+    """JSON 快照（差異或舊版完整快照）的內容；壓縮封存檔一定是完整快照，不讀取內容，回傳 None"""
+    return None if path.endswith(ARCHIVE_EXTENSION) else load_file(path)
+
+
+def compute_delta(previous: List[Dict[str, Any]], current: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    以 object_id 比較前後兩次的物件，回傳：
+    added（新增物件，連同沒有 object_id 或重複的物件完整保存）、removed（下架的 object_id）、
+    changed（object_id -> 變動後的欄位值）、unset（object_id -> 被移除的欄位）、
+    order（目前物件的順序：沿用前一次的物件為 object_id，新增物件為在 added 中的位置；
+    與「沿用的物件依原順序、新增物件排在最後」相同時為 None）
+    """
+    previous_map: Dict[str, Dict[str, Any]] = {}
+    for record in previous:
+        object_id = _object_id(record)
+        if object_id is not None:
+            previous_map.setdefault(object_id, record)
+
+    seen = set()
+    added = []
+    order: List[Any] = []
+    changed: Dict[str, Dict[str, Any]] = {}
+    unset: Dict[str, List[str]] = {}
+    for record in current:
+        object_id = _object_id(record)
+        if object_id is None or object_id in seen or object_id not in previous_map:
+            order.append(len(added))
+            added.append(record)
+            if object_id is not None:
+                seen.add(object_id)
+            continue
+        seen.add(object_id)
+        order.append(object_id)
+
+        old = previous_map[object_id]
+
+        fields = {name: value for name, value in record.items() if name not in old or not _same(old[name], value)}
+        if fields:
+            changed[object_id] = fields
+        missing = [name for name in old if name not in record]
+        if missing:
+            unset[object_id] = missing
+
+    removed = [object_id for object_id in previous_map if object_id not in seen]
+    if order == [object_id for object_id in previous_map if object_id in seen] + list(range(len(added))):
+        order = None
+    return {'added': added, 'removed': removed, 'changed': changed, 'unset': unset, 'order': order}
+
+
+def apply_delta(records: List[Dict[str, Any]], delta: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """將 compute_delta 的結果套用到前一次的物件（不修改傳入的物件），依 order 還原物件順序"""
+    removed = set(delta['removed'])
+    changed = delta['changed']
+    unset = delta['unset']
+
+    result = []
+    kept: Dict[str, Dict[str, Any]] = {}
+    seen = set()
+    for record in records:
+        object_id = _object_id(record)
+        # 沒有 object_id 或重複的物件都已完整保存在 added 中
+        if object_id is None or object_id in seen or object_id in removed:
+            continue
+        seen.add(object_id)
+
+        fields = changed.get(object_id)
+        missing = unset.get(object_id)
+        if fields or missing:
+            record = dict(record)
+            if fields:
+                record.update(fields)
+            for name in missing or ():
+                record.pop(name, None)
+        result.append(record)
+        kept[object_id] = record
+
+    order = delta.get('order')
+    if order is None:
+        # 版本 1 的差異快照沒有記錄順序
+        result.extend(delta['added'])
+        return result
+    added = delta['added']
+    return [added[item] if isinstance(item, int) else kept[item] for item in order]
+
+
+def encode_delta(delta: Dict[str, Any], parent: str, depth: int, count: int) -> Dict[str, Any]:
+    """差異快照的檔案結構；新增與變動的物件以精簡快照格式儲存"""
+    changed_rows = [dict(fields, **{KEY_FIELD: object_id}) for object_id, fields in delta['changed'].items()]
+    encoded = {
+        'format': DELTA_FORMAT,
+        'version': DELTA_VERSION,
+        'parent': parent,
+        'depth': depth,
+        'count': count,
+        'added': encode_snapshot(delta['added']),
+        'removed': delta['removed'],
+        'changed': encode_snapshot(changed_rows),
+        'unset': delta['unset'],
+    }
+    if delta.get('order') is not None:
+        encoded['order'] = delta['order']
+    return encoded
+
+
+def decode_delta(data: Dict[str, Any]) -> Dict[str, Any]:
+    if data.get('version') not in SUPPORTED_DELTA_VERSIONS:
+        raise ValueError(f"不支援的差異快照版本: {data.get('version')}")
+    changed = {}
+    for row in decode_snapshot(data['changed']):
+        changed[row.pop(KEY_FIELD)] = row
+    return {
+        'added': decode_snapshot(data['added']),
+        'removed': data['removed'],
+        'changed': changed,
+        'unset': data['unset'],
+        'order': data.get('order'),
+    }
+
+
+def delta_chain(path: str, data: Any = None) -> Tuple[List[Dict[str, Any]], str, Any]:
+    """
+    由差異快照往前追溯到完整快照，回傳 (差異清單（新到舊）, 基底路徑, 基底內容)
+    基底為壓縮封存檔時基底內容為 None
+    """
+    if data is None:
+        data = load_snapshot_data(path)
+
+    chain = []
+    while is_delta_snapshot(data):
+        chain.append(data)
+        if len(chain) > BASE_INTERVAL * 4:
+            raise ValueError(f"差異快照鏈過長或有循環: {path}")
+        path = os.path.join(os.path.dirname(path), data['parent'])
+        data = load_snapshot_data(path)
+    return chain, path, data
+
+
+def replay(path: str, data: Any = None) -> List[Dict[str, Any]]:
+    """重建差異快照當天的所有物件"""
+    chain, base_path, base = delta_chain(path, data)
+    records = read_archive(base_path) if base is None else decode_snapshot(base)
+    for delta in reversed(chain):
+        records = apply_delta(records, decode_delta(delta))
+        if len(records) != delta['count']:
+            raise ValueError(f"差異快照重建筆數不符: {len(records)} != {delta['count']}")
+    return records
+
+
+def snapshot_depth(data: Any) -> int:
+    """快照距離基底的差異次數（完整快照為 0）"""
+    return data.get('depth', 0) if is_delta_snapshot(data) else 0
+
+
+def write_daily_snapshot(path: str, records: List[Dict[str, Any]], parent_path: Optional[str] = None,
+                         mode: Optional[str] = None, base_interval: int = BASE_INTERVAL) -> str:
+    """
+    寫入當天的快照，回傳實際寫入的類型 'delta'（JSON）或 'full'（壓縮封存檔），
+    發布時以 snapshot_extension(類型) 作為副檔名
+    差異模式下需要 parent_path（與 path 在同一個資料目錄，重建時以相對路徑尋找）；
+    沒有 parent、已達基底間隔或差異過大時寫入完整快照
+    """
+    if resolve_snapshot_mode(mode) == 'delta' and parent_path and os.path.exists(parent_path):
+        try:
+            parent_data = load_snapshot_data(parent_path)
+            depth = snapshot_depth(parent_data) + 1
+            if depth < base_interval:
+                previous = replay(parent_path, parent_data)
+                delta = compute_delta(previous, records)
+                parent = os.path.relpath(parent_path, os.path.dirname(path) or '.')
+                encoded = encode_delta(delta, parent, depth, len(records))
+
+                full_size = len(dumps(encode_snapshot(records)))
+                if len(dumps(encoded)) <= full_size * MAX_DELTA_RATIO:
+                    dump_file(path, encoded)
+                    return 'delta'
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️  無法建立差異快照，改寫入完整快照: {e}")
+
+    write_archive(path, records)
+    return 'full'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='差異快照工具')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    info_parser = subparsers.add_parser('info', help='顯示快照類型與差異鏈')
+    info_parser.add_argument('path')
+
+    rebase_parser = subparsers.add_parser('rebase', help='將差異快照重建後另存為完整快照')
+    rebase_parser.add_argument('path')
+    rebase_parser.add_argument('target')
+    rebase_parser.add_argument('--json', action='store_true', help='輸出原本的 JSON 陣列格式')
+
+    args = parser.parse_args()
+
+    if args.command == 'info':
+        chain, base_path, _ = delta_chain(args.path)
+        if not chain:
+            print(f"📄 完整快照: {args.path}")
+            return
+        print(f"🧩 差異快照（距離基底 {len(chain)} 次）: {args.path}")
+        for delta in chain:
+            print(f"  • {delta['count']} 個物件，下架 {len(delta['removed'])} 個，parent: {delta['parent']}")
+        print(f"  📄 基底: {base_path}")
+    elif args.command == 'rebase':
+        records = replay(args.path)
+        write_snapshot(args.target, records, compact=not args.json)
+        print(f"✅ 已重建 {len(records)} 個物件: {args.target}")
+
+
+if __name__ == "__main__":
+    main()
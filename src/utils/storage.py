@@ -0,0 +1,181 @@
+"""
+多行程共用的儲存工具
+多個爬蟲行程（不同區域或分片）同時寫入 data/ 時使用：
+    - FileLock：以鎖定檔保護「讀取 -> 修改 -> 寫回」的檔案（如快照清單）
+    - atomic_write：每次寫入使用不重複的暫存檔再原子替換，讀取端只會看到完整的舊檔或新檔
+    - publish_timestamped：將寫好的暫存檔以不重複的時間戳記檔名發布（不會覆蓋其他行程的檔案）
+    - reserve_timestamped_path：以獨佔建立的方式取得不重複的時間戳記檔名（逐步寫入的串流檔案）
+"""
+
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import IO, Iterator, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+# 等待鎖定的預設秒數（壓縮作業會在持有清單鎖定時執行較久）
+DEFAULT_LOCK_TIMEOUT = 120.0
+
+LOCK_POLL_INTERVAL = 0.05
+
+
+def _default_file_mode() -> int:
+    """一般建立檔案時的權限（0o666 去除 umask）；mkstemp 建立的暫存檔為 0o600，替換前改為此權限"""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+DEFAULT_FILE_MODE = _default_file_mode()
+
+
+class LockTimeout(TimeoutError):
+    """等待鎖定逾時"""
+
+
+class FileLock:
+    """以 <path>.lock 鎖定檔實作的行程間互斥鎖（同一個行程內不可重入）"""
+
+    def __init__(self, path: str, timeout: float = DEFAULT_LOCK_TIMEOUT):
+        self.path = f"{path}.lock"
+        self.timeout = timeout
+        self._file: Optional[IO] = None
+
+    def _try_lock(self) -> bool:
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def acquire(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._file = open(self.path, 'a+b')
+        deadline = time.monotonic() + self.timeout
+        while not self._try_lock():
+            if time.monotonic() >= deadline:
+                self._file.close()
+                self._file = None
+                raise LockTimeout(f"等待鎖定逾時: {self.path}")
+            time.sleep(LOCK_POLL_INTERVAL)
+
+    def release(self):
+        if self._file is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> 'FileLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+def temporary_path(path: str) -> str:
+    """與 path 同目錄、不與其他行程衝突的暫存檔路徑（以 . 開頭，不會被快照檔名規則選到）"""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    os.close(fd)
+    # 替換後的檔案權限與一般建立的檔案相同（其他使用者或行程仍可讀取）
+    os.chmod(tmp_path, DEFAULT_FILE_MODE)
+    return tmp_path
+
+
+@contextmanager
+def atomic_write(path: str, mode: str = 'wb', encoding: Optional[str] = None, fsync: bool = False) -> Iterator[IO]:
+    """寫入暫存檔，正常結束時原子替換 path，發生例外時刪除暫存檔"""
+    tmp_path = temporary_path(path)
+    try:
+        with open(tmp_path, mode, encoding=encoding) as f:
+            yield f
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _timestamped_name(data_dir: str, prefix: str, when: datetime, extension: str) -> str:
+    return os.path.join(data_dir, f"{prefix}_{when.strftime('%Y%m%d_%H%M%S')}{extension}")
+
+
+def publish_timestamped(tmp_path: str, data_dir: str, prefix: str, extension: str = '.json',
+                        when: Optional[datetime] = None, exclusive_with: Sequence[str] = ()) -> Tuple[str, datetime]:
+    """
+    將已寫完的暫存檔（與 data_dir 同一個檔案系統）以 {prefix}_{YYYYmmdd_HHMMSS}{extension} 檔名發布：
+    以硬連結建立目標檔名（已存在時失敗，不會覆蓋），同一秒已有其他行程使用時往後順延一秒，
+    成功後刪除暫存檔。讀取端只會看到完整的檔案；回傳 (路徑, 檔名中的時間)
+    不支援硬連結時（如部分網路或 Windows 檔案系統）改為獨佔建立空檔案保留檔名後再原子取代，
+    此時讀取端可能短暫看到空檔案
+    exclusive_with：同一個時間已有這些副檔名的檔案時也順延（同一種資料的不同格式不共用時間）
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    when = (when or datetime.now()).replace(microsecond=0)
+    while True:
+        path = _timestamped_name(data_dir, prefix, when, extension)
+        if any(os.path.exists(_timestamped_name(data_dir, prefix, when, other)) for other in exclusive_with):
+            when += timedelta(seconds=1)
+            continue
+        try:
+            os.link(tmp_path, path)
+        except FileExistsError:
+            when += timedelta(seconds=1)
+            continue
+        except OSError:
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                when += timedelta(seconds=1)
+                continue
+            os.close(fd)
+            os.replace(tmp_path, path)
+            return path, when
+        os.remove(tmp_path)
+        return path, when
+
+
+def reserve_timestamped_path(data_dir: str, prefix: str, when: Optional[datetime] = None,
+                             extension: str = '.ndjson') -> Tuple[str, datetime]:
+    """
+    以獨佔建立的方式保留 {prefix}_{YYYYmmdd_HHMMSS}{extension} 檔名（建立空檔案），
+    同一秒已有其他行程使用時往後順延一秒；回傳 (路徑, 檔名中的時間)
+    只用於建立後逐步寫入的檔案（如串流快照），完整寫入後才出現的檔案使用 publish_timestamped
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    when = (when or datetime.now()).replace(microsecond=0)
+    while True:
+        path = _timestamped_name(data_dir, prefix, when, extension)
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            when += timedelta(seconds=1)
+            continue
+        os.close(fd)
+        return path, when
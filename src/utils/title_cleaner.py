@@ -0,0 +1,280 @@
+"""
+物件標題清理工具
+以 Aho-Corasick 自動機處理標題前綴與避免詞，並將社區名稱模式比對出的名稱累積成字典，讓大多數標題以線性時間解析
+"""
+
+import json
+import os
+import re
+from collections import Counter, deque
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .storage import atomic_write
+
+# 標題解析結果改變時遞增（卡片快取以此判斷舊的結果是否可用）
+CLEANER_VERSION = 3
+
+# 社區名稱字典檔案格式版本（1 為純名稱陣列，其中混有描述性標題，不再載入）
+DICTIONARY_VERSION = 2
+
+# 標題開頭常見的宣傳前綴（只移除一個）與其後的裝飾符號
+TITLE_PREFIXES = ['店長推薦', '專任', '獨家', '急售', '出價就談', '可看', '新接', '稀有', '推薦']
+TITLE_DECORATIONS = set('★❤️⭐✿㊣[]｜·')
+
+# 社區名稱中不應出現的通用詞彙
+AVOID_WORDS = ['三房', '四房', '電梯', '車位', '大樓', '華廈', '建坪', '年華', '年大']
+
+# 字典查詢失敗時使用的正則表達式（依序嘗試，{city} 為物件所在城市）
+COMMUNITY_PATTERN_TEMPLATES = [
+    # 模式1: 社區名稱重複出現的情況 (如: "榮耀巴黎...榮耀巴黎新北市")
+    r'([A-Za-z\u4e00-\u9fff]{{3,15}}).*?\1{city}',
+    # 模式2: 明確的社區名稱 (如: "全球嘉年華新北市")
+    r'([A-Za-z\u4e00-\u9fff]{{3,15}}){city}',
+    # 模式3: 社區名稱在最末尾 (如: "森活大市新北市")
+    r'([A-Za-z\u4e00-\u9fff]{{3,12}}){city}[^A-Za-z\u4e00-\u9fff]*$',
+]
+
+
+@lru_cache(maxsize=None)
+def community_patterns(city: str) -> Tuple[re.Pattern, ...]:
+    """某個城市的社區名稱模式"""
+    return tuple(re.compile(template.format(city=re.escape(city))) for template in COMMUNITY_PATTERN_TEMPLATES)
+
+
+COMMUNITY_PATTERNS = list(community_patterns('新北市'))
+DESCRIPTIVE_PATTERNS = [
+    # 描述 + 社區名稱
+    re.compile(r'^([^新北台北0-9]{5,20}?)(?:新北|台北)'),
+    # 純描述性標題
+    re.compile(r'^([^新北台北0-9]{3,15}?)(?:[0-9]+年|建坪)'),
+]
+DESCRIPTIVE_SUFFIX_RE = re.compile(r'(車位|三房|四房|電梯|景觀|庭院|綠意|邊間|高樓|方正|美學|豪邸)$')
+
+COMMUNITY_NAME_RE = re.compile(r'^[A-Za-z\u4e00-\u9fff]{3,15}$')
+
+
+class KeywordAutomaton:
+    """Aho-Corasick 多關鍵字比對自動機"""
+
+    def __init__(self, words: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Optional[str]] = [None]  # 以此節點結尾的最長關鍵字
+        self._dict_suffix: List[int] = [0]  # 沿失敗鏈第一個有輸出的節點
+
+        for word in words:
+            if word:
+                self._add(word)
+        self._build()
+
+    def _add(self, word: str):
+        node = 0
+        for ch in word:
+            next_node = self._goto[node].get(ch)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][ch] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(None)
+                self._dict_suffix.append(0)
+            node = next_node
+        self._output[node] = word
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail_child = self._goto[fail].get(ch, 0)
+                self._fail[child] = fail_child if fail_child != child else 0
+                target = self._fail[child]
+                self._dict_suffix[child] = target if self._output[target] else self._dict_suffix[target]
+                queue.append(child)
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, str]]:
+        """逐一產生 (結束位置, 關鍵字)，結束位置不含該字元"""
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        dict_suffix = self._dict_suffix
+
+        node = 0
+        for index, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+
+            match_node = node if output[node] else dict_suffix[node]
+            while match_node:
+                yield index + 1, output[match_node]
+                match_node = dict_suffix[match_node]
+
+    def contains_any(self, text: str) -> bool:
+        """文字中是否包含任一關鍵字"""
+        for _ in self.iter_matches(text):
+            return True
+        return False
+
+    def match_prefix(self, text: str) -> Optional[str]:
+        """文字開頭符合的最長關鍵字"""
+        node = 0
+        longest = None
+        for ch in text:
+            node = self._goto[node].get(ch)
+            if node is None:
+                break
+            if self._output[node]:
+                longest = self._output[node]
+        return longest
+
+
+PREFIX_AUTOMATON = KeywordAutomaton(TITLE_PREFIXES)
+AVOID_AUTOMATON = KeywordAutomaton(AVOID_WORDS)
+
+
+def strip_title_prefix(title: str) -> str:
+    """移除開頭的宣傳前綴與裝飾符號"""
+    prefix = PREFIX_AUTOMATON.match_prefix(title)
+    if not prefix:
+        return title
+
+    index = len(prefix)
+    length = len(title)
+    while index < length and title[index].isspace():
+        index += 1
+    while index < length and title[index] in TITLE_DECORATIONS:
+        index += 1
+    while index < length and title[index].isspace():
+        index += 1
+    return title[index:]
+
+
+def contains_avoid_word(text: str) -> bool:
+    """是否包含不應出現在社區名稱中的通用詞彙"""
+    return AVOID_AUTOMATON.contains_any(text)
+
+
+def is_community_name(name: str) -> bool:
+    """是否符合社區名稱的格式"""
+    return bool(name) and bool(COMMUNITY_NAME_RE.match(name)) and not contains_avoid_word(name)
+
+
+def match_community_name(title: str, city: str = "新北市") -> Optional[str]:
+    """以社區名稱模式從標題中比對緊接在城市名稱前的社區名稱，找不到時回傳 None"""
+    if city not in title:
+        return None
+
+    for pattern in community_patterns(city):
+        match = pattern.search(title)
+        if match:
+            extracted = match.group(1).strip()
+
+            # 檢查是否為有效的社區名稱，避免一些通用詞彙
+            if 3 <= len(extracted) <= 15 and not contains_avoid_word(extracted):
+                return extracted
+    return None
+
+
+def community_names_from_records(records: Iterable[Dict[str, Any]]) -> List[str]:
+    """
+    歷史物件資料中的社區名稱
+    有 community 欄位時直接使用；之前的資料只有清理後的標題，其中混有描述性名稱，
+    只取多個物件共用的標題（同一社區常有多個物件，描述性標題幾乎不重複）
+    """
+    names = []
+    legacy_titles = Counter()
+    legacy_ids = set()
+    for record in records:
+        if 'community' in record:
+            names.append(record['community'])
+            continue
+        object_id = record.get('object_id') or record.get('id')
+        if object_id in legacy_ids:
+            continue
+        legacy_ids.add(object_id)
+        legacy_titles[record.get('title')] += 1
+
+    names.extend(title for title, count in legacy_titles.items() if count >= 2)
+    return [name for name in names if name and is_community_name(name)]
+
+
+class CommunityNameDictionary:
+    """由社區名稱模式比對結果累積的社區名稱字典"""
+
+    def __init__(self, path: Optional[str] = "data/community_names.json", city: str = "新北市"):
+        self.path = path
+        self.city = city
+        self.names = set()
+        self._automaton = None
+        self._pending = set()
+
+    def load(self) -> int:
+        """從檔案載入字典，回傳名稱數量"""
+        if not self.path or not os.path.exists(self.path):
+            return 0
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  無法載入社區名稱字典 {self.path}: {e}")
+            return 0
+
+        if not isinstance(data, dict) or data.get('version') != DICTIONARY_VERSION:
+            print(f"⚠️  社區名稱字典 {self.path} 為舊版格式，重新建立")
+            return 0
+
+        self.names.update(name for name in data.get('names', []) if is_community_name(name))
+        self._automaton = None
+        return len(self.names)
+
+    def add_names(self, names: Iterable[Optional[str]]):
+        """
+        記錄社區名稱模式比對出的名稱（None 略過；下次載入時生效，避免執行中重建自動機）
+        描述性標題或截斷的標題不應加入，否則之後的標題會被解析成這些文字
+        """
+        for name in names:
+            if name and name not in self.names and is_community_name(name):
+                self._pending.add(name)
+
+    def lookup(self, title: str) -> Optional[str]:
+        """
+        找出標題中的已知社區名稱（最長者優先）
+        緊接在城市名稱前的名稱優先；沒有時（如標題中沒有城市名稱）使用標題中任一位置的名稱
+        """
+        if not self.names:
+            return None
+
+        if self._automaton is None:
+            self._automaton = KeywordAutomaton(self.names)
+
+        before_city = None
+        anywhere = None
+        for end, name in self._automaton.iter_matches(title):
+            if title.startswith(self.city, end):
+                if before_city is None or len(name) > len(before_city):
+                    before_city = name
+            elif anywhere is None or len(name) > len(anywhere):
+                anywhere = name
+        return before_city or anywhere
+
+    def save(self):
+        """寫入字典檔案"""
+        if not self.path or not (self._pending - self.names):
+            return
+
+        self.names.update(self._pending)
+        self._pending.clear()
+        self._automaton = None
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with atomic_write(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'version': DICTIONARY_VERSION, 'names': sorted(self.names)}, f, ensure_ascii=False)
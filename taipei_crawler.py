@@ -7,9 +7,10 @@
 import json
 import re
 import os
+import sqlite3
 import time
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Optional, Union
 from urllib.parse import urljoin
 import sys
 from pathlib import Path
@@ -27,22 +28,63 @@ except ImportError as e:
 sys.path.append(str(Path(__file__).parent))
 
 try:
+    from src.models.compact_property import CompactProperty
     from src.models.property import Property
     from src.utils.full_notion import create_full_notion_client
 except ImportError as e:
     print(f"⚠️  無法載入專案模組: {e}")
     print("將使用簡化模式運行...")
-    Property = None
+    CompactProperty = Property = None
+
+from src.utils.address import AddressIndex
+from src.utils.listing_store import ListingStore
+from src.utils.manifest import SNAPSHOT_EXTENSIONS, SnapshotManifest, load_previous_snapshot
+from src.utils.ndjson_snapshot import NDJSONSnapshotWriter, discard_completed, stream_path
+from src.utils.parquet_export import HAS_PYARROW, append_run
+from src.utils.parse_pool import ParsePool
+from src.utils.previous_snapshot import PreviousSnapshot
+from src.utils.snapshot_delta import resolve_snapshot_mode, snapshot_extension, write_daily_snapshot
+from src.utils.storage import publish_timestamped, temporary_path
+
+# 詳細頁面的規格區塊 class，找不到時使用 <main> 或整個頁面，並排除導覽列、頁尾、側欄（推薦物件）等區塊
+SPEC_SECTION_CLASSES = [
+    'buy-content-basic-info',
+    'object-detail',
+    'object-info',
+    'house-info',
+    'detail-info',
+]
+NON_CONTENT_TAGS = ['script', 'style', 'noscript', 'header', 'nav', 'footer', 'aside']
+
+PRICE_NUMBER_RE = re.compile(r'[\d,]+')
+ROOM_RE = re.compile(r'(\d+)房(\d+)廳(\d+)衛')
+SIZE_RE = re.compile(r'(\d+\.?\d*)坪')
+FLOOR_PATTERNS = [
+    re.compile(r'(\d+)樓/(\d+)樓'),
+    re.compile(r'(\d+)F/(\d+)F'),
+    re.compile(r'(\d+)樓'),
+    re.compile(r'(\d+)F'),
+]
 
 
 class TaipeiApartmentCrawler:
     """信義房屋台北公寓爬蟲（簡化版）"""
     
-    def __init__(self):
+    def __init__(self, parse_workers: Optional[int] = None, parse_only: bool = False,
+                 address_index_path: str = "data/taipei_address_index.json",
+                 listing_store_path: str = "data/listings.db", snapshot_mode: Optional[str] = None):
         self.base_url = "https://www.sinyi.com.tw"
         self.search_url = "https://www.sinyi.com.tw/buy/list/3000-down-price/apartment-type/20-up-balconyarea/3-5-roomtotal/1-3-floor/Taipei-city/100-103-104-105-106-108-110-115-zip/default-desc"
         self.district_name = "台北"
         self.region_name = "台北市"
+        self.store_region = "taipei"
+        
+        # 解析行程數量（None 時依 CRAWLER_PARSE_WORKERS 環境變數或 CPU 核心數）
+        self.parse_workers = parse_workers
+        
+        # 解析行程只需要上面的設定，不建立網路連線
+        if parse_only:
+            return
         
         print(f"🎯 設定爬蟲區域: {self.district_name}區公寓")
         print(f"🔗 搜尋網址: {self.search_url}")
@@ -63,6 +105,17 @@ class TaipeiApartmentCrawler:
         
         # 確保目錄存在
         os.makedirs("data", exist_ok=True)
+        
+        # 原始地址到標準地址鍵的對照表，比較前後資料時使用
+        self.address_index = AddressIndex(address_index_path, default_city=self.region_name)
+        if not self.address_index.load():
+            self.address_index.load("./previous_data/taipei_address_index.json")
+        
+        # 歷史物件資料庫（沒有本地資料庫時沿用 GitHub Actions 下載的資料庫）
+        self.listing_store = ListingStore(listing_store_path, seed_path="./previous_data/listings.db")
+        
+        # 快照模式：full 每天完整快照，delta 只存與前一次的差異（None 時依 CRAWLER_SNAPSHOT_MODE 環境變數）
+        self.snapshot_mode = resolve_snapshot_mode(snapshot_mode)
     
     def get_total_pages(self) -> int:
         """確定總頁數"""
@@ -95,66 +148,102 @@ class TaipeiApartmentCrawler:
         
         return 15  # 默認最大頁數
     
-    def crawl_page(self, page: int = 1) -> List[Dict[str, Any]]:
-        """爬取指定頁面的物件"""
-        properties = []
-        
+    def property_links(self, page: int) -> List[str]:
+        """列表頁中的物件詳細頁連結，抓取失敗時回傳空清單"""
         page_url = f"{self.search_url}/{page}"
         print(f"🔍 正在獲取: {page_url}")
         
         try:
             response = self.session.get(page_url, timeout=15)
             print(f"✅ 成功獲取頁面，內容長度: {len(response.content)}")
+        except Exception as e:
+            print(f"❌ 爬取第 {page} 頁失敗: {str(e)}")
+            return []
+        
+        soup = BeautifulSoup(response.content, 'html.parser')
+        
+        # 尋找物件連結
+        property_links = []
+        for item in soup.find_all('div', class_='buy-list-item'):
+            link_element = item.find('a', href=True)
+            if link_element:
+                href = link_element['href']
+                if href.startswith('/buy/house/'):
+                    property_links.append(urljoin(self.base_url, href))
+        
+        print(f"🏠 第 {page} 頁找到 {len(property_links)} 個物件連結")
+        return property_links
+    
+    def _fetch_detail_pages(self, pages: Iterable[int]):
+        """依序抓取各頁的物件詳細頁，產生 ((頁碼, 連結), (內容, 連結))"""
+        for index, page in enumerate(pages):
+            if index:
+                time.sleep(3)  # 避免請求過快
+            print(f"📄 正在爬取第 {page} 頁...")
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # 尋找物件連結
-            items = soup.find_all('div', class_='buy-list-item')
-            
-            property_links = []
-            for item in items:
-                link_element = item.find('a', href=True)
-                if link_element:
-                    href = link_element['href']
-                    if href.startswith('/buy/house/'):
-                        full_url = urljoin(self.base_url, href)
-                        property_links.append(full_url)
-            
-            print(f"🏠 找到 {len(property_links)} 個物件連結")
-            
-            # 爬取每個物件的詳細資訊
-            for i, link in enumerate(property_links, 1):
+            for link in self.property_links(page):
                 try:
-                    prop = self.parse_property_detail(link)
-                    if prop:
-                        properties.append(prop)
-                        print(f"✅ 解析物件: {prop['title'][:20]}...")
-                    
-                    # 避免請求過快
-                    time.sleep(1)
-                    
+                    response = self.session.get(link, timeout=10)
                 except Exception as e:
-                    print(f"❌ 解析物件失敗: {str(e)}")
+                    print(f"❌ 抓取物件詳情失敗: {str(e)}")
                     continue
-            
-        except Exception as e:
-            print(f"❌ 爬取第 {page} 頁失敗: {str(e)}")
-        
+                yield (page, link), (response.content, link)
+                
+                # 避免請求過快
+                time.sleep(1)
+    
+    def _collect_details(self, pool: ParsePool, pages: Iterable[int],
+                         stream: Optional[NDJSONSnapshotWriter] = None) -> List[Dict[str, Any]]:
+        """
+        抓取詳細頁的同時，最多有解析行程數個詳細頁在子行程中解析（跨頁持續進行），
+        結果依抓取順序取回並立即寫入串流快照；解析失敗的物件略過
+        """
+        properties = []
+        for (page, link), future in pool.submit_ordered(parse_detail_page, self._fetch_detail_pages(pages)):
+            try:
+                prop = future.result()
+            except Exception as e:
+                print(f"❌ 解析物件失敗（第 {page} 頁 {link}）: {str(e)}")
+                continue
+            if prop:
+                properties.append(prop)
+                if stream is not None:
+                    stream.write(prop)
+                print(f"✅ 解析物件: {prop['title'][:20]}...")
         return properties
     
+    def crawl_page(self, page: int = 1, pool: Optional[ParsePool] = None) -> List[Dict[str, Any]]:
+        """爬取指定頁面的物件"""
+        if pool is None:
+            with ParsePool(1) as pool:
+                return self._collect_details(pool, [page])
+        return self._collect_details(pool, [page])
+    
     def parse_property_detail(self, url: str) -> Optional[Dict[str, Any]]:
         """解析物件詳細資訊"""
         try:
             response = self.session.get(url, timeout=10)
-            soup = BeautifulSoup(response.content, 'html.parser')
+        except Exception as e:
+            print(f"❌ 解析物件詳情失敗: {str(e)}")
+            return None
+        
+        return self.parse_property_detail_html(response.content, url)
+    
+    def parse_property_detail_html(self, content: bytes, url: str) -> Optional[Dict[str, Any]]:
+        """從已抓取的詳細頁面內容解析物件資訊"""
+        try:
+            soup = BeautifulSoup(content, 'html.parser')
             
             # 提取基本資訊
             title = self._extract_title(soup)
             price = self._extract_price(soup)
             address = self._extract_address(soup)
-            room_info = self._extract_room_info(soup)
-            size_info = self._extract_size_info(soup)
-            floor_info = self._extract_floor_info(soup)
+            
+            # 房型、坪數、樓層都從同一段規格文字解析
+            spec_text = self._extract_spec_text(soup)
+            room_info = self._extract_room_info(spec_text)
+            size_info = self._extract_size_info(spec_text)
+            floor_info = self._extract_floor_info(spec_text)
             
             # 生成物件ID
             object_id = url.split('/')[-1].split('?')[0] if '/' in url else 'unknown'
@@ -212,7 +301,7 @@ class TaipeiApartmentCrawler:
             if element:
                 price_text = element.get_text(strip=True)
                 # 提取數字
-                price_match = re.search(r'[\d,]+', price_text.replace(',', ''))
+                price_match = PRICE_NUMBER_RE.search(price_text.replace(',', ''))
                 if price_match:
                     try:
                         return int(price_match.group())
@@ -236,51 +325,48 @@ class TaipeiApartmentCrawler:
         
         return "未知地址"
     
-    def _extract_room_info(self, soup: BeautifulSoup) -> Dict[str, int]:
+    def _extract_spec_text(self, soup: BeautifulSoup) -> str:
+        """找出規格區塊並取出其文字（每個物件只做一次）"""
+        # 一次走訪找出第一個規格區塊
+        section = soup.find(class_=SPEC_SECTION_CLASSES) or soup.find('main') or soup.body or soup
+        
+        # 移除與物件無關的區塊，避免抓到其他物件或廣告的樓層、坪數
+        for tag in section.find_all(NON_CONTENT_TAGS):
+            tag.decompose()
+        
+        # 以換行分隔各節點文字，避免相鄰節點的數字黏在一起
+        return section.get_text('\n')
+    
+    def _extract_room_info(self, spec_text: str) -> Dict[str, int]:
         """提取房間資訊"""
         room_info = {'room_count': 3, 'living_room_count': 2, 'bathroom_count': 2}
         
         # 尋找房型資訊
-        room_elements = soup.find_all(text=re.compile(r'\d+房\d+廳\d+衛'))
-        for element in room_elements:
-            room_match = re.search(r'(\d+)房(\d+)廳(\d+)衛', element)
-            if room_match:
-                room_info['room_count'] = int(room_match.group(1))
-                room_info['living_room_count'] = int(room_match.group(2))
-                room_info['bathroom_count'] = int(room_match.group(3))
-                break
+        room_match = ROOM_RE.search(spec_text)
+        if room_match:
+            room_info['room_count'] = int(room_match.group(1))
+            room_info['living_room_count'] = int(room_match.group(2))
+            room_info['bathroom_count'] = int(room_match.group(3))
         
         return room_info
     
-    def _extract_size_info(self, soup: BeautifulSoup) -> Dict[str, float]:
+    def _extract_size_info(self, spec_text: str) -> Dict[str, float]:
         """提取坪數資訊"""
         size_info = {'total_size': 0, 'main_area': 0}
         
-        # 尋找坪數資訊
-        size_elements = soup.find_all(text=re.compile(r'\d+\.?\d*坪'))
-        for element in size_elements:
-            size_match = re.search(r'(\d+\.?\d*)坪', element)
-            if size_match:
-                size_value = float(size_match.group(1))
-                if size_value > size_info['total_size']:
-                    size_info['total_size'] = size_value
-                    size_info['main_area'] = size_value
+        # 取規格區塊中最大的坪數
+        for size_match in SIZE_RE.finditer(spec_text):
+            size_value = float(size_match.group(1))
+            if size_value > size_info['total_size']:
+                size_info['total_size'] = size_value
+                size_info['main_area'] = size_value
         
         return size_info
     
-    def _extract_floor_info(self, soup: BeautifulSoup) -> str:
+    def _extract_floor_info(self, spec_text: str) -> str:
         """提取樓層資訊"""
-        floor_patterns = [
-            r'(\d+)樓/(\d+)樓',
-            r'(\d+)F/(\d+)F',
-            r'(\d+)樓',
-            r'(\d+)F'
-        ]
-        
-        # 在所有文本中搜尋樓層資訊
-        all_text = soup.get_text()
-        for pattern in floor_patterns:
-            floor_match = re.search(pattern, all_text)
+        for pattern in FLOOR_PATTERNS:
+            floor_match = pattern.search(spec_text)
             if floor_match:
                 if len(floor_match.groups()) >= 2 and floor_match.group(2):
                     return f"{floor_match.group(1)}樓/{floor_match.group(2)}樓"
@@ -297,22 +383,13 @@ class TaipeiApartmentCrawler:
         print(f"📄 確定總頁數: {total_pages}")
         print(f"📄 將爬取所有 {total_pages} 頁")
         
-        all_properties = []
+        # 解析出的物件立即寫入串流快照，中斷時仍留下已爬取的部分
+        self.stream_path = stream_path("taipei_houses")
+        print(f"📝 串流寫入: {self.stream_path}")
         
-        for page in range(1, total_pages + 1):
-            print(f"📄 正在爬取第 {page}/{total_pages} 頁...")
-            
-            try:
-                properties = self.crawl_page(page)
-                all_properties.extend(properties)
-                print(f"✅ 第 {page} 頁找到 {len(properties)} 個物件")
-                
-                # 避免請求過快
-                time.sleep(3)
-                
-            except Exception as e:
-                print(f"❌ 第 {page} 頁爬取失敗: {str(e)}")
-                continue
+        with NDJSONSnapshotWriter(self.stream_path, region=self.store_region) as stream, \
+                ParsePool(self.parse_workers) as pool:
+            all_properties = self._collect_details(pool, range(1, total_pages + 1), stream)
         
         # 去重
         unique_properties = []
@@ -330,19 +407,80 @@ class TaipeiApartmentCrawler:
     
     def save_to_local_file(self, properties: List[Dict[str, Any]]) -> str:
         """儲存到本地JSON檔案"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"data/taipei_houses_{timestamp}.json"
+        manifest = SnapshotManifest.open()
+        
+        # 差異模式以清單中最近一次的快照為 parent（與新快照同在 data/ 目錄，
+        # data/ 中沒有時從 previous_data/ 連同差異鏈一起複製過來）
+        parent_path = None
+        if self.snapshot_mode == 'delta':
+            parent_path = manifest.delta_parent(self.store_region)
+        
+        # 完整快照為壓縮封存檔 (.hsa，可依 object_id 查詢單筆)，差異快照為 JSON；
+        # 可用 python -m src.utils.snapshot to-json 轉回原本的 JSON 陣列
+        # 先寫入暫存檔，完成後才以不重複的檔名發布（其他爬蟲行程同一秒存檔時順延一秒），
+        # 讀取端不會看到空白或寫到一半的快照；saved_at 與檔名中的時間一致
+        tmp_path = temporary_path(os.path.join("data", "taipei_houses.json"))
+        try:
+            snapshot_kind = write_daily_snapshot(tmp_path, properties, parent_path, mode=self.snapshot_mode)
+            extension = snapshot_extension(snapshot_kind)
+            filename, saved_at = publish_timestamped(tmp_path, "data", "taipei_houses", extension,
+                                                     exclusive_with=SNAPSHOT_EXTENSIONS)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        if snapshot_kind == 'delta':
+            print(f"🧩 差異快照（parent: {os.path.basename(parent_path)}）")
+        
+        # 串流檔案只用於爬取中斷時保留已爬取的部分：完成且筆數與發布的快照相同時，內容已完整保存在
+        # 快照中（封存檔可依 object_id 查詢），保留兩份會讓 data/ 與上傳的 artifact 加倍，因此刪除；
+        # 未完成或筆數不同時保留以便檢查
+        try:
+            discard_completed(getattr(self, 'stream_path', None), expected_count=len(properties))
+        except OSError as e:
+            print(f"⚠️  無法刪除串流快照: {e}")
+        
+        try:
+            self.listing_store.record_run(self.store_region, properties, snapshot_path=os.path.basename(filename))
+        except sqlite3.Error as e:
+            print(f"⚠️  寫入物件資料庫失敗: {e}")
         
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(properties, f, ensure_ascii=False, indent=2)
+        try:
+            manifest.record(self.store_region, filename, saved_at, len(properties),
+                            parent=parent_path if snapshot_kind == 'delta' else None)
+        except OSError as e:
+            print(f"⚠️  無法更新快照清單: {e}")
+        
+        # 分析用的 Parquet 歷史資料（依區域與日期分區，有安裝 pyarrow 時才寫入）
+        if HAS_PYARROW:
+            try:
+                append_run(self.store_region, properties, saved_at)
+            except (OSError, TypeError, ValueError) as e:
+                print(f"⚠️  無法寫入 Parquet 歷史資料: {e}")
         
         return filename
     
-    def load_previous_data(self) -> List[Dict[str, Any]]:
-        """載入前一天的資料"""
+    def load_previous_data(self) -> Union[PreviousSnapshot, List[Dict[str, Any]]]:
+        """載入前一天的資料（資料庫與快照清單只載入比較用的欄位，完整物件需要時才讀取）"""
         print("🔍 正在搜尋前一天的資料...")
         print(f"  • 目標區域: taipei")
         
+        # 優先使用物件資料庫（有索引的查詢，不需要掃描檔案）
+        try:
+            previous = PreviousSnapshot.from_store(self.listing_store, self.store_region)
+        except sqlite3.Error as e:
+            print(f"  ⚠️  無法查詢物件資料庫: {e}")
+            previous = None
+        if previous:
+            print(f"  📊 從物件資料庫載入前一天資料: {len(previous)} 個物件")
+            return previous
+        
+        # 其次查詢快照清單，不需要列出目錄
+        found = load_previous_snapshot(self.store_region, PreviousSnapshot.from_file)
+        if found:
+            snapshot_path, data = found
+            print(f"  📊 從快照清單載入前一天資料: {snapshot_path} ({len(data)} 個物件)")
+            return data
+        
         data_dirs = ["./previous_data", "data"]
         print(f"  • 搜尋目錄: {data_dirs}")
         
@@ -359,17 +497,16 @@ class TaipeiApartmentCrawler:
                 
                 # 如果是 previous_data 目錄（GitHub Actions 下載的），直接找台北檔案
                 if data_dir == "./previous_data":
-                    taipei_files = [f for f in files if f.startswith("taipei_houses_") and f.endswith('.json')]
+                    taipei_files = [f for f in files if f.startswith("taipei_houses_") and f.endswith(SNAPSHOT_EXTENSIONS)]
                     if taipei_files:
                         # 取最新的檔案
                         latest_file = sorted(taipei_files, reverse=True)[0]
                         filepath = os.path.join(data_dir, latest_file)
                         print(f"  ✅ 從 previous_data 找到台北檔案: {latest_file}")
                         
-                        with open(filepath, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                            print(f"  📊 載入 GitHub Actions 台北資料: {len(data)} 個物件")
-                            return data
+                        data = PreviousSnapshot.from_file(filepath)
+                        print(f"  📊 載入 GitHub Actions 台北資料: {len(data)} 個物件")
+                        return data
                     else:
                         print(f"  ❌ 在 previous_data 中未找到台北檔案")
                         continue
@@ -377,9 +514,9 @@ class TaipeiApartmentCrawler:
                 # 搜尋昨天的檔案
                 yesterday = datetime.now() - timedelta(days=1)
                 yesterday_pattern = f"taipei_houses_{yesterday.strftime('%Y%m%d')}"
-                print(f"     🎯 搜尋昨天日期檔案模式: {yesterday_pattern}*.json")
+                print(f"     🎯 搜尋昨天日期檔案模式: {yesterday_pattern}*")
                 
-                matching_files = [f for f in files if f.startswith(yesterday_pattern) and f.endswith('.json')]
+                matching_files = [f for f in files if f.startswith(yesterday_pattern) and f.endswith(SNAPSHOT_EXTENSIONS)]
                 
                 if matching_files:
                     # 取最新的檔案
@@ -388,13 +525,12 @@ class TaipeiApartmentCrawler:
                     
                     print(f"  ✅ 找到前一天資料: {latest_file}")
                     
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        print(f"  📊 載入 {len(data)} 個前一天物件")
-                        return data
+                    data = PreviousSnapshot.from_file(filepath)
+                    print(f"  📊 載入 {len(data)} 個前一天物件")
+                    return data
                 else:
                     # 如果找不到昨天的檔案，尋找最新的台北檔案
-                    taipei_files = [f for f in files if f.startswith("taipei_houses_") and f.endswith('.json')]
+                    taipei_files = [f for f in files if f.startswith("taipei_houses_") and f.endswith(SNAPSHOT_EXTENSIONS)]
                     if taipei_files:
                         # 按檔名排序，取最新的
                         taipei_files.sort(reverse=True)
@@ -402,10 +538,9 @@ class TaipeiApartmentCrawler:
                         filepath = os.path.join(data_dir, latest_file)
                         print(f"  ✅ 找到最新的台北檔案: {latest_file}")
                         
-                        with open(filepath, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                            print(f"  📊 載入最新資料: {len(data)} 個物件")
-                            return data
+                        data = PreviousSnapshot.from_file(filepath)
+                        print(f"  📊 載入最新資料: {len(data)} 個物件")
+                        return data
                 
             except Exception as e:
                 print(f"  ❌ 讀取 {data_dir} 失敗: {str(e)}")
@@ -414,7 +549,8 @@ class TaipeiApartmentCrawler:
         print("📂 未找到前一天的資料")
         return []
     
-    def compare_with_previous(self, current_properties: List[Dict[str, Any]], previous_data: List[Dict[str, Any]]) -> Dict:
+    def compare_with_previous(self, current_properties: List[Dict[str, Any]],
+                              previous_data: Union[PreviousSnapshot, List[Dict[str, Any]]]) -> Dict:
         """與前一天資料比較"""
         if not previous_data:
             return {
@@ -432,19 +568,17 @@ class TaipeiApartmentCrawler:
                 'message': '首次爬取，所有物件都是新的'
             }
         
-        # 使用地址、房數、坪數作為唯一識別
+        # 使用標準化地址、房數、坪數作為唯一識別
         def generate_key(prop):
-            address = prop.get('address', '').strip()
+            address = self.address_index.key(prop.get('address', ''))
             room_count = prop.get('room_count', 0)
             size = prop.get('size', 0)
             main_area = prop.get('main_area', size)
             return f"{address}_{room_count}_{main_area}"
         
-        # 建立前一天的物件映射
-        previous_map = {}
-        for prop in previous_data:
-            key = generate_key(prop)
-            previous_map[key] = prop
+        # 建立前一天的物件索引，只保留價格與位置
+        previous = PreviousSnapshot.wrap(previous_data)
+        previous_map = previous.index(generate_key)
         
         # 建立今天的物件映射
         current_map = {}
@@ -461,9 +595,8 @@ class TaipeiApartmentCrawler:
             if key not in previous_map:
                 new_properties.append(current_prop)
             else:
-                previous_prop = previous_map[key]
                 current_price = current_prop.get('price', 0)
-                previous_price = previous_prop.get('price', 0)
+                previous_price, _ = previous_map[key]
                 
                 if abs(current_price - previous_price) > 0:
                     price_changed_properties.append({
@@ -475,14 +608,17 @@ class TaipeiApartmentCrawler:
                 else:
                     unchanged_properties.append(current_prop)
         
-        # 找出下架的物件
-        removed_properties = []
-        for key, previous_prop in previous_map.items():
-            if key not in current_map:
-                removed_properties.append(previous_prop)
+        # 找出下架的物件（只有下架的物件需要讀取完整資料）
+        removed_positions = [position for key, (_, position) in previous_map.items() if key not in current_map]
+        removed_properties = previous.records(removed_positions)
+        
+        try:
+            self.address_index.save()
+        except OSError as e:
+            print(f"⚠️  無法儲存地址對照表: {e}")
         
         # 計算變化
-        change = len(current_properties) - len(previous_data)
+        change = len(current_properties) - len(previous)
         
         return {
             'has_previous_data': True,
@@ -494,7 +630,7 @@ class TaipeiApartmentCrawler:
             'total_removed': len(removed_properties),
             'total_price_changed': len(price_changed_properties),
             'current_count': len(current_properties),
-            'previous_count': len(previous_data),
+            'previous_count': len(previous),
             'change': change,
             'message': f'與昨天比較：新增 {len(new_properties)} 個、下架 {len(removed_properties)} 個、變價 {len(price_changed_properties)} 個物件'
         }
@@ -538,34 +674,23 @@ class TaipeiApartmentCrawler:
             
             print(f"📝 準備上傳 {len(properties_to_upload)} 個物件到 Notion")
             
-            # 轉換為 Property 物件
-            property_objects = []
-            for i, prop_dict in enumerate(properties_to_upload):
-                prop_id = f"taipei_{i+1}_{prop_dict.get('title', '')[:10]}"
-                
-                prop = Property(
-                    id=prop_id,
-                    title=prop_dict.get('title', ''),
-                    address=prop_dict.get('address', ''),
-                    district=self.district_name,
-                    region=self.region_name,
-                    price=int(prop_dict.get('price', 0)),
-                    room_count=prop_dict.get('room_count', 3),
-                    living_room_count=prop_dict.get('living_room_count', 2),
-                    bathroom_count=prop_dict.get('bathroom_count', 2),
-                    size=prop_dict.get('size', 0),
-                    floor=str(prop_dict.get('floor', '')),
-                    source_site="信義房屋",
-                    source_url=prop_dict.get('source_url', ''),
-                    property_type='sale'
-                )
-                
-                prop.total_price = int(prop_dict.get('price', 0))
-                
-                if 'main_area' in prop_dict:
-                    prop.main_area = prop_dict['main_area']
-                
-                property_objects.append(prop)
+            # 批次轉換為精簡的 CompactProperty（依欄位型別轉換，保留所有模型欄位，重複字串共用）
+            property_objects = CompactProperty.from_records(
+                [
+                    {
+                        **prop_dict,
+                        'id': f"taipei_{i+1}_{prop_dict.get('title', '')[:10]}",
+                        'total_price': prop_dict.get('price', 0)
+                    }
+                    for i, prop_dict in enumerate(properties_to_upload)
+                ],
+                district=self.district_name,
+                region=self.region_name,
+                # 沒有房型資料時沿用原本的 3 房 2 廳 2 衛
+                defaults={'room_count': 3, 'living_room_count': 2, 'bathroom_count': 2},
+                source_site="信義房屋",
+                property_type='sale'
+            )
             
             # 建立 Notion 客戶端並上傳
             client = create_full_notion_client(notion_token)
@@ -595,6 +720,18 @@ class TaipeiApartmentCrawler:
             return False
 
 
+# 解析行程中重複使用的爬蟲實例（只含解析設定，不建立網路連線）
+_detail_parser = None
+
+
+def parse_detail_page(content: bytes, url: str) -> Optional[Dict[str, Any]]:
+    """解析物件詳細頁面（解析池的工作函式，回傳純字典資料）"""
+    global _detail_parser
+    if _detail_parser is None:
+        _detail_parser = TaipeiApartmentCrawler(parse_only=True)
+    return _detail_parser.parse_property_detail_html(content, url)
+
+
 def main():
     """主程式"""
     import argparse
@@ -604,6 +741,14 @@ def main():
                        nargs='?',
                        default='taipei',
                        help='只支援台北區域')
+    parser.add_argument('--parse-workers',
+                       type=int,
+                       default=None,
+                       help='解析行程數量（預設為 CPU 核心數，1 表示在主行程解析）')
+    parser.add_argument('--snapshot-mode',
+                       choices=['full', 'delta'],
+                       default=None,
+                       help='快照模式（預設依 CRAWLER_SNAPSHOT_MODE 環境變數，未設定時為 full）')
     
     args = parser.parse_args()
     
@@ -616,7 +761,7 @@ def main():
     print("=" * 50)
     
     try:
-        crawler = TaipeiApartmentCrawler()
+        crawler = TaipeiApartmentCrawler(parse_workers=args.parse_workers, snapshot_mode=args.snapshot_mode)
         
         # 1. 載入前一天的資料
         print("📂 載入前一天的資料...")
@@ -660,6 +805,7 @@ def main():
         
         # 4. 儲存本地檔案
         json_file = crawler.save_to_local_file(properties)
+        crawler.listing_store.close()
         print(f"📁 已儲存到: {json_file}")
         
         # 5. 上傳到 Notion
@@ -0,0 +1,313 @@
+"""
+爬蟲解析測試
+以 test_fixtures/ 中保存的列表頁與詳細頁 HTML 檢查解析結果，不需要網路連線
+
+執行方式：
+    python -m pytest test_all_crawlers.py
+    python test_all_crawlers.py
+"""
+
+import os
+import random
+import re
+import tempfile
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import datetime
+
+from bs4 import BeautifulSoup
+
+import sanchong_luzhou_crawler
+from sanchong_luzhou_crawler import SanchongLuzhouCrawler
+from taipei_crawler import SIZE_RE, TaipeiApartmentCrawler
+from src.utils.listing_store import ListingStore
+from src.utils.ndjson_snapshot import iter_records
+from src.utils.card_extractor import extract_card_fields
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_fixtures")
+
+# 組合出各種卡片文字的片段（涵蓋每個欄位的所有模式與找不到時的預設值）
+CARD_FRAGMENTS = [
+    '新北市三重區重新路二段', '新北市三重區', '蘆洲區長榮路', '三重', '蘆洲', '1,980萬', '2380 萬', '總價：2,150',
+    '3房2廳2衛', '12房1廳1衛', '4R2L2B', '3 房', '建坪：35.6', '總坪數 40', '28.5坪', '主建物：22.1',
+    '5樓/12樓', '7F/14F', '3樓', '9F', '屋齡：25.3年', '18年屋', '民國 85 年', '民國 30 年',
+    '\n', '，', ' ', '新北市', '坪', '年', '萬', 'R', 'F', '房', '衛', '店長推薦 榮耀巴黎',
+]
+
+
+def legacy_crawler() -> SanchongLuzhouCrawler:
+    """只用來呼叫逐欄位 extract_* 方法的爬蟲（不建立網路連線與資料庫）"""
+    return SanchongLuzhouCrawler.__new__(SanchongLuzhouCrawler)
+
+
+def load_fixture_cards(filename: str = "sinyi_cards.html"):
+    """與 parse_property_list 相同的方式找出每張卡片：(object_id, 卡片文字)"""
+    with open(os.path.join(FIXTURE_DIR, filename), encoding='utf-8') as f:
+        soup = BeautifulSoup(f.read(), 'html.parser')
+
+    cards = []
+    for link in soup.find_all('a', href=re.compile(r'/buy/house/')):
+        object_id = re.search(r'/buy/house/([A-Za-z0-9]+)', link['href']).group(1)
+        container = link.find_parent(['div', 'article', 'section']) or link
+        cards.append((object_id, container.get_text()))
+    return cards
+
+
+def test_card_extractor_matches_legacy_methods_on_fixture():
+    """融合解析器與原本逐欄位的 extract_* 方法結果完全相同（包含型別）"""
+    crawler = legacy_crawler()
+    cards = load_fixture_cards()
+    assert len(cards) == 8
+
+    for object_id, text in cards:
+        fused = extract_card_fields(text)
+        legacy = crawler.extract_card_fields(text)
+        assert fused == legacy, object_id
+        assert [type(value) for value in fused.values()] == [type(value) for value in legacy.values()], object_id
+
+
+def test_card_extractor_fixture_values():
+    """保存的卡片解析出預期的欄位"""
+    fields = {object_id: extract_card_fields(text) for object_id, text in load_fixture_cards()}
+
+    # 地址後直接接著屋齡、坪數等欄位時只保留地址
+    assert {object_id: value['address'] for object_id, value in fields.items()} == {
+        '6597KX': '新北市三重區重新路五段', '7012AB': '新北市蘆洲區長榮路', '5531ZZ': '三重區三和路四段',
+        '8800QW': '蘆洲區中正路', '4120MN': '新北市三重區', '3399PL': '蘆洲區', '9911TT': '三重區大同南路',
+        '1200CD': '三重區',
+    }
+
+    assert fields['6597KX']['price'] == 2380
+    assert (fields['6597KX']['rooms'], fields['6597KX']['total_size']) == (3, 45.21)
+    assert fields['6597KX']['floor'] == '12樓/15樓'
+    assert fields['8800QW']['age'] == 30
+
+    assert fields['7012AB']['price'] == 1980
+    assert fields['7012AB']['floor'] == '5樓/12樓'
+    assert fields['7012AB']['age'] == 18
+
+    # 找不到欄位時使用預設值
+    assert fields['4120MN']['price'] == 0
+    assert (fields['4120MN']['rooms'], fields['4120MN']['living_rooms'], fields['4120MN']['bathrooms']) == (3, 2, 2)
+    assert fields['1200CD']['floor'] == '未知樓層'
+
+
+def test_card_extractor_matches_legacy_methods_on_random_text():
+    """隨機組合的卡片文字（固定亂數種子）也與原本的方法相同"""
+    crawler = legacy_crawler()
+    rng = random.Random(1)
+    for _ in range(5000):
+        text = ''.join(rng.choice(CARD_FRAGMENTS) for _ in range(rng.randint(0, 12)))
+        assert extract_card_fields(text) == crawler.extract_card_fields(text), text
+
+
+def test_parse_property_list_on_fixture():
+    """完整的列表頁解析（解析行程使用的 parse_only 模式）"""
+    with tempfile.TemporaryDirectory() as tmp:
+        crawler = SanchongLuzhouCrawler(
+            parse_only=True,
+            card_cache_path=os.path.join(tmp, "card_cache.json"),
+            community_names_path=os.path.join(tmp, "community_names.json"),
+        )
+        with open(os.path.join(FIXTURE_DIR, "sinyi_cards.html"), encoding='utf-8') as f:
+            properties = crawler.parse_property_list(f.read())
+
+    assert [prop['object_id'] for prop in properties] == [object_id for object_id, _ in load_fixture_cards()]
+    first = properties[0]
+    assert first['id'] == 'sinyi_sanchong_luzhou_6597KX'
+    assert first['price'] == first['total_price'] == 2380
+    assert first['source_url'] == 'https://www.sinyi.com.tw/buy/house/6597KX/?breadcrumb=list'
+
+
+def test_community_dictionary_learns_only_pattern_matches():
+    """只有社區名稱模式比對出的名稱會加入字典，描述性標題不加入"""
+    with tempfile.TemporaryDirectory() as tmp:
+        crawler = SanchongLuzhouCrawler(
+            parse_only=True,
+            card_cache_path=os.path.join(tmp, "card_cache.json"),
+            community_names_path=os.path.join(tmp, "community_names.json"),
+        )
+        assert crawler.resolve_property_name('店長推薦 榮耀巴黎新北市三重區') == ('榮耀巴黎', '榮耀巴黎')
+        assert crawler.resolve_property_name('明亮採光大空間25年') == ('明亮採光大空間', None)
+
+        crawler.card_cache.put('a', {'title': '榮耀巴黎', 'community': '榮耀巴黎', 'fields': {}})
+        crawler.card_cache.put('b', {'title': '明亮採光大空間', 'community': None, 'fields': {}})
+        crawler.community_names.add_names(crawler._cached_community_names())
+        crawler.community_names.save()
+
+        assert crawler.community_names.names == {'榮耀巴黎'}
+
+
+def test_cached_cards_use_names_learned_later():
+    """卡片快取不保存字典查詢結果：字典學到新名稱後，快取命中的卡片也改用字典中的名稱"""
+    with open(os.path.join(FIXTURE_DIR, "sinyi_cards.html"), encoding='utf-8') as f:
+        html = f.read()
+    with tempfile.TemporaryDirectory() as tmp:
+        crawler = SanchongLuzhouCrawler(
+            parse_only=True,
+            card_cache_path=os.path.join(tmp, "card_cache.json"),
+            community_names_path=os.path.join(tmp, "community_names.json"),
+        )
+        first = crawler.parse_property_list(html)[0]
+        crawler.community_names.add_names(['榮耀巴黎'])
+        crawler.community_names.save()
+        again = crawler.parse_property_list(html)[0]
+
+    assert (first['title'], first['community']) == ('榮耀巴黎 高樓層景觀三', None)
+    assert crawler.card_cache.hits == crawler.card_cache.misses
+    assert (again['title'], again['community']) == ('榮耀巴黎', '榮耀巴黎')
+    assert again['price'] == first['price']
+
+
+def test_community_dictionary_seeded_from_listing_store():
+    """字典為空時由資料庫中上一次執行的物件建立（舊資料只取多個物件共用的標題），標題中沒有城市名稱時也能查詢"""
+    with tempfile.TemporaryDirectory() as tmp:
+        with ListingStore(os.path.join(tmp, "listings.db")) as store:
+            store.record_run('sanchong_luzhou', [
+                {'object_id': 'A1', 'title': '榮耀巴黎', 'price': 2380},
+                {'object_id': 'A2', 'title': '榮耀巴黎', 'price': 2480},
+                {'object_id': 'A3', 'title': '明亮採光大空間', 'price': 1980},
+                {'object_id': 'A4', 'title': '遠雄之星', 'community': '遠雄之星', 'price': 1880},
+                {'object_id': 'A5', 'title': '邊間採光', 'community': None, 'price': 1780},
+            ], run_at=datetime(2025, 1, 1, 9))
+
+        crawler = SanchongLuzhouCrawler(
+            card_cache_path=os.path.join(tmp, "card_cache.json"),
+            community_names_path=os.path.join(tmp, "community_names.json"),
+            address_index_path=os.path.join(tmp, "address_index.json"),
+            listing_store_path=os.path.join(tmp, "listings.db"),
+        )
+        crawler.listing_store.close()
+
+        assert crawler.community_names.names == {'榮耀巴黎', '遠雄之星'}
+        assert crawler.resolve_property_name('專任 遠雄之星 三房車位') == ('遠雄之星', '遠雄之星')
+        assert crawler.resolve_property_name('榮耀巴黎A棟新北市三重區') == ('榮耀巴黎', '榮耀巴黎')
+
+
+
+@contextmanager
+def working_directory(path: str):
+    """在暫存目錄中執行（爬蟲會寫入 data/ 下的串流快照）"""
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+class RecordingPool:
+    """取代 ParsePool：結果在取回時才計算，記錄同時尚未取回的工作數"""
+
+    def __init__(self, max_workers=None):
+        self.max_workers = 3
+        self.in_flight = 0
+        self.max_in_flight = 0
+        RecordingPool.last = self
+
+    def submit(self, func, *args):
+        pool = self
+        pool.in_flight += 1
+        pool.max_in_flight = max(pool.max_in_flight, pool.in_flight)
+
+        class LazyFuture(Future):
+            def result(self, timeout=None):
+                pool.in_flight -= 1
+                if args[0] == 'BROKEN':
+                    raise ValueError('無法解析')
+                return func(*args)
+
+        return LazyFuture()
+
+    submit_ordered = sanchong_luzhou_crawler.ParsePool.submit_ordered
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class FixtureCrawler(SanchongLuzhouCrawler):
+    """以保存的列表頁取代網路請求：第 2 頁無法解析、第 4 頁是空白的最後一頁"""
+
+    def get_total_pages(self):
+        return 8
+
+    def fetch_page(self, url, delay=2.0):
+        page = int(url.rsplit('/', 1)[1])
+        self.fetched.append(page)
+        if page == 2:
+            return 'BROKEN'
+        if page >= 4:
+            return '<html><body></body></html>'
+        with open(os.path.join(FIXTURE_DIR, "sinyi_cards.html"), encoding='utf-8') as f:
+            # 每頁的物件編號不同，避免被當成重複頁面
+            return re.sub(r'/buy/house/([A-Za-z0-9]+)', rf'/buy/house/\g<1>P{page}', f.read())
+
+
+def test_crawl_keeps_several_pages_in_flight_and_skips_unparseable_page():
+    """解析中的頁面最多為行程數個，結果依頁碼順序收集；無法解析的頁面略過，空白頁停止"""
+    original_pool = sanchong_luzhou_crawler.ParsePool
+    sanchong_luzhou_crawler.ParsePool = RecordingPool
+    try:
+        with tempfile.TemporaryDirectory() as tmp, working_directory(tmp):
+            crawler = FixtureCrawler(parse_only=True, card_cache_path="card_cache.json",
+                                     community_names_path="community_names.json")
+            crawler.store_region = 'sanchong_luzhou'
+            crawler.fetched = []
+            properties = crawler.crawl_all_pages()
+            streamed = list(iter_records(crawler.stream_path))
+    finally:
+        sanchong_luzhou_crawler.ParsePool = original_pool
+
+    pool = RecordingPool.last
+    assert pool.max_in_flight == pool.max_workers
+    # 確認第 4 頁是空白頁時已抓取後面的頁面，但不會抓取整個範圍
+    assert crawler.fetched == [1, 2, 3, 4, 5, 6]
+    fixture_ids = [object_id for object_id, _ in load_fixture_cards()]
+    assert [prop['object_id'] for prop in properties] == \
+        [f"{object_id}P1" for object_id in fixture_ids] + [f"{object_id}P3" for object_id in fixture_ids]
+    assert [record['object_id'] for record in streamed] == [prop['object_id'] for prop in properties]
+
+
+def load_fixture(filename: str) -> bytes:
+    with open(os.path.join(FIXTURE_DIR, filename), 'rb') as f:
+        return f.read()
+
+
+def parse_taipei_detail(content: bytes):
+    crawler = TaipeiApartmentCrawler(parse_only=True)
+    return crawler.parse_property_detail_html(content, "https://www.sinyi.com.tw/buy/house/T1234A")
+
+
+def assert_taipei_detail_specs(prop):
+    assert (prop['room_count'], prop['living_room_count'], prop['bathroom_count']) == (3, 2, 1)
+    assert (prop['size'], prop['main_area']) == (32.5, 32.5)
+    assert prop['floor'] == '3樓/5樓'
+    assert (prop['object_id'], prop['price'], prop['address']) == ('T1234A', 2680, '台北市大安區新生南路二段')
+
+
+def test_taipei_detail_reads_specs_from_spec_section():
+    """規格區塊外的推薦物件（最大 897.5 坪、12樓/15樓）與頁首頁尾不影響房型、坪數、樓層"""
+    content = load_fixture("sinyi_taipei_detail.html")
+    page_sizes = [float(size) for size in SIZE_RE.findall(BeautifulSoup(content, 'html.parser').get_text())]
+    assert max(page_sizes) == 1200 and 897.5 in page_sizes
+    assert_taipei_detail_specs(parse_taipei_detail(content))
+
+
+def test_taipei_detail_falls_back_to_main_and_body():
+    """沒有規格區塊 class 時使用 <main>；也沒有 <main> 時使用整個頁面，排除側欄的推薦物件與頁首頁尾"""
+    content = load_fixture("sinyi_taipei_detail_no_spec.html")
+    assert_taipei_detail_specs(parse_taipei_detail(content))
+
+    without_main = content.replace(b'<main>', b'<div>').replace(b'</main>', b'</div>')
+    assert b'<main' not in without_main
+    assert_taipei_detail_specs(parse_taipei_detail(without_main))
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,243 @@
+"""
+資料模型測試
+Property / CompactProperty 的轉換，以及向量化搜尋與索引查詢
+
+執行方式：
+    python -m pytest test_models.py
+    python test_models.py
+"""
+
+import math
+import random
+from datetime import datetime
+
+import numpy as np
+
+from src.models.compact_property import CompactProperty
+from src.models.property import Property, SearchParams
+from src.models.property_batch import PropertyBatch
+from src.models.property_index import PropertyIndex
+from src.models.property_search import search_indices, top_k
+
+RAW_RECORD = {
+    'id': 'sinyi_1', 'title': '榮耀巴黎', 'address': '新北市三重區重新路五段', 'district': '三重區',
+    'region': '新北市', 'price': '2,380', 'room_count': '3', 'living_room_count': 2, 'bathroom_count': 2,
+    'size': '45.21', 'floor': '12樓/15樓', 'source_site': '信義房屋', 'source_url': 'https://example.com/1',
+    'object_id': '6597KX', 'crawl_time': '2025-01-01T09:00:00',
+}
+
+
+def test_compact_property_matches_property():
+    """CompactProperty 與 Property 的欄位、to_dict 輸出相同，且可互相轉換"""
+    created = datetime(2025, 1, 1, 9)
+    prop = Property.from_dict(RAW_RECORD, created_at=created, updated_at=created)
+    compact = CompactProperty.from_property(prop)
+
+    assert compact.to_dict() == prop.to_dict()
+    assert CompactProperty.from_dict(prop.to_dict()) == compact
+    assert compact.to_property() == prop
+    assert compact.get_fingerprint() == prop.get_fingerprint()
+    assert not hasattr(compact, '__dict__')
+
+
+def test_compact_property_interns_repeated_strings():
+    """重複的低基數字串（district、region、source_site）共用同一個物件"""
+    records = [dict(Property.from_dict(RAW_RECORD).to_dict(), id=str(i)) for i in range(2)]
+    # 模擬由 JSON 讀入：每筆的字串是各自獨立的物件
+    for record in records:
+        for name in ('district', 'region', 'source_site'):
+            record[name] = ''.join(list(record[name]))
+    first, second = CompactProperty.from_dicts(records)
+    assert first.district is second.district
+    assert first.region is second.region
+    assert first.source_site is second.source_site
+
+
+def test_compact_property_from_records_validates_like_property():
+    """from_records 的欄位轉換、defaults 與 overrides 與 Property.from_dicts 相同，無效資料略過"""
+    records = [RAW_RECORD, {'title': '缺少 id', 'price': 100}, dict(RAW_RECORD, id='sinyi_2', room_count=None)]
+    kwargs = dict(defaults={'room_count': 3}, property_type='sale', region='新北市')
+
+    compacts = CompactProperty.from_records(records, **kwargs)
+    properties = Property.from_dicts(records, **kwargs)
+
+    assert [item.id for item in compacts] == ['sinyi_1', 'sinyi_2']
+    for compact, prop in zip(compacts, properties):
+        expected = prop.to_dict()
+        actual = compact.to_dict()
+        for name in ('created_at', 'updated_at'):
+            expected.pop(name)
+            actual.pop(name)
+        assert actual == expected
+    assert compacts[0].price == 2380 and compacts[1].room_count == 3
+
+    # Notion 統計使用的批次可直接由 CompactProperty 建立
+    batch = PropertyBatch.from_properties(compacts)
+    assert batch.summary_stats()['avg_price'] == 2380
+
+
+def test_from_dict_requires_id_title_and_price():
+    """缺少 id、title、price（或值為 None）時拋出 ValueError，其他必填欄位使用型別的空值"""
+    for name in ('id', 'title', 'price'):
+        for record in ({k: v for k, v in RAW_RECORD.items() if k != name}, dict(RAW_RECORD, **{name: None})):
+            try:
+                Property.from_dict(record)
+            except ValueError as e:
+                assert name in str(e)
+            else:
+                raise AssertionError(f"缺少 {name} 時應拋出 ValueError")
+
+    prop = Property.from_dict({'id': 'x', 'title': '只有必要欄位', 'price': '1,980'})
+    assert (prop.price, prop.address, prop.room_count, prop.size) == (1980, '', 0, 0.0)
+
+    try:
+        Property.from_dict(dict(RAW_RECORD, size='四十坪'))
+    except ValueError as e:
+        assert 'size' in str(e)
+    else:
+        raise AssertionError("無法轉換的值應拋出 ValueError")
+
+
+def test_from_dicts_skips_invalid_records():
+    records = [RAW_RECORD, {'title': '缺少 id', 'price': 100}, dict(RAW_RECORD, id='sinyi_2', price='面議'),
+               dict(RAW_RECORD, id='sinyi_3')]
+    assert [prop.id for prop in Property.from_dicts(records)] == ['sinyi_1', 'sinyi_3']
+
+
+def test_from_dict_defaults_and_overrides_precedence():
+    """資料 > defaults（只補缺少或 None 的欄位）；overrides > 資料"""
+    record = dict(RAW_RECORD, bathroom_count=None)
+    del record['living_room_count']
+    prop = Property.from_dict(record, defaults={'room_count': 5, 'living_room_count': 1, 'bathroom_count': 3,
+                                                'region': '台北市'},
+                              region='新北市', source_site='永慶房屋')
+    assert (prop.room_count, prop.living_room_count, prop.bathroom_count) == (3, 1, 3)
+    assert (prop.region, prop.source_site) == ('新北市', '永慶房屋')
+    # overrides 為 None 時等同缺值，改用 defaults
+    assert Property.from_dict(RAW_RECORD, defaults={'floor': '1樓'}, floor=None).floor == '1樓'
+
+
+def test_taipei_records_without_total_price_or_age():
+    """台北爬蟲的詳細頁資料沒有 total_price、age：以上傳 Notion 時相同的參數轉換，選填欄位為 None"""
+    record = {
+        'id': 'taipei_T1234A', 'object_id': 'T1234A', 'title': '大安森林公園 三樓公寓',
+        'address': '台北市大安區新生南路二段', 'price': 2680, 'room_count': 3, 'living_room_count': 2,
+        'bathroom_count': 1, 'size': 32.5, 'main_area': 32.5, 'floor': '3樓/5樓',
+        'source_url': 'https://www.sinyi.com.tw/buy/house/T1234A', 'crawl_time': '2025-01-01T09:00:00',
+    }
+    kwargs = dict(district='台北', region='台北市', source_site='信義房屋', property_type='sale',
+                  defaults={'room_count': 3, 'living_room_count': 2, 'bathroom_count': 2})
+    prop, = Property.from_dicts([record], **kwargs)
+    assert (prop.total_price, prop.age, prop.building_type) == (None, None, None)
+    assert (prop.price, prop.main_area, prop.region) == (2680, 32.5, '台北市')
+
+    compact, = CompactProperty.from_records([dict(record, total_price=record['price'])], **kwargs)
+    assert (compact.total_price, compact.age) == (2680, None)
+
+
+def random_listings(count: int, seed: int = 7):
+    """含缺值、同價（top_k 邊界同值）與舊資料（沒有 property_type）的物件"""
+    rng = random.Random(seed)
+    listings = []
+    for i in range(count):
+        record = {
+            'id': f"sinyi_{i}",
+            'price': rng.choice([1280, 1680, 1980, 1980, 1980, 2380, 2680, 2980]),
+            'size': rng.choice([None, 25.5, 32.0, 38.6, 45.2]),
+            'main_area': rng.choice([None, 0, 18.2, 22.1, 26.8]),
+            'room_count': rng.choice([None, 2, 3, 4, 5]),
+            'age': rng.choice([None, 5, 18, 30, 45]),
+            'district': rng.choice(['三重區', '蘆洲區', '大安區']),
+            'building_type': rng.choice([None, '華廈', '大樓', '公寓', '華廈/大樓']),
+        }
+        if rng.random() < 0.3:
+            record['total_price'] = rng.choice([0, 1880, 1980])
+        if rng.random() < 0.8:
+            record['property_type'] = rng.choice(['sale', 'rent'])
+        listings.append(record)
+    return listings
+
+
+def linear_search(listings, params: SearchParams):
+    """逐筆比對的參考實作：缺值不符合範圍條件，沒有 property_type 的舊資料不排除，缺值排在最後"""
+    def number(value):
+        return math.nan if value is None else float(value)
+
+    def effective_price(record):
+        return record['price'] if not record.get('total_price') else record['total_price']
+
+    def effective_size(record):
+        return record['main_area'] if record.get('main_area') else record['size']
+
+    def in_range(value, low, high):
+        value = number(value)
+        if math.isnan(value):
+            return low is None and high is None
+        return (low is None or value >= low) and (high is None or value <= high)
+
+    matches = []
+    for position, record in enumerate(listings):
+        if params.property_type and record.get('property_type') not in (None, params.property_type):
+            continue
+        if params.district and record['district'] != params.district:
+            continue
+        if not (in_range(effective_price(record), params.price_min, params.price_max)
+                and in_range(record['size'], params.size_min, params.size_max)
+                and in_range(effective_size(record), params.main_area_min, params.main_area_max)
+                and in_range(record['room_count'], params.room_count_min, params.room_count_max)
+                and in_range(record['age'], None, params.age_max)):
+            continue
+        if params.building_types and not any(keyword in (record['building_type'] or '')
+                                             for keyword in params.building_types):
+            continue
+        matches.append(position)
+
+    values = {'price': effective_price, 'size': lambda record: record['size'],
+              'main_area': effective_size, 'age': lambda record: record['age']}[params.sort_by]
+    sign = -1 if params.sort_order == 'desc' else 1
+
+    def sort_key(position):
+        value = number(values(listings[position]))
+        return (1, 0) if math.isnan(value) else (0, sign * value)
+
+    return sorted(matches, key=sort_key)[:params.max_results]
+
+
+def test_index_query_matches_linear_scan():
+    """PropertyIndex.query（索引交集或全表掃描）與向量化搜尋都與逐筆比對的結果相同（含排序與截斷）"""
+    listings = random_listings(3000)
+    batch = PropertyBatch.from_properties(listings)
+    index = PropertyIndex(batch)
+    cases = [
+        SearchParams(),
+        SearchParams(property_type='sale', max_results=50),
+        SearchParams(district='三重區', price_min=1500, price_max=2400, max_results=40),
+        SearchParams(price_max=1300, room_count_min=3, sort_by='size', sort_order='desc', max_results=30),
+        SearchParams(size_min=30, size_max=40, age_max=20, sort_by='age', max_results=500),
+        SearchParams(property_type='rent', district='大安區', building_types=['華廈'], sort_by='main_area'),
+        SearchParams(main_area_min=20, room_count_max=3, sort_order='desc', max_results=7),
+        SearchParams(district='蘆洲區', price_min=1980, price_max=1980, max_results=10),
+    ]
+    for params in cases:
+        expected = linear_search(listings, params)
+        assert search_indices(batch, params).tolist() == expected, params
+        assert index.query(params).tolist() == expected, params
+
+
+def test_top_k_matches_stable_sort():
+    """top_k 與完整穩定排序的前 k 筆相同（同值與缺值較多時也一樣）"""
+    rng = random.Random(3)
+    for _ in range(200):
+        values = [rng.choice([math.nan, 1.0, 2.0, 2.0, 3.0]) for _ in range(rng.randint(1, 40))]
+        k = rng.randint(0, len(values) + 2)
+        for descending in (False, True):
+            keys = [math.inf if math.isnan(value) else (-value if descending else value) for value in values]
+            expected = sorted(range(len(values)), key=lambda i: keys[i])[:k]
+            assert top_k(np.array(values), k, descending).tolist() == expected
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,441 @@
+"""
+資料儲存測試
+物件資料庫、價格歷史、快照格式（封存檔、差異快照、串流快照）、回填與時間點查詢，不需要網路連線
+
+執行方式：
+    python -m pytest test_storage.py
+    python test_storage.py
+"""
+
+import os
+import random
+import tempfile
+from datetime import date, datetime
+
+from src.utils.as_of import AsOfQuery
+from src.utils.backfill import Backfill, discover_snapshots, normalize_record
+from src.utils.compaction import CompactionJob, RetentionPolicy
+from src.utils.listing_store import ListingStore
+from src.utils.manifest import MANIFEST_FILENAME, SnapshotManifest, file_checksum, load_previous_snapshot
+from src.utils.ndjson_snapshot import (NDJSONSnapshotReader, NDJSONSnapshotWriter, discard_completed,
+                                       is_complete, read_footer)
+from src.utils.previous_snapshot import PreviousSnapshot
+from src.utils.snapshot import read_snapshot, write_snapshot
+from src.utils.snapshot_archive import SnapshotArchive, read_archive, write_archive
+from src.utils.snapshot_delta import BASE_INTERVAL, load_snapshot_data, snapshot_depth, snapshot_extension, \
+    write_daily_snapshot
+from src.utils.storage import publish_timestamped
+
+
+def listing(object_id: str, price: float, **fields):
+    return dict({'object_id': object_id, 'price': price, 'address': f"地址 {object_id}"}, **fields)
+
+
+def test_listing_store_keeps_newest_state_when_importing_out_of_order():
+    """先寫入較新的執行再匯入舊快照：first_seen 往前延伸，last_seen 與資料維持較新的執行"""
+    with tempfile.TemporaryDirectory() as tmp, ListingStore(os.path.join(tmp, "listings.db")) as store:
+        store.record_run('taipei', [listing('A', 1200, title='新標題')], run_at=datetime(2025, 3, 1, 9))
+        store.import_snapshot('taipei', [listing('A', 1500, title='舊標題'), listing('B', 900)],
+                              datetime(2025, 1, 1, 9), snapshot_path='taipei_houses_20250101_090000.hsa')
+        # 同一天較早的執行也不覆蓋
+        store.import_snapshot('taipei', [listing('A', 1300, title='當天較早')],
+                              datetime(2025, 3, 1, 8), snapshot_path='taipei_houses_20250301_080000.hsa')
+
+        row = store.conn.execute("SELECT * FROM listings WHERE object_id = 'A'").fetchone()
+        assert (row['first_seen'], row['last_seen']) == ('2025-01-01', '2025-03-01')
+        assert store.conn.execute("SELECT run_at FROM runs WHERE run_id = ?", (row['last_run_id'],)).fetchone()[0] \
+            == '2025-03-01T09:00:00'
+        assert '新標題' in row['data']
+
+        row = store.conn.execute("SELECT * FROM listings WHERE object_id = 'B'").fetchone()
+        assert (row['first_seen'], row['last_seen']) == ('2025-01-01', '2025-01-01')
+
+        # 價格歷史依日期重建，不受匯入順序影響
+        assert store.price_history.series('A') == [
+            ('2025-01-01', 1500.0, 'new'), ('2025-03-01', 1200.0, 'price_changed'),
+        ]
+
+
+def test_price_history_merges_same_day_reruns_and_rebuild_matches():
+    """同一天重跑（部分物件）時當天的點為兩次執行的聯集、以較晚的執行為準；重建的結果與逐次追加相同"""
+    with tempfile.TemporaryDirectory() as tmp, ListingStore(os.path.join(tmp, "listings.db")) as store:
+        store.record_run('taipei', [listing('A', 1500), listing('B', 900)], run_at=datetime(2025, 1, 1, 9))
+        store.record_run('taipei', [listing('A', 1500), listing('B', 900), listing('C', 700)],
+                         run_at=datetime(2025, 1, 2, 9))
+        # 1/2 下午的重跑只爬到部分物件，B 已變價
+        store.record_run('taipei', [listing('B', 850)], run_at=datetime(2025, 1, 2, 15))
+        store.record_run('taipei', [listing('B', 850), listing('C', 700)], run_at=datetime(2025, 1, 3, 9))
+
+        history = store.price_history
+        appended = {object_id: history.series(object_id) for object_id in 'ABC'}
+        assert appended == {
+            'A': [('2025-01-01', 1500.0, 'new'), ('2025-01-03', 1500.0, 'removed')],
+            'B': [('2025-01-01', 900.0, 'new'), ('2025-01-02', 850.0, 'price_changed')],
+            'C': [('2025-01-02', 700.0, 'new')],
+        }
+
+        with store.conn:
+            total = history.rebuild('taipei')
+        assert total == 5
+        assert {object_id: history.series(object_id) for object_id in 'ABC'} == appended
+
+
+def write_old_snapshots(data_dir: str):
+    """兩個較舊的快照：封存檔與舊版 JSON（台北的舊資料沒有 total_price、age、object_id）"""
+    os.makedirs(data_dir, exist_ok=True)
+    write_archive(os.path.join(data_dir, "taipei_houses_20250101_090000.hsa"),
+                  [listing('A', 1500, total_price=1500), listing('B', 900, total_price=900)])
+    write_snapshot(os.path.join(data_dir, "taipei_houses_20250102_090000.json"),
+                   [{'id': 'taipei_A', 'price': 1400, 'source_url': 'https://www.sinyi.com.tw/buy/house/A/'},
+                    {'id': 'taipei_C', 'price': 700}], compact=False)
+
+
+class InterruptedBackfill(Backfill):
+    """匯入第一個快照後中斷"""
+
+    def _store(self, task, records):
+        if self.stats['files']:
+            raise KeyboardInterrupt
+        super()._store(task, records)
+
+
+def test_normalize_record_fills_legacy_taipei_fields():
+    record = normalize_record({'id': 'taipei_A', 'price': 1400}, 'taipei')
+    assert record['object_id'] == 'A'
+    assert (record['total_price'], record['age'], record['region']) == (1400, None, '台北市')
+
+
+def test_backfill_older_snapshots_into_seeded_store():
+    """資料庫已有較新的執行（如 CI 從 previous_data/listings.db 複製）時回填舊快照，不回復成舊資料"""
+    with tempfile.TemporaryDirectory() as tmp, ListingStore(os.path.join(tmp, "listings.db")) as store:
+        store.record_run('taipei', [listing('A', 1200, total_price=1200)], run_at=datetime(2025, 3, 1, 9))
+        data_dir = os.path.join(tmp, "previous_data")
+        write_old_snapshots(data_dir)
+
+        tasks = discover_snapshots([data_dir])
+        assert [os.path.basename(task[0]) for task in tasks] == [
+            "taipei_houses_20250101_090000.hsa", "taipei_houses_20250102_090000.json",
+        ]
+        stats = Backfill(store, workers=1).run(tasks)
+        assert (stats['files'], stats['records'], stats['failed']) == (2, 4, 0)
+
+        rows = {row['object_id']: row for row in store.conn.execute("SELECT * FROM listings")}
+        assert (rows['A']['first_seen'], rows['A']['last_seen']) == ('2025-01-01', '2025-03-01')
+        assert all(row['first_seen'] <= row['last_seen'] for row in rows.values())
+        assert store.price_history.series('A') == [
+            ('2025-01-01', 1500.0, 'new'), ('2025-01-02', 1400.0, 'price_changed'),
+            ('2025-03-01', 1200.0, 'price_changed'),
+        ]
+        assert store.price_history.series('B') == [('2025-01-01', 900.0, 'new'), ('2025-01-02', 900.0, 'removed')]
+        assert store.price_history.stale_regions() == []
+
+        # 再執行一次全部略過
+        again = Backfill(store, workers=1)
+        assert again.run(tasks)['files'] == 0 and again.stats['skipped'] == 2
+
+
+def test_backfill_resumes_and_rebuilds_stale_history():
+    """中斷後重新執行只匯入剩下的快照，先前已匯入但尚未重建價格歷史的區域也會重建"""
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = os.path.join(tmp, "data")
+        write_old_snapshots(data_dir)
+        tasks = discover_snapshots([data_dir])
+
+        with ListingStore(os.path.join(tmp, "listings.db")) as store:
+            try:
+                InterruptedBackfill(store, workers=1).run(tasks)
+            except KeyboardInterrupt:
+                pass
+            assert store.conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0] == 1
+            assert store.price_history.stale_regions() == ['taipei']
+            assert store.price_history.series('A') == []
+
+        with ListingStore(os.path.join(tmp, "listings.db")) as store:
+            backfill = Backfill(store, workers=1)
+            assert backfill.pending(tasks) == tasks[1:]
+            backfill.run(tasks)
+            assert store.price_history.stale_regions() == []
+            assert store.price_history.series('B') == [('2025-01-01', 900.0, 'new'), ('2025-01-02', 900.0, 'removed')]
+
+        # 最後一個快照也已匯入、只剩價格歷史待重建時，沒有待匯入的快照也會重建
+        with ListingStore(os.path.join(tmp, "listings.db")) as store:
+            with store.conn:
+                store.price_history.mark_stale('taipei')
+                store.conn.execute("DELETE FROM price_history")
+            Backfill(store, workers=1).run(tasks)
+            assert store.price_history.series('C') == [('2025-01-02', 700.0, 'new')]
+
+
+def test_ndjson_torn_last_line_keeps_complete_records():
+    """行程在寫入最後一行時中斷：讀取已寫完的物件，略過寫到一半的行，檔案視為未完成"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "taipei_houses_20250101_090000.ndjson")
+        writer = NDJSONSnapshotWriter(path, region='taipei')
+        writer.write_many([listing('A', 1500), listing('B', 900)])
+        writer._file.write(b'{"object_id": "C", "pri')
+        writer.close(complete=False)
+
+        reader = NDJSONSnapshotReader(path)
+        assert [record['object_id'] for record in reader] == ['A', 'B']
+        assert not reader.complete and reader.header['region'] == 'taipei'
+        assert read_footer(path) is None
+        assert not discard_completed(path) and os.path.exists(path)
+
+
+def test_ndjson_missing_footer_is_incomplete():
+    """例外中斷 with 區塊時不寫入尾端紀錄；筆數與發布的快照不同時也不刪除"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "taipei_houses_20250101_090000.ndjson")
+        try:
+            with NDJSONSnapshotWriter(path) as writer:
+                writer.write_many([listing('A', 1500), listing('A', 1500), listing('B', 900)])
+                raise RuntimeError("爬取失敗")
+        except RuntimeError:
+            pass
+        assert not is_complete(path)
+        assert [record['object_id'] for record in NDJSONSnapshotReader(path)] == ['A', 'B']
+
+        complete_path = os.path.join(tmp, "taipei_houses_20250102_090000.ndjson")
+        with NDJSONSnapshotWriter(complete_path) as writer:
+            writer.write_many([listing('A', 1500), listing('B', 900)])
+        assert read_footer(complete_path)['count'] == 2
+        assert not discard_completed(complete_path, expected_count=3)
+        assert discard_completed(complete_path, expected_count=2) and not os.path.exists(complete_path)
+
+
+def test_previous_snapshot_from_stream():
+    """由串流快照逐行建立比較用索引，完整物件依位置重新讀取"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "taipei_houses_20250101_090000.ndjson")
+        with NDJSONSnapshotWriter(path) as writer:
+            writer.write_many([listing('A', 1500), listing('B', 900), listing('C', 700)])
+
+        previous = PreviousSnapshot.from_file(path)
+        assert len(previous) == 3
+        assert previous.index(lambda view: view['address']) == {
+            '地址 A': (1500, 0), '地址 B': (900, 1), '地址 C': (700, 2),
+        }
+        assert [record['object_id'] for record in previous.records([2, 0])] == ['C', 'A']
+
+
+def test_archive_round_trip_and_get_by_object_id():
+    """封存檔寫入後以 mmap 開啟：依 object_id、依序號讀取單筆，與完整讀取的內容相同"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "taipei_houses_20250101_090000.hsa")
+        records = [listing(f"K{i}", 1000 + i, title=f"物件 {i}", images=[f"{i}.jpg"]) for i in range(200)]
+        records.append({'id': 'taipei_legacy', 'price': 500})
+        records.append(listing('K7', 9999))  # 重複的 object_id 以第一筆為準
+        write_archive(path, records, frame_records=16)
+
+        assert read_archive(path) == records
+        with SnapshotArchive(path) as archive:
+            assert len(archive) == len(records) and len(archive.frames) == 13
+            assert archive.get('K150') == records[150]
+            assert archive.get('K7') == records[7]
+            assert archive.get('taipei_legacy') == records[200]
+            assert archive.get('missing') is None and 'K0' in archive
+            assert archive.records_at([201, 15, 16]) == [records[201], records[15], records[16]]
+
+
+def test_delta_chain_round_trip_across_base_interval():
+    """連續 10 次差異模式的執行：每 7 個快照一個完整基底，每個快照重建的物件（含順序）與當天寫入的相同"""
+    rng = random.Random(5)
+    records = [listing(f"K{i}", 1000 + i, title=f"物件 {i} " + "說明" * 20) for i in range(120)]
+    with tempfile.TemporaryDirectory() as tmp:
+        written, kinds, parent_path = [], [], None
+        for day in range(10):
+            records = [dict(record) for record in records]
+            for record in rng.sample(records, 3):
+                record['price'] -= 10
+            records = [record for record in records if record['object_id'] != f"K{day}"]
+            records.insert(rng.randrange(len(records)), listing(f"N{day}", 900 + day, title="新物件"))
+            head = records[:10]
+            rng.shuffle(head)
+            records[:10] = head
+
+            tmp_path = os.path.join(tmp, f".day{day}.tmp")
+            kind = write_daily_snapshot(tmp_path, records, parent_path, mode='delta')
+            path = os.path.join(tmp, f"taipei_houses_202501{day + 1:02d}_090000{snapshot_extension(kind)}")
+            os.replace(tmp_path, path)
+            written.append((path, records))
+            kinds.append(kind)
+            parent_path = path
+
+        assert kinds == ['full'] + ['delta'] * (BASE_INTERVAL - 1) + ['full'] + ['delta'] * 2
+        assert [snapshot_depth(load_snapshot_data(path)) for path, _ in written] == [0, 1, 2, 3, 4, 5, 6, 0, 1, 2]
+        for path, expected in written:
+            assert read_snapshot(path) == expected
+        previous = PreviousSnapshot.from_file(written[6][0])
+        assert previous.records([0, 119]) == [written[6][1][0], written[6][1][119]]
+
+
+def test_previous_snapshot_from_archive_reads_summary_frame_only():
+    """封存檔的比較索引取自摘要區塊，不解碼完整物件；沒有的欄位與值為 None 的欄位可區分"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "taipei_houses_20250101_090000.hsa")
+        records = [listing(str(i), 1000 + i, room_count=3, size=30.5) for i in range(150)]
+        records[1]['size'] = None
+        del records[2]['room_count']
+        write_archive(path, records, frame_records=64)
+
+        def fail(*args):
+            raise AssertionError("不應解碼完整物件")
+
+        original = SnapshotArchive.__iter__, SnapshotArchive.records_at
+        SnapshotArchive.__iter__ = SnapshotArchive.records_at = fail
+        try:
+            previous = PreviousSnapshot.from_file(path)
+        finally:
+            SnapshotArchive.__iter__, SnapshotArchive.records_at = original
+
+        views = list(previous.views())
+        assert len(previous) == 150 and views[149]['price'] == 1149
+        assert views[1]['size'] is None and 'room_count' not in views[2]
+        assert previous.records([140, 2]) == [records[140], records[2]]
+
+
+def record_snapshot(data_dir: str, region: str, run_at: datetime, records):
+    """寫入每日快照並記錄到該目錄的清單"""
+    path = os.path.join(data_dir, f"{region}_houses_{run_at:%Y%m%d_%H%M%S}.hsa")
+    write_archive(path, records)
+    SnapshotManifest(os.path.join(data_dir, MANIFEST_FILENAME)).record(region, path, run_at, len(records))
+
+
+def by_id(records):
+    return sorted(records, key=lambda record: record['object_id'])
+
+
+def test_compaction_carries_history_and_keeps_as_of_results():
+    """複製前一次執行的歷史並壓縮後，每個時間點的 listings_as_of 與壓縮前相同"""
+    runs = [
+        (datetime(2025, 1, 1, 9), [listing('A', 1500), listing('B', 900)]),
+        (datetime(2025, 1, 2, 9), [listing('A', 1400), listing('B', 900)]),
+        (datetime(2025, 1, 3, 9), [listing('A', 1400), listing('C', 700)]),
+        (datetime(2025, 2, 1, 9), [listing('C', 650)]),
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        previous_dir, data_dir = os.path.join(tmp, "previous_data"), os.path.join(tmp, "data")
+        os.makedirs(previous_dir)
+        os.makedirs(data_dir)
+        for run_at, records in runs[:-1]:
+            record_snapshot(previous_dir, 'taipei', run_at, records)
+        record_snapshot(data_dir, 'taipei', *runs[-1])
+
+        with ListingStore(os.path.join(tmp, "listings.db")) as store:
+            before = AsOfQuery(store, (data_dir, previous_dir))
+            expected = {run_at: by_id(before.listings_as_of('taipei', run_at)) for run_at, _ in runs}
+            assert [expected[run_at] for run_at, _ in runs] == [by_id(records) for _, records in runs]
+
+            summary = CompactionJob('taipei', data_dir, today=date(2025, 2, 1), carry_from=[previous_dir]).run()
+            assert (summary['carried_files'], summary['compacted_snapshots'], summary['weekly_files']) == (3, 3, 1)
+
+            manifest = SnapshotManifest.open(os.path.join(data_dir, MANIFEST_FILENAME))
+            assert [entry['file'] for entry in manifest.entries('taipei')] == ["taipei_houses_20250201_090000.hsa"]
+            assert [entry['period'] for entry in manifest.compacted['taipei']] == ['2025-01-W01']
+
+            # 壓縮後只看 data/（上傳的 artifact）也得到相同的結果
+            after = AsOfQuery(store, (data_dir,))
+            for run_at, _ in runs:
+                assert by_id(after.listings_as_of('taipei', run_at)) == expected[run_at]
+            assert after.listing_as_of('B', datetime(2025, 1, 2, 12), region='taipei') == listing('B', 900)
+
+
+def test_previous_snapshot_lookup_checks_size_and_hashes_only_on_read_failure():
+    """查詢時只比對大小，不計算檢查碼；內容損毀但大小相同時，讀取失敗後改以檢查碼略過該快照"""
+    import src.utils.manifest as manifest_module
+
+    with tempfile.TemporaryDirectory() as tmp:
+        previous_dir, data_dir = os.path.join(tmp, "previous_data"), os.path.join(tmp, "data")
+        os.makedirs(previous_dir)
+        os.makedirs(data_dir)
+        record_snapshot(previous_dir, 'taipei', datetime(2025, 1, 2, 9), [listing('A', 1500)])
+        record_snapshot(data_dir, 'taipei', datetime(2025, 1, 1, 9), [listing('B', 900)])
+
+        hashed = []
+        original = manifest_module.file_checksum
+        manifest_module.file_checksum = lambda path: hashed.append(path) or original(path)
+        try:
+            path, previous = load_previous_snapshot('taipei', PreviousSnapshot.from_file, (previous_dir, data_dir))
+            assert path.startswith(previous_dir) and len(previous) == 1 and hashed == []
+
+            # 保持檔案大小，損毀封存檔的結尾
+            with open(path, 'r+b') as f:
+                f.seek(-4, os.SEEK_END)
+                f.write(b'XXXX')
+            path, previous = load_previous_snapshot('taipei', PreviousSnapshot.from_file, (previous_dir, data_dir))
+            assert path.startswith(data_dir) and next(previous.views())['price'] == 900
+            assert len(hashed) == 2
+        finally:
+            manifest_module.file_checksum = original
+
+        manifest = SnapshotManifest.open(os.path.join(previous_dir, MANIFEST_FILENAME))
+        entry = manifest.entries('taipei')[0]
+        assert manifest.verify(entry) and not manifest.verify(entry, full=True)
+        assert entry['checksum'] != file_checksum(manifest.resolve(entry))
+
+
+def test_publish_timestamped_without_hard_links():
+    """os.link 不可用時改以獨佔建立保留檔名，同一秒的第二個檔案順延一秒，不覆蓋既有檔案"""
+    def no_link(source, target):
+        raise PermissionError(1, "Operation not permitted")
+
+    original = os.link
+    os.link = no_link
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = []
+            for content in (b'first', b'second'):
+                tmp_path = os.path.join(tmp, f".{content.decode()}.tmp")
+                with open(tmp_path, 'wb') as f:
+                    f.write(content)
+                path, when = publish_timestamped(tmp_path, tmp, 'taipei_houses', '.hsa', when=datetime(2025, 1, 1, 9))
+                assert not os.path.exists(tmp_path)
+                paths.append((os.path.basename(path), when))
+
+            assert paths == [('taipei_houses_20250101_090000.hsa', datetime(2025, 1, 1, 9)),
+                             ('taipei_houses_20250101_090001.hsa', datetime(2025, 1, 1, 9, 0, 1))]
+            with open(os.path.join(tmp, paths[0][0]), 'rb') as f:
+                assert f.read() == b'first'
+    finally:
+        os.link = original
+
+
+def test_as_of_database_runs_match_compacted_files():
+    """同樣的執行分別存在資料庫與壓縮後的快照檔案中，任一時間點查詢的結果相同"""
+    runs = [
+        (datetime(2025, 1, 1, 9), [listing('A', 1500), listing('B', 900)]),
+        (datetime(2025, 1, 2, 9), [listing('A', 1400), listing('B', 900)]),
+        (datetime(2025, 1, 2, 15), [listing('A', 1380), listing('C', 700)]),
+        (datetime(2025, 1, 5, 9), [listing('C', 650)]),
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = os.path.join(tmp, "data")
+        os.makedirs(data_dir)
+        with ListingStore(os.path.join(tmp, "runs.db")) as store:
+            for run_at, records in runs:
+                store.record_run('taipei', records, run_at=run_at)
+                record_snapshot(data_dir, 'taipei', run_at, records)
+        CompactionJob('taipei', data_dir, RetentionPolicy(keep_daily=0), today=date(2025, 3, 1)).run()
+        assert SnapshotManifest.open(os.path.join(data_dir, MANIFEST_FILENAME)).entries('taipei') == []
+
+        with ListingStore(os.path.join(tmp, "runs.db")) as runs_store, \
+                ListingStore(os.path.join(tmp, "empty.db")) as empty_store:
+            from_runs = AsOfQuery(runs_store, ())
+            from_files = AsOfQuery(empty_store, (data_dir,))
+            times = [datetime(2024, 12, 31), date(2025, 1, 1), datetime(2025, 1, 2, 12), '2025-01-02',
+                     datetime(2025, 1, 4), '2025-01-05T09:00:00', date(2025, 2, 1)]
+            for at in times:
+                expected = by_id(from_runs.listings_as_of('taipei', at))
+                assert by_id(from_files.listings_as_of('taipei', at)) == expected, at
+                for object_id in 'ABC':
+                    assert from_files.listing_as_of(object_id, at, region='taipei') == \
+                        from_runs.listing_as_of(object_id, at), (object_id, at)
+            assert by_id(from_files.listings_as_of('taipei', '2025-01-02')) == by_id(runs[2][1])
+            assert from_files.listings_as_of('taipei', datetime(2024, 12, 31)) == []
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✅ {name}")